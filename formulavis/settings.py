@@ -245,6 +245,52 @@ MEDIA_ROOT = ''
 SATELITE_PATH = '_satelite/SatELite_v1.0_linux'
 FILE_UPLOAD_PERMISSIONS = 0o777
 
+# Visualization tasks
+
+# Progress of running tasks is stored in JsonFile.progress ('db') or published to redis ('redis')
+PROGRESS_BACKEND = 'db'
+# Progress is written when it grows by PROGRESS_MIN_STEP percent or after PROGRESS_MIN_INTERVAL seconds
+PROGRESS_MIN_STEP = 1.0
+PROGRESS_MIN_INTERVAL = 0.5
+
+# Heatmaps with more cells (clauses * variables) are built without the full resolution matrix
+HEATMAP_DENSE_LIMIT = 25000000
+# Default and largest resolution of heatmap preview, can be lowered with 'rows' and 'cols' options of a request
+HEATMAP_MAX_SIZE = 500
+# Heatmap tiles served by the tile endpoint, the finest zoom level has at most HEATMAP_TILE_MAX_SIZE cells per axis
+HEATMAP_TILE_SIZE = 256
+HEATMAP_TILE_MAX_SIZE = 2048
+# Variables with more resolution edges (positive * negative occurrences) are shown as a hub node
+RESOLUTION_HUB_PAIRS = 1000000
+# Negative occurrences paired with every positive one in 'fanout' resolution mode, can be changed with 'fanout' option
+RESOLUTION_FANOUT = 10
+# Community detection ('cnm', 'louvain' or 'leiden') and its time limit in seconds, can be changed
+# with 'algorithm' and 'time' options of a request
+COMMUNITY_ALGORITHM = 'cnm'
+COMMUNITY_TIME_BUDGET = 600
+# Clustering of the cluster visualization ('louvain', 'leiden' or 'label_propagation'), limited by COMMUNITY_TIME_BUDGET
+CLUSTER_ALGORITHM = 'louvain'
+# Children of a supernode (and supernodes shown at first) of factor and interaction graphs summarized
+# with the 'summary' option, can be changed with 'group' option of a request
+SUMMARY_GROUP = 50
+# Nodes and levels of each DPLL tree (and of its expanded subtree) shown at once, the rest is collapsed,
+# can be changed with 'nodes' and 'depth' options of a request
+DPLL_TREE_NODES = 5000
+DPLL_TREE_DEPTH = 1000
+# Limits of each DPLL solver run in seconds, decisions and conflicts, a stopped run is shown as unresolved,
+# can be changed with 'time', 'decisions' and 'conflicts' options of a request
+DPLL_TIME_LIMIT = 600
+DPLL_DECISION_LIMIT = 1000000
+DPLL_CONFLICT_LIMIT = 1000000
+# Running tasks check at most once per CANCEL_CHECK_INTERVAL seconds whether they were cancelled
+CANCEL_CHECK_INTERVAL = 1.0
+# Results of visualizations are stored in JsonFile.content ('db') or in gzip compressed JSON files next to
+# their formula file ('file'), which keep only metadata in the database and are streamed to the client
+RESULT_STORAGE = 'file'
+# gzip compression level of result files and size of chunks they are streamed in
+RESULT_COMPRESSION = 6
+RESULT_CHUNK_SIZE = 65536
+
 
 # try:
 #     from .local_settings import *
@@ -389,6 +435,11 @@ CORS_ALLOW_HEADERS = list(default_headers) + [
     'x-csrftoken',
 ]
 
+CORS_EXPOSE_HEADERS = [
+    'x-tile-rows',
+    'x-tile-cols',
+]
+
 CORS_ALLOW_METHODS = [
     'DELETE',
     'GET',
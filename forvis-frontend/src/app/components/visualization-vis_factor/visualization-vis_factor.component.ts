@@ -16,6 +16,7 @@ import { FILE_SERVICE } from '../../services/interfaces/file-service';
 interface VisualizationContent {
   nodes: Node[];
   edges: Edge[];
+  layout?: { algorithm: string; status: string };
   options: any;
 }
 
@@ -133,7 +134,7 @@ export class VisualizationVisFactorComponent extends DownloadableComponent imple
             smooth: false
           },
           physics: {
-            enabled: true,
+            enabled: !(data.content.layout && data.content.layout.status === 'done'),
             barnesHut: {
               avoidOverlap: 1,
               centralGravity: 3.5
@@ -16,6 +16,7 @@ import { FILE_SERVICE } from '../../services/interfaces/file-service';
 interface VisualizationContent {
   nodes: Node[];
   edges: Edge[];
+  layout?: { algorithm: string; status: string };
   options: any;
 }
 
@@ -132,7 +133,7 @@ export class VisualizationVisInteractionComponent extends DownloadableComponent
             smooth: false
           },
           physics: {
-            enabled: true,
+            enabled: !(data.content.layout && data.content.layout.status === 'done'),
             barnesHut: {
               avoidOverlap: 1
             },
@@ -1,4 +1,4 @@
-import { Component, OnInit, inject, signal } from '@angular/core';
+import { Component, OnInit, inject, signal, ViewChild, ElementRef } from '@angular/core';
 import { ActivatedRoute } from '@angular/router';
 import { CommonModule } from '@angular/common';
 
@@ -15,13 +15,14 @@ class FormulaDependency {
     public negative: number = 0;
 }
 
-class DependencyRow {
-    public dependencies: FormulaDependency[] = [];
-}
-
-class DependencyMatrix {
+// Non-zero cells of the dependency matrix, rows and cols are positions of variables
+class SparseMatrix {
     public labels: string[] = [];
-    public rows: DependencyRow[] = [];
+    public size: number = 0;
+    public rows: number[] = [];
+    public cols: number[] = [];
+    public positive: number[] = [];
+    public negative: number[] = [];
 }
 
 @Component({
@@ -42,9 +43,19 @@ export class VisualizationVisMatrixComponent implements OnInit {
   private alertService = inject(AlertService);
   private jsonFileService = inject(JSON_FILE_SERVICE);
 
-  readonly redCellStyle = {'background-color': 'hsl(0, 65%, 62%)'};
-  readonly greenCellStyle = {'background-color': 'hsl(101, 65%, 62%)'};
-  readonly yellowCellStyle = {'background-color': 'hsl(54, 65%, 62%)'};
+  @ViewChild('matrixCanvas', {static: true}) private canvasRef!: ElementRef<HTMLCanvasElement>;
+
+  readonly redColor = 'hsl(0, 65%, 62%)';
+  readonly greenColor = 'hsl(101, 65%, 62%)';
+  readonly yellowColor = 'hsl(54, 65%, 62%)';
+  readonly markColor = '#7f7f7f';
+  readonly diagonalColor = '#000000';
+  // the canvas is at most maxCanvasSize pixels wide, a cell at most maxCell pixels, with more variables
+  // than pixels several cells share a pixel
+  readonly maxCanvasSize = 4096;
+  readonly maxCell = 50;
+  readonly labelSize = 40;
+  readonly minTextCell = 14;
 
   fileId = signal<number>(0);
   fileName = signal<string>('');
@@ -55,8 +66,12 @@ export class VisualizationVisMatrixComponent implements OnInit {
   colorsOn = signal<boolean>(false);
 
   selectedMode = signal<number>(0);
+  hovered = signal<string | null>(null);
 
-  public matrix = signal<DependencyMatrix | null>(null);
+  public matrix = signal<SparseMatrix | null>(null);
+  private cells = new Map<number, number>();
+  private cellSize = 1;
+  private offset = 0;
 
   private readonly errorMessage = 'An overload occurred during processing your file. Please try again with other method or file.';
 
@@ -69,54 +84,50 @@ export class VisualizationVisMatrixComponent implements OnInit {
     });
   }
 
-  private getCellStyle0(dependency: FormulaDependency) {
+  private getCellColor0(dependency: FormulaDependency) {
     if (dependency.positive + dependency.negative != 0)
-      return this.yellowCellStyle;
-    return {};
+      return this.yellowColor;
+    return null;
   }
 
-  private getCellStyle1(dependency: FormulaDependency) {
+  private getCellColor1(dependency: FormulaDependency) {
     if (dependency.positive > 0) {
       if (dependency.negative > 0) {
-        return this.yellowCellStyle;
+        return this.yellowColor;
       } else {
-        return this.greenCellStyle;
+        return this.greenColor;
       }
     }
     if (dependency.negative > 0) {
-      return this.redCellStyle;
+      return this.redColor;
     }
-    return {};
+    return null;
   }
 
-  private getCellStyle2(dependency: FormulaDependency) {
+  private getCellColor2(dependency: FormulaDependency) {
     if (dependency.negative == dependency.positive) {
-      return dependency.negative == 0 ? {} : this.yellowCellStyle;
+      return dependency.negative == 0 ? null : this.yellowColor;
     } else if (dependency.negative < dependency.positive) {
-      return this.greenCellStyle;
+      return this.greenColor;
     } else {
-      return this.redCellStyle;
+      return this.redColor;
     }
   }
 
-  getCellStyle(dependency: FormulaDependency, rowIndx: number, colIndx: number) {
-    if (rowIndx == colIndx) {
-      return {'background-color': "#000000"};
-    }
-
+  getCellColor(dependency: FormulaDependency) {
     if (!this.colorsOn())
-      return {};
+      return this.markColor;
 
     if (this.selectedMode() == 0)
-      return this.getCellStyle0(dependency);
+      return this.getCellColor0(dependency);
 
     if (this.selectedMode() == 1)
-      return this.getCellStyle1(dependency);
+      return this.getCellColor1(dependency);
 
     if (this.selectedMode() == 2)
-      return this.getCellStyle2(dependency);
-    
-    return {};
+      return this.getCellColor2(dependency);
+
+    return null;
   }
 
   getCellContent(dependency: FormulaDependency) {
@@ -135,6 +146,7 @@ export class VisualizationVisMatrixComponent implements OnInit {
 
   selectMode(nr: number) {
     this.selectedMode.set(nr);
+    this.draw();
   }
 
   getColorButtonText() {
@@ -146,16 +158,128 @@ export class VisualizationVisMatrixComponent implements OnInit {
 
   switchColors() {
     this.colorsOn.set(!this.colorsOn());
+    this.draw();
+  }
+
+  private dependencyAt(index: number): FormulaDependency {
+    const matrix = this.matrix()!;
+    const dependency = new FormulaDependency();
+    dependency.positive = matrix.positive[index];
+    dependency.negative = matrix.negative[index];
+    return dependency;
+  }
+
+  // Old results list every cell in rows of dependencies
+  private fromRows(content: any): SparseMatrix {
+    const matrix = new SparseMatrix();
+    matrix.labels = content.labels;
+    matrix.size = content.rows.length;
+    content.rows.forEach((row: any, r: number) => {
+      row.dependencies.forEach((dependency: FormulaDependency, c: number) => {
+        if (r != c && dependency.positive + dependency.negative != 0) {
+          matrix.rows.push(r);
+          matrix.cols.push(c);
+          matrix.positive.push(dependency.positive);
+          matrix.negative.push(dependency.negative);
+        }
+      });
+    });
+    return matrix;
+  }
+
+  private fromContent(content: any): SparseMatrix {
+    if (!Array.isArray(content.positive))
+      return this.fromRows(content);
+    const matrix = new SparseMatrix();
+    matrix.labels = content.labels;
+    matrix.size = content.size;
+    matrix.rows = content.rows;
+    matrix.cols = content.cols;
+    matrix.positive = content.positive;
+    matrix.negative = content.negative;
+    return matrix;
+  }
+
+  // Draws the diagonal and the non-zero cells only, the matrix is never expanded
+  draw() {
+    const matrix = this.matrix();
+    if (!matrix)
+      return;
+    const size = Math.max(matrix.size, 1);
+    this.cellSize = Math.min(this.maxCell, this.maxCanvasSize / size);
+    if (this.cellSize >= 1)
+      this.cellSize = Math.floor(this.cellSize);
+    const pixel = Math.max(1, this.cellSize);
+    const showText = this.cellSize >= this.minTextCell;
+    this.offset = showText ? this.labelSize : 0;
+
+    const canvas = this.canvasRef.nativeElement;
+    canvas.width = canvas.height = this.offset + Math.ceil(this.cellSize * matrix.size);
+    const context = canvas.getContext('2d')!;
+    context.fillStyle = '#efefef';
+    context.fillRect(0, 0, canvas.width, canvas.height);
+    context.textAlign = 'center';
+    context.textBaseline = 'middle';
+    context.font = Math.min(12, this.cellSize - 2) + 'px sans-serif';
+
+    if (showText) {
+      context.fillStyle = '#000000';
+      for (let i = 0; i < matrix.size; i++) {
+        const center = this.offset + (i + 0.5) * this.cellSize;
+        context.fillText(matrix.labels[i] || '', center, this.offset / 2);
+        context.fillText(matrix.labels[i] || '', this.offset / 2, center);
+      }
+    }
+
+    context.fillStyle = this.diagonalColor;
+    for (let i = 0; i < matrix.size; i++) {
+      const position = this.offset + Math.floor(i * this.cellSize);
+      context.fillRect(position, position, pixel, pixel);
+    }
+
+    for (let k = 0; k < matrix.rows.length; k++) {
+      const dependency = this.dependencyAt(k);
+      const x = this.offset + Math.floor(matrix.cols[k] * this.cellSize);
+      const y = this.offset + Math.floor(matrix.rows[k] * this.cellSize);
+      const color = this.getCellColor(dependency);
+      if (color) {
+        context.fillStyle = color;
+        context.fillRect(x, y, pixel, pixel);
+      }
+      if (showText) {
+        context.fillStyle = '#000000';
+        context.fillText(this.getCellContent(dependency), x + this.cellSize / 2, y + this.cellSize / 2);
+      }
+    }
+  }
+
+  // Shows the cell under the pointer, looked up among the non-zero cells
+  hover(event: MouseEvent) {
+    const matrix = this.matrix();
+    if (!matrix)
+      return;
+    const r = Math.floor((event.offsetY - this.offset) / this.cellSize);
+    const c = Math.floor((event.offsetX - this.offset) / this.cellSize);
+    if (r < 0 || c < 0 || r >= matrix.size || c >= matrix.size || r == c) {
+      this.hovered.set(null);
+      return;
+    }
+    const index = this.cells.get(r * matrix.size + c);
+    const dependency = index === undefined ? new FormulaDependency() : this.dependencyAt(index);
+    this.hovered.set(matrix.labels[r] + ' x ' + matrix.labels[c] + ': ' + dependency.positive + '/' + dependency.negative);
   }
 
   loadVis() {
     this.jsonFileService.getJsonFile(this.fileId(), this.kind(), []).subscribe({
       next: (data: any) => {
-        const matrix = new DependencyMatrix();
-        matrix.labels = data.content.labels;
-        matrix.rows = data.content.rows;
+        const matrix = this.fromContent(data.content);
+        this.cells = new Map<number, number>();
+        for (let k = 0; k < matrix.rows.length; k++) {
+          this.cells.set(matrix.rows[k] * matrix.size + matrix.cols[k], k);
+        }
         this.matrix.set(matrix);
         this.loading.set(false);
+        this.draw();
       },
       error: (error: Error) => {
         this.alertService.error(this.errorMessage);
@@ -17,6 +17,7 @@ import { FILE_SERVICE } from '../../services/interfaces/file-service';
 interface VisualizationContent {
   nodes: Node[];
   edges: Edge[];
+  layout?: { algorithm: string; status: string };
   variables: string[];
   options: any;
 }
@@ -163,7 +164,7 @@ export class VisualizationVisResolutionComponent extends DownloadableComponent i
             smooth: false
           },
           physics: {
-            enabled: true,
+            enabled: !(data.content.layout && data.content.layout.status === 'done'),
             barnesHut: {
               avoidOverlap: 1,
               centralGravity: 10
@@ -16,6 +16,7 @@ import { FILE_SERVICE } from '../../services/interfaces/file-service';
 interface VisualizationContent {
   nodes: Node[];
   edges: Edge[];
+  layout?: { algorithm: string; status: string };
   options: any;
 }
 
@@ -150,7 +151,7 @@ export class VisualizationVisTreeComponent extends DownloadableComponent impleme
             }
           },
           physics: {
-            enabled: true,
+            enabled: !(data.content.layout && data.content.layout.status === 'done'),
             barnesHut: {
               avoidOverlap: 1
             },
@@ -96,6 +96,13 @@ export class VisualizationsComponent implements OnInit {
         modalRef.componentInstance.progressMessage = vis.progress;
     }
 
+    cancelVisualization(id: number): void {
+        this.jsonFileService.cancelTask(id).subscribe({
+            next: () => this.updateList(),
+            error: (error) => this.alertService.error(error)
+        });
+    }
+
     deleteVisualization(id: number): void {
         this.jsonFileService.deleteJsonFile(id).subscribe({
             next: () => this.updateList(),
@@ -138,6 +145,11 @@ export class VisualizationsComponent implements OnInit {
         return vis.status === 'done' || vis.progress === 'Progress: 100.0%';
     }
 
+    canCancel(vis: Jsonfile): boolean {
+        // queued tasks are revoked, running ones stop only for formats checking cancellation
+        return vis.status === 'empty' || (vis.status === 'pending' && vis.json_format === 'sat_vis_dpll');
+    }
+
     canCreateCommunity(vis: Jsonfile): boolean {
         const allowedFormats = [
             'sat_vis_factor', 'sat_vis_interaction', 'sat_vis_tree',
@@ -12,5 +12,7 @@ export interface IJsonFileService {
 
     getJsonFile(id: number, format: string, selectedVariables: string[]): Observable<any>;
 
+    cancelTask(id: number): Observable<any>;
+
     deleteJsonFile(id: number): Observable<any>;
 }
@@ -37,6 +37,10 @@ export class JsonFileService implements IJsonFileService {
     return this.http.get(`${this.url_visualization}${id}/${format}/`, options);
   }
 
+  cancelTask(id: number): Observable<any> {
+    return this.http.post(`${this.url_visualization}${id}/cancel/`, {}, this.authService.authOptions());
+  }
+
   deleteJsonFile(id: number): Observable<any> {
     return this.http.delete(`${this.url_visualization}${id}/del/`, this.authService.authOptions());
   }
@@ -1,91 +1,276 @@
 import heapq
-from itertools import combinations
+import time
 
+import numpy as np
 
-class Matrix:
+from profiles.progress import ProgressReporter
 
-    def __init__(self):
-        self.matrix_dict = {}
-
-    @staticmethod
-    def _get_key(u_id, v_id):
-        u = str(u_id)
-        v = str(v_id)
-        return f'{u}_{v}'
-
-    def put_edge(self, u_id, v_id):
-        key = self._get_key(u_id, v_id)
-        self.matrix_dict[key] = True
-        key = self._get_key(v_id, u_id)
-        self.matrix_dict[key] = True
-
-    def get(self, u_id, v_id):
-        key = self._get_key(u_id, v_id)
-        if key in self.matrix_dict and self.matrix_dict[key]:
-            return True
-        return False
+ALGORITHMS = ('cnm', 'louvain', 'leiden')
+CLUSTER_ALGORITHMS = ('louvain', 'leiden', 'label_propagation')
+# Gains smaller than this do not move a vertex in Louvain local moving
+MIN_GAIN = 1e-12
+# Louvain checks the deadline after this many vertices
+DEADLINE_CHECK = 1024
 
 
-class CommunityData:
-    vertex_list: [int]
-    modularity: float
-    neighbour_list: []
-
-    def __init__(self, community_manager, vertex_list):
-        self.vertex_list = vertex_list
-        self.neighbour_list = []
-        # self.modularity = community_manager.calculate_modularity([self.vertex_list])
-
-    def add_neighbour(self, item):
-        self.neighbour_list.append(item)
-
-    def remove_neighbour(self, item):
-        try:
-            self.neighbour_list.remove(item)
-        except ValueError:
-            pass
+def _ranges(starts, lengths):
+    """
+        Concatenated ranges [start, start + length)
+    """
+    shifts = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return shifts + np.arange(lengths.sum(), dtype=np.int64)
 
 
-class ModularityDeltaData:
+class CsrGraph:
+    """
+        Undirected graph with vertices remapped to 0..n-1:
+            vertex_ids     - original id of every vertex
+            indptr/indices - CSR adjacency, neighbours of vertex i are indices[indptr[i]:indptr[i + 1]],
+                             sorted, without duplicates and self loops
+            weights        - number of (duplicate) edges of every CSR entry
+            loops          - number of self loops of every vertex
+            degree         - number of edge ends at every vertex (duplicate edges and self loops included)
+            m              - number of edges
+    """
 
-    def __init__(self, comm1, comm2, modularity_delta):
-        self.comm1 = comm1
-        self.comm2 = comm2
-        self.modularity_delta = modularity_delta
+    def __init__(self, vertex_ids, indptr, indices, degree, m, weights=None, loops=None):
+        self.vertex_ids = vertex_ids
+        self.indptr = indptr
+        self.indices = indices
+        self.degree = degree
+        self.m = m
+        self.weights = weights if weights is not None else np.ones(len(indices), dtype=np.int64)
+        self.loops = loops if loops is not None else np.zeros(len(vertex_ids), dtype=np.int64)
+        self._index = None
+
+    def __len__(self):
+        return len(self.vertex_ids)
+
+    @classmethod
+    def from_edges(cls, sources, targets, vertex_ids):
+        """
+            Graph of edges given as arrays of vertex indices
+        """
+        n = len(vertex_ids)
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        degree = np.bincount(np.concatenate((sources, targets)), minlength=n)
+
+        loop = sources == targets
+        rows = np.concatenate((sources[~loop], targets[~loop]))
+        cols = np.concatenate((targets[~loop], sources[~loop]))
+        keys, weights = np.unique(rows * n + cols, return_counts=True)
+        rows, indices = np.divmod(keys, n)
+        indptr = np.searchsorted(rows, np.arange(n + 1))
+        loops = np.bincount(sources[loop], minlength=n)
+        return cls(vertex_ids, indptr, indices, degree, len(sources), weights, loops)
+
+    @classmethod
+    def from_json(cls, graph_dict):
+        """
+            Graph of a visualization with 'nodes' and 'edges' (vis.js format)
+        """
+        vertex_ids = []
+        index = {}
+        for node in graph_dict['nodes']:
+            if node['id'] not in index:
+                index[node['id']] = len(vertex_ids)
+                vertex_ids.append(node['id'])
+        edges = graph_dict['edges']
+        sources = np.fromiter((index[edge['from']] for edge in edges), dtype=np.int64, count=len(edges))
+        targets = np.fromiter((index[edge['to']] for edge in edges), dtype=np.int64, count=len(edges))
+        graph = cls.from_edges(sources, targets, vertex_ids)
+        graph._index = index
+        return graph
+
+    @property
+    def index(self):
+        """
+            Vertex index of every original id
+        """
+        if self._index is None:
+            self._index = {v: i for i, v in enumerate(self.vertex_ids)}
+        return self._index
 
-    def __gt__(self, other):
-        return self.modularity_delta < other.modularity_delta
+    def neighbours(self, vertex):
+        return self.indices[self.indptr[vertex]:self.indptr[vertex + 1]]
 
-    def __lt__(self, other):
-        return self.modularity_delta > other.modularity_delta
+    def edges(self):
+        """
+            (sources, targets) of distinct edges without self loops, sources < targets
+        """
+        rows = np.repeat(np.arange(len(self)), np.diff(self.indptr))
+        upper = rows < self.indices
+        return rows[upper], self.indices[upper]
 
-    def __eq__(self, other):
-        return self.modularity_delta == other.modularity_delta
+    def modularity(self, community_list):
+        """
+            Modularity of communities given as lists of vertex indices, pairs of a vertex
+            with itself are not counted
+        """
+        if self.m == 0:
+            return 0.0
+        total = 0
+        for community in community_list:
+            community = np.asarray(community, dtype=np.int64)
+            inside = np.zeros(len(self), dtype=bool)
+            inside[community] = True
+            lengths = np.diff(self.indptr)[community]
+            internal = int(inside[self.indices[_ranges(self.indptr[community], lengths)]].sum())
+            k = self.degree[community]
+            total += internal * 2 * self.m - (int(k.sum()) ** 2 - int((k * k).sum()))
+        return total / (2 * self.m) ** 2
+
+    def partition_modularity(self, membership):
+        """
+            Newman modularity of a partition given as community of every vertex, duplicate
+            edges and self loops are counted
+        """
+        if self.m == 0:
+            return 0.0
+        membership = np.asarray(membership)
+        rows = np.repeat(np.arange(len(self)), np.diff(self.indptr))
+        internal = self.weights[membership[rows] == membership[self.indices]].sum() + 2 * self.loops.sum()
+        totals = np.bincount(membership, weights=self.degree)
+        return float(internal / (2 * self.m) - ((totals / (2 * self.m)) ** 2).sum())
+
+    def weighted_adjacency(self):
+        """
+            CSR (indptr, indices, weights) with self loops on the diagonal counted twice,
+            so that row sums are degrees
+        """
+        n = len(self)
+        rows = np.repeat(np.arange(n), np.diff(self.indptr))
+        diagonal = np.flatnonzero(self.loops)
+        return _sum_csr(np.concatenate((rows, diagonal)), np.concatenate((self.indices, diagonal)),
+                        np.concatenate((self.weights, 2 * self.loops[diagonal])).astype(float), n)
 
 
-class PriorityQueue:
+def _sum_csr(rows, cols, weights, n):
+    """
+        CSR arrays of a matrix given by coordinates, weights of equal coordinates are summed
+    """
+    keys, inverse = np.unique(rows * n + cols, return_inverse=True)
+    weights = np.bincount(inverse, weights=weights, minlength=len(keys))
+    rows, cols = np.divmod(keys, n)
+    return np.searchsorted(rows, np.arange(n + 1)), cols, weights
 
-    def __init__(self):
-        self.h = []
 
-    def push(self, item: ModularityDeltaData):
-        heapq.heappush(self.h, item)
+def _time_is_up(deadline):
+    return deadline is not None and time.monotonic() > deadline
 
-    def pop(self):
-        return heapq.heappop(self.h)
 
-    def is_empty(self):
-        return len(self.h) == 0
+def _local_moving(indptr, indices, weights, deadline=None):
+    """
+        Louvain phase one: vertices are moved to the neighbouring community with the
+        largest modularity gain until no move improves it. Returns community of every
+        vertex, whether any vertex moved and whether the deadline passed.
+    """
+    n = len(indptr) - 1
+    degree = np.bincount(np.repeat(np.arange(n), np.diff(indptr)), weights=weights, minlength=n)
+    m2 = float(degree.sum())
+    indptr, indices, weights, degree = indptr.tolist(), indices.tolist(), weights.tolist(), degree.tolist()
+    community = list(range(n))
+    total = list(degree)
+    moved = False
+    improved = True
+    while improved:
+        improved = False
+        for i in range(n):
+            if i % DEADLINE_CHECK == 0 and _time_is_up(deadline):
+                return community, moved, True
+            k = degree[i]
+            current = community[i]
+            links = {}
+            for p in range(indptr[i], indptr[i + 1]):
+                j = indices[p]
+                if j != i:
+                    links[community[j]] = links.get(community[j], 0.0) + weights[p]
+            total[current] -= k
+            best = current
+            best_gain = links.get(current, 0.0) - total[current] * k / m2
+            for c, w in links.items():
+                gain = w - total[c] * k / m2
+                if gain > best_gain + MIN_GAIN:
+                    best, best_gain = c, gain
+            total[best] += k
+            if best != current:
+                community[i] = best
+                improved = moved = True
+    return community, moved, False
+
+
+def louvain(graph, deadline=None):
+    """
+        Multi-level Louvain method. Returns (membership, levels, timed_out), membership is
+        the community of every vertex of the graph.
+    """
+    membership = np.arange(len(graph))
+    if graph.m == 0:
+        return membership, 0, False
+    indptr, indices, weights = graph.weighted_adjacency()
+    levels = 0
+    while True:
+        community, moved, timed_out = _local_moving(indptr, indices, weights, deadline)
+        if moved:
+            levels += 1
+            _, community = np.unique(community, return_inverse=True)
+            membership = community[membership]
+            # phase two: communities become vertices of the next level
+            rows = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+            indptr, indices, weights = _sum_csr(community[rows], community[indices], weights,
+                                                int(community.max()) + 1)
+        if not moved or timed_out:
+            return membership, levels, timed_out
+
+
+def leiden(graph, deadline=None):
+    """
+        Leiden method of igraph, run one iteration at a time so the deadline is checked
+        between iterations. Returns (membership, iterations, timed_out).
+    """
+    from igraph import Graph
+
+    rows, cols = graph.edges()
+    upper = np.repeat(np.arange(len(graph)), np.diff(graph.indptr)) < graph.indices
+    loops = np.flatnonzero(graph.loops)
+    g = Graph(n=len(graph), edges=list(zip(rows.tolist(), cols.tolist())) + [(v, v) for v in loops.tolist()])
+    g.es['weight'] = graph.weights[upper].tolist() + graph.loops[loops].tolist()
+
+    membership = None
+    iterations = 0
+    while True:
+        partition = g.community_leiden(objective_function='modularity', weights='weight',
+                                       initial_membership=membership, n_iterations=1)
+        iterations += 1
+        if partition.membership == membership:
+            return np.asarray(membership), iterations, False
+        membership = partition.membership
+        if _time_is_up(deadline):
+            return np.asarray(membership), iterations, True
+
+
+def cluster_membership(graph, g, algorithm, deadline=None):
+    """
+        Clusters of igraph Graph g (built from CsrGraph graph) by igraph Louvain, Leiden
+        or label propagation. Returns (membership, timed_out), when the deadline has
+        already passed the connected components are returned.
+    """
+    if _time_is_up(deadline):
+        return g.components().membership, True
+    if algorithm == 'leiden':
+        membership, _, timed_out = leiden(graph, deadline)
+        return membership.tolist(), timed_out
+    if algorithm == 'label_propagation':
+        return g.community_label_propagation().membership, False
+    return g.community_multilevel().membership, False
 
-    def size(self):
-        return len(self.h)
 
+class CommunityData:
+    vertex_list: [int]
 
-def update_progress(index, linesAmount, obj):
-    if obj is not None and linesAmount != 0:
-        progress = float(index) / float(linesAmount) * float(100)
-        obj.progress = "Progress: " + str(round(progress, 2)) + "%"
-        obj.save()
+    def __init__(self, vertex_list):
+        self.vertex_list = vertex_list
 
 
 class CommunityManager:
@@ -94,123 +279,169 @@ class CommunityManager:
         'https://www.inesc-id.pt/ficheiros/publicacoes/5176.pdf'
     """
 
-    def __init__(self, graph_dict, result=None):
+    def __init__(self, graph_dict, result=None, graph=None):
         assert 'nodes' in graph_dict
         assert 'edges' in graph_dict
         self.graph_dict = graph_dict
         self.result = result
-        self.vertex_list = self._get_vertex_list()
-        self.degree_list = {}
-        self.m = len(self.graph_dict['edges'])
-        # matrix = A
-        self.matrix = self.create_matrix()
-
-    def _get_vertex_list(self):
-        return set(x['id'] for x in self.graph_dict['nodes'])
-
-    def create_matrix(self):
-        matrix = Matrix()
-        for edge in self.graph_dict['edges']:
-            matrix.put_edge(edge['from'], edge['to'])
-            if edge['from'] not in self.degree_list:
-                self.degree_list[edge['from']] = 0
-            if edge['to'] not in self.degree_list:
-                self.degree_list[edge['to']] = 0
-            self.degree_list[edge['from']] += 1
-            self.degree_list[edge['to']] += 1
-        return matrix
+        self.graph = graph if graph is not None else CsrGraph.from_json(graph_dict)
+        self.m = self.graph.m
 
     def calculate_modularity(self, community_list):
         """
             community_list is a list of vertex_id int list e.g:
                 [ [1,-1,2], [2,3,-3] ]
         """
-        assert self.degree_list
-        modularity = 0
-        for community in community_list:
-            for v in community:
-                for u in community:
-                    if u == v:
-                        continue
-                    a = 1 if self.matrix.get(u, v) else 0
-                    modularity += a - ((self.degree_list[u] * self.degree_list[v]) / (2*self.m))
-        return modularity / (2*self.m)
-
-    def _init_data(self, communities, community_dict, queue):
-        # Create community list (every vertex is new community at the beginning)
-        for vertex in self.vertex_list:
-            community = CommunityData(
-                self, vertex_list=[vertex]
-            )
-            communities.append(community)
-            community_dict[vertex] = community
-
-        # Set neighbours to community list
-        for community in communities:
-            vertex = community.vertex_list[0]
-            neighbour = [x['from'] for x in self.graph_dict['edges'] if x['to'] == vertex] \
-                        + [x['to'] for x in self.graph_dict['edges'] if x['from'] == vertex]
-            for n in neighbour:
-                community.add_neighbour(community_dict[n])
-
-        # Init cheap H
-        for u, v in combinations(self.vertex_list, 2):
-            if v != u and self.matrix.get(u, v):
-                queue.push(
-                    ModularityDeltaData(community_dict[u], community_dict[v], 0)
-                )
-
-    def calculate_communities(self) -> [[int]]:
-        queue = PriorityQueue()
-        communities = []
-        community_dict = {}
-        self._init_data(communities, community_dict, queue)
-
-        x = 0
-        while not queue.is_empty():
-            x = x + 1
-            if x % 1000 == 0:
-                update_progress(1, queue.size(), self.result)
-            c = queue.pop()
-            cx = c.comm1
-            cy = c.comm2
-            if c.modularity_delta < 0 or not (cx in communities and cy in communities):
+        index = self.graph.index
+        return self.graph.modularity([[index[v] for v in community] for community in community_list])
+
+    def _init_delta(self):
+        """
+            Initial sparse rows of modularity change: dq[i][j] = 2 * (e_ij - a_i * a_j)
+            for every pair of adjacent vertices, a_i = k_i / 2m
+        """
+        graph = self.graph
+        a = graph.degree / (2 * self.m)
+        rows = np.repeat(np.arange(len(graph)), np.diff(graph.indptr))
+        deltas = (2 * (1 / (2 * self.m) - a[rows] * a[graph.indices])).tolist()
+        indices = graph.indices.tolist()
+        indptr = graph.indptr.tolist()
+        dq = [dict(zip(indices[start:end], deltas[start:end])) for start, end in zip(indptr, indptr[1:])]
+        return dq, a.tolist()
+
+    def calculate_communities(self, deadline=None) -> [CommunityData]:
+        """
+            Clauset-Newman-Moore greedy merging: communities with the largest modularity
+            gain are merged while the gain is not negative. Gains are kept in sparse rows,
+            stale heap entries are skipped when popped. Merging stops at the deadline
+            (time.monotonic() value).
+        """
+        self.timed_out = False
+        vertex_ids = self.graph.vertex_ids
+        if self.m == 0:
+            return [CommunityData(vertex_list=[v]) for v in vertex_ids]
+        dq, a = self._init_delta()
+
+        heap = [(-delta, i, j) for i, row in enumerate(dq) for j, delta in row.items() if i < j]
+        heapq.heapify(heap)
+        parent = list(range(len(vertex_ids)))
+        merged_at = [0] * len(vertex_ids)
+        progress = ProgressReporter(self.result, len(vertex_ids) - 1)
+
+        merges = 0
+        while heap:
+            delta, i, j = heapq.heappop(heap)
+            delta = -delta
+            if delta < 0:
+                break
+            if parent[i] != i or parent[j] != j or dq[i].get(j) != delta:
                 continue
 
-            cz = CommunityData(
-                self, vertex_list=cx.vertex_list + cy.vertex_list
-            )
-            communities.remove(cx)
-            communities.remove(cy)
-            communities.append(cz)
-
-            neighbours = set(cy.neighbour_list + cx.neighbour_list)
-            neighbours.remove(cx)
-            neighbours.remove(cy)
-
-            for n in neighbours:
-                self._update_neighbours(cz, cx, cy, n)
-
-                c = communities.copy()
-                c.remove(n)
-                c.remove(cz)
-                c.append(CommunityData(
-                    self, vertex_list=n.vertex_list + cz.vertex_list
-                ))
-
-                modularity_delta = self.calculate_modularity(self.get_community_list(c)) \
-                                   - self.calculate_modularity(self.get_community_list(communities))
-                modularity_data = ModularityDeltaData(cz, n, modularity_delta)
-                queue.push(modularity_data)
-        return communities
+            if _time_is_up(deadline):
+                self.timed_out = True
+                break
+            merges += 1
+            progress.update(merges)
+            # merge the smaller row into the larger one
+            x, y = (i, j) if len(dq[i]) <= len(dq[j]) else (j, i)
+            row_x, row_y = dq[x], dq[y]
+            del row_x[y]
+            del row_y[x]
+            for k, delta_xk in row_x.items():
+                if k in row_y:
+                    new_delta = row_y[k] + delta_xk
+                else:
+                    new_delta = delta_xk - 2 * a[y] * a[k]
+                row_y[k] = new_delta
+                del dq[k][x]
+                dq[k][y] = new_delta
+                heapq.heappush(heap, (-new_delta, min(y, k), max(y, k)))
+            for k, delta_yk in row_y.items():
+                if k not in row_x:
+                    new_delta = delta_yk - 2 * a[x] * a[k]
+                    row_y[k] = new_delta
+                    dq[k][y] = new_delta
+                    heapq.heappush(heap, (-new_delta, min(y, k), max(y, k)))
+            dq[x] = {}
+            a[y] += a[x]
+            parent[x] = y
+            merged_at[y] = merges
+
+        members = {}
+        for vertex, vertex_id in enumerate(vertex_ids):
+            members.setdefault(self.community_of(parent, vertex), []).append(vertex_id)
+        roots = sorted(members, key=lambda c: merged_at[c])
+        return [CommunityData(vertex_list=members[c]) for c in roots]
+
+    def find_communities(self, algorithm='cnm', time_budget=None):
+        """
+            Communities found by 'cnm', 'louvain' or 'leiden' within time_budget seconds
+            (the best partition found so far when the time is up) and statistics:
+            modularity, levels (Louvain levels, Leiden iterations), elapsed time
+        """
+        start = time.monotonic()
+        deadline = start + time_budget if time_budget is not None else None
+        levels = 1
+        if algorithm == 'louvain':
+            membership, levels, timed_out = louvain(self.graph, deadline)
+        elif algorithm == 'leiden':
+            membership, levels, timed_out = leiden(self.graph, deadline)
+        else:
+            algorithm = 'cnm'
+            communities = self.calculate_communities(deadline)
+            timed_out = self.timed_out
+            index = self.graph.index
+            membership = np.zeros(len(self.graph), dtype=np.int64)
+            for group, community in enumerate(communities):
+                membership[[index[v] for v in community.vertex_list]] = group
+
+        if algorithm != 'cnm':
+            communities = [CommunityData(vertex_list=[]) for _ in range(int(membership.max(initial=-1)) + 1)]
+            for vertex_id, group in zip(self.graph.vertex_ids, membership.tolist()):
+                communities[group].vertex_list.append(vertex_id)
+        stats = {
+            "algorithm": algorithm,
+            "modularity": self.graph.partition_modularity(membership),
+            "communities": len(communities),
+            "levels": levels,
+            "elapsed": round(time.monotonic() - start, 3),
+            "timedOut": timed_out,
+        }
+        return communities, stats
+
+    def node_membership(self, communities):
+        """
+            Community of every node of the visualization, in order of graph_dict['nodes']
+        """
+        group = {}
+        for index, community in enumerate(communities):
+            for vertex in community.vertex_list:
+                group[vertex] = index
+        return [group[node['id']] for node in self.graph_dict['nodes']]
+
+    @staticmethod
+    def community_of(parent, vertex):
+        """
+            Union-find lookup with path halving
+        """
+        while parent[vertex] != vertex:
+            parent[vertex] = parent[parent[vertex]]
+            vertex = parent[vertex]
+        return vertex
 
     @staticmethod
     def get_community_list(data):
         return [x.vertex_list for x in data]
 
-    @staticmethod
-    def _update_neighbours(cz, cx, cy, n: CommunityData):
-        n.remove_neighbour(cx)
-        n.remove_neighbour(cy)
-        n.add_neighbour(cz)
-        cz.add_neighbour(n)
+
+def apply_membership(graph_dict, membership):
+    """
+        Sets 'group' of every node from membership (aligned with graph_dict['nodes'])
+        and colours edges black
+    """
+    for node, group in zip(graph_dict['nodes'], membership):
+        node['group'] = group
+    for edge in graph_dict['edges']:
+        if 'color' in edge:
+            edge['color']['color'] = 'black'
+    return graph_dict
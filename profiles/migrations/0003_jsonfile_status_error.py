@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.7 on 2026-10-18 12:00
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0002_jsonfile_options'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='jsonfile',
+            name='status',
+            field=models.CharField(choices=[('empty', 'empty'), ('pending', 'pending'), ('done', 'done'), ('error', 'error')], default='empty', max_length=10),
+        ),
+    ]
@@ -1,5 +1,8 @@
+import glob
+import hashlib
 import logging
 import os
+import shutil
 
 from django.contrib.postgres.fields import JSONField
 from django.contrib.postgres.fields import ArrayField
@@ -7,7 +10,11 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.dispatch.dispatcher import receiver
 
-from formulavis.settings import MEDIA_URL
+from formulavis.settings import MEDIA_URL, RESULT_STORAGE
+from profiles.communities import apply_membership
+from profiles.results import is_stored, result_metadata, materialized, write_result, read_result
+from profiles.vis_tasks.cnf_parser import remove_clause_cache, file_hash
+from profiles.vis_tasks.vis_resolution import MODES as RESOLUTION_MODES
 
 logger = logging.getLogger('email_on_exception_logger')
 
@@ -15,6 +22,7 @@ STATUS = (
     ('empty', 'empty'),
     ('pending', 'pending'),
     ('done', 'done'),
+    ('error', 'error'),
 )
 
 FORMATS = (
@@ -38,6 +46,53 @@ FORMATS = (
 )
 
 
+def choice(values):
+    """
+    Type of an option accepting only given values
+    """
+    def parse(value):
+        if value not in values:
+            raise ValueError(value)
+        return value
+    return parse
+
+
+# Options of a visualization which can be passed as query parameters when it is requested
+VIS_OPTIONS = {
+    'rows': int,
+    'cols': int,
+    'order': str,
+    'edges': int,
+    'reduce': str,
+    'degree': int,
+    'seed': int,
+    'resolution': choice(RESOLUTION_MODES),
+    'fanout': int,
+    'algorithm': str,
+    'time': float,
+    'layout': str,
+    'summary': str,
+    'group': int,
+    'nodes': int,
+    'depth': int,
+    'decisions': int,
+    'conflicts': int,
+}
+
+
+def parse_vis_options(query_params):
+    options = {}
+    for name, option_type in VIS_OPTIONS.items():
+        value = query_params.get(name)
+        if value is None:
+            continue
+        try:
+            options[name] = option_type(value)
+        except (TypeError, ValueError):
+            continue
+    return options
+
+
 class Profile(models.Model):
     user = models.OneToOneField(User, related_name='profile')
 
@@ -51,6 +106,8 @@ class TextFile(models.Model):
     content = models.FileField(upload_to=MEDIA_URL)
     minimized = models.BooleanField(default=False)
     kind = models.CharField(max_length=10)
+    # sha1 of the content, names its clause cache
+    content_hash = models.CharField(max_length=40, blank=True, default='')
 
     def __str__(self):
         return self.name
@@ -61,6 +118,7 @@ class JsonFile(models.Model):
     status = models.CharField(choices=STATUS, default='empty', max_length=10)
     json_format = models.CharField(choices=FORMATS, max_length=255)
     selected_vars = ArrayField(base_field=models.IntegerField(), default=list)
+    options = JSONField(default=dict)
     content = JSONField(default={})
     progress = models.TextField(default="0")
     task_id = models.CharField(default="", max_length=255)
@@ -69,6 +127,89 @@ class JsonFile(models.Model):
         return f'{self.text_file.name}: {self.json_format}'
 
 
+def heatmap_tiles_path(json_file):
+    """
+    Directory with heatmap tiles of a visualization, next to its formula file
+    """
+    text_file_dir = os.path.dirname(json_file.text_file.content.path)
+    return os.path.join(text_file_dir, '.heatmap_tiles', str(json_file.pk))
+
+
+def graph_summary_path(json_file):
+    """
+    Directory with levels of a summarized factor or interaction graph, next to its formula file
+    """
+    text_file_dir = os.path.dirname(json_file.text_file.content.path)
+    return os.path.join(text_file_dir, '.graph_summaries', str(json_file.pk))
+
+
+def dpll_tree_path(json_file):
+    """
+    Directory with DPLL trees of a visualization, one for every heuristic, next to its formula file
+    """
+    text_file_dir = os.path.dirname(json_file.text_file.content.path)
+    return os.path.join(text_file_dir, '.dpll_trees', str(json_file.pk))
+
+
+def result_path(json_file):
+    """
+    Compressed result of a visualization stored in a file, next to its formula file
+    """
+    text_file_dir = os.path.dirname(json_file.text_file.content.path)
+    return os.path.join(text_file_dir, '.results', f'{json_file.pk}.json.gz')
+
+
+def save_content(json_file, data):
+    """
+    Sets the result of a visualization, with 'file' RESULT_STORAGE it is written to result_path
+    and content keeps only its metadata
+    """
+    if RESULT_STORAGE == 'file':
+        size = write_result(result_path(json_file), data)
+        json_file.content = result_metadata(data, size)
+    else:
+        json_file.content = materialized(data)
+
+
+def load_content(json_file):
+    """
+    The whole result of a visualization, also when it is stored in a file
+    """
+    if is_stored(json_file.content):
+        return read_result(result_path(json_file))
+    return json_file.content
+
+
+def community_result(json_file, visualization):
+    """
+    Writes the graph of visualization with the membership of a community result applied to
+    result_path of the community result, unless it is there already and newer than the result
+    of visualization (which changes e.g. when its layout is added)
+    """
+    path = result_path(json_file)
+    source = result_path(visualization)
+    if not os.path.isfile(source) or \
+            (os.path.isfile(path) and os.path.getmtime(path) >= os.path.getmtime(source)):
+        return path
+    content = json_file.content
+    graph_dict = apply_membership(read_result(source), content['membership'])
+    graph_dict['stats'] = content.get('stats')
+    write_result(path, graph_dict)
+    return path
+
+
+def layout_cache_path(json_file):
+    """
+    Node positions of a visualization, shared by visualizations of the same formula,
+    format and selected variables
+    """
+    text_file_dir = os.path.dirname(json_file.text_file.content.path)
+    selected_vars = ','.join(str(v) for v in sorted(json_file.selected_vars))
+    vars_hash = hashlib.sha1(selected_vars.encode()).hexdigest()[:12]
+    name = f'{json_file.text_file.pk}_{json_file.json_format}_{vars_hash}.npz'
+    return os.path.join(text_file_dir, '.layouts', name)
+
+
 @receiver(models.signals.pre_delete, sender=TextFile)
 def auto_delete_file_form_disk(sender, instance, **kwargs):
     """
@@ -78,12 +219,55 @@ def auto_delete_file_form_disk(sender, instance, **kwargs):
         return False
 
     try:
-        old_file = TextFile.objects.get(pk=instance.pk).content
+        text_file = TextFile.objects.get(pk=instance.pk)
     except TextFile.DoesNotExist:
         return False
 
+    old_file = text_file.content
+    remove_clause_cache(old_file.path, text_file.content_hash)
     if os.path.isfile(old_file.path):
         os.remove(old_file.path)
+    layouts = os.path.join(os.path.dirname(old_file.path), '.layouts', f'{instance.pk}_*.npz')
+    for path in glob.glob(layouts):
+        os.remove(path)
+
+
+@receiver(models.signals.pre_delete, sender=JsonFile)
+def auto_delete_heatmap_tiles(sender, instance, **kwargs):
+    """
+    Delete heatmap tiles from disk after deleting visualization
+    """
+    if instance.json_format == 'sat_vis_heatmap':
+        shutil.rmtree(heatmap_tiles_path(instance), ignore_errors=True)
+
+
+@receiver(models.signals.pre_delete, sender=JsonFile)
+def auto_delete_graph_summary(sender, instance, **kwargs):
+    """
+    Delete levels of a summarized graph from disk after deleting visualization
+    """
+    if instance.options.get('summary'):
+        shutil.rmtree(graph_summary_path(instance), ignore_errors=True)
+
+
+@receiver(models.signals.pre_delete, sender=JsonFile)
+def auto_delete_dpll_trees(sender, instance, **kwargs):
+    """
+    Delete DPLL trees from disk after deleting visualization
+    """
+    if instance.json_format == 'sat_vis_dpll':
+        shutil.rmtree(dpll_tree_path(instance), ignore_errors=True)
+
+
+@receiver(models.signals.pre_delete, sender=JsonFile)
+def auto_delete_result(sender, instance, **kwargs):
+    """
+    Delete result file from disk after deleting visualization
+    """
+    # also the merged graph of a community result written by community_result
+    path = result_path(instance)
+    if os.path.isfile(path):
+        os.remove(path)
 
 
 @receiver(models.signals.post_save, sender=TextFile)
@@ -94,3 +278,15 @@ def create_minimized_version(sender, instance, created, *args, **kwargs):
     if created and not instance.minimized:
         from profiles.tasks import create_minimized
         create_minimized.delay(instance.pk, instance.profile.pk)
+
+
+@receiver(models.signals.post_save, sender=TextFile)
+def create_clause_cache_for_file(sender, instance, created, *args, **kwargs):
+    """
+    Store hash of a new file and run task for parsing it into the binary clause cache
+    """
+    if created:
+        instance.content_hash = file_hash(instance.content.path)
+        TextFile.objects.filter(pk=instance.pk).update(content_hash=instance.content_hash)
+        from profiles.tasks import create_clause_cache
+        create_clause_cache.delay(instance.pk)
@@ -0,0 +1,139 @@
+import time
+
+import redis
+
+from formulavis.settings import PROGRESS_BACKEND, PROGRESS_MIN_STEP, PROGRESS_MIN_INTERVAL, \
+    REDIS_HOST, REDIS_PORT, REDIS_DB, CANCEL_CHECK_INTERVAL
+
+REDIS_KEY = 'forvis:progress:{}'
+# progress of parts of a task running in parallel, one hash field for every part
+PARTS_KEY = 'forvis:progress:{}:parts'
+# formats whose tasks report progress in parts
+PARTS_FORMATS = ('sat_vis_dpll',)
+CANCEL_KEY = 'forvis:cancel:{}'
+# formats whose running tasks check CancelCheck and stop when cancelled
+CANCELLABLE_FORMATS = ('sat_vis_dpll',)
+REDIS_KEY_EXPIRE = 24 * 60 * 60
+
+_redis_client = None
+
+
+def get_redis_client():
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = redis.StrictRedis(host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB)
+    return _redis_client
+
+
+def format_progress(progress):
+    return "Progress: " + str(round(progress, 2)) + "%"
+
+
+def get_progress(obj):
+    """
+        Current progress message of JsonFile, also when it is published to redis or
+        reported by parts of its task
+    """
+    if obj.status != 'pending':
+        return obj.progress
+    try:
+        if obj.json_format in PARTS_FORMATS:
+            parts = get_redis_client().hgetall(PARTS_KEY.format(obj.pk))
+            if parts:
+                return ' | '.join(parts[part].decode() for part in sorted(parts))
+        if PROGRESS_BACKEND == 'redis':
+            value = get_redis_client().get(REDIS_KEY.format(obj.pk))
+            if value is not None:
+                return value.decode()
+    except redis.RedisError:
+        # progress published to redis is not available, the last one saved is shown
+        pass
+    return obj.progress
+
+
+class ProgressReporter:
+    """
+        Throttled progress of a task. The progress is written only when it grew by at least
+        min_step percent or min_interval seconds passed since the last write. The database
+        backend updates only the 'progress' column of the JsonFile row. Progress of a part
+        of a task running in parallel with others is kept in redis under its own name.
+    """
+
+    def __init__(self, obj, total, min_step=PROGRESS_MIN_STEP, min_interval=PROGRESS_MIN_INTERVAL,
+                 backend=PROGRESS_BACKEND, part=None):
+        self.obj = obj
+        self.part = part
+        self.total = total
+        self.min_step = min_step
+        self.min_interval = min_interval
+        self.backend = backend
+        self.last_progress = None
+        self.last_time = 0.0
+
+    def update(self, index):
+        if self.obj is None or not self.total:
+            return
+        progress = float(index) / float(self.total) * float(100)
+        if self.last_progress is not None:
+            if progress == self.last_progress:
+                return
+            if progress - self.last_progress < self.min_step and \
+                    time.monotonic() - self.last_time < self.min_interval:
+                return
+        self.last_progress = progress
+        self.write(format_progress(progress))
+
+    def message(self, text):
+        if self.obj is None:
+            return
+        self.write(text)
+
+    def write(self, text):
+        self.last_time = time.monotonic()
+        if self.part is not None:
+            client = get_redis_client()
+            client.hset(PARTS_KEY.format(self.obj.pk), self.part, text)
+            client.expire(PARTS_KEY.format(self.obj.pk), REDIS_KEY_EXPIRE)
+            return
+        self.obj.progress = text
+        if self.backend == 'redis':
+            get_redis_client().set(REDIS_KEY.format(self.obj.pk), text, ex=REDIS_KEY_EXPIRE)
+        else:
+            self.obj.save(update_fields=['progress'])
+
+
+def cancel(obj):
+    """
+        Asks running tasks of JsonFile to stop
+    """
+    get_redis_client().set(CANCEL_KEY.format(obj.pk), 1, ex=REDIS_KEY_EXPIRE)
+
+
+def clear_run(obj):
+    """
+        Removes the cancel request and progress parts of the last run of JsonFile's task
+    """
+    get_redis_client().delete(CANCEL_KEY.format(obj.pk), PARTS_KEY.format(obj.pk))
+
+
+class CancelCheck:
+    """
+        Throttled check whether tasks of JsonFile were asked to stop, redis is asked at most
+        once per interval seconds. Instances are called like a function.
+    """
+
+    def __init__(self, obj, interval=CANCEL_CHECK_INTERVAL):
+        self.obj = obj
+        self.interval = interval
+        self.cancelled = False
+        self.last_time = None
+
+    def __call__(self):
+        if self.cancelled:
+            return True
+        now = time.monotonic()
+        if self.last_time is not None and now - self.last_time < self.interval:
+            return False
+        self.last_time = now
+        self.cancelled = bool(get_redis_client().exists(CANCEL_KEY.format(self.obj.pk)))
+        return self.cancelled
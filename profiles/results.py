@@ -0,0 +1,239 @@
+import gzip
+import json
+import os
+import struct
+import tempfile
+import zlib
+from collections.abc import Iterator
+
+from formulavis.settings import RESULT_COMPRESSION, RESULT_CHUNK_SIZE
+
+# content of a JsonFile whose result is stored in a file keeps only these keys besides the markers
+STORED_KEY = 'stored'
+SIZE_KEY = 'stored_size'
+METADATA_KEYS = ('info', 'layout', 'error')
+# placeholder of the stored result in a document sent with it
+RESULT = '\0stored result\0'
+
+# gzip header without file name and time, the deflate data of a result file ends with a sync
+# flush followed by an empty final block, so it can be copied into another gzip stream
+GZIP_HEADER = b'\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff'
+FINAL_BLOCK = b'\x03\x00'
+TRAILER_SIZE = 8
+
+_encoder = json.JSONEncoder()
+
+
+def is_stored(content):
+    return isinstance(content, dict) and content.get(STORED_KEY) == 'file'
+
+
+def result_metadata(data, size):
+    metadata = {key: data[key] for key in METADATA_KEYS if key in data}
+    metadata[STORED_KEY] = 'file'
+    metadata[SIZE_KEY] = size
+    return metadata
+
+
+def materialized(value):
+    """
+        Result with iterators (also in nested dicts) turned into lists
+    """
+    if isinstance(value, Iterator):
+        return list(value)
+    if isinstance(value, dict):
+        return {key: materialized(item) for key, item in value.items()}
+    return value
+
+
+class _DeflateWriter:
+    """
+        Text written to a binary file as raw deflate data in blocks of about buffer_size
+        bytes, keeps crc32 and size of the text for the gzip trailer
+    """
+
+    def __init__(self, f, level, buffer_size=RESULT_CHUNK_SIZE):
+        self.f = f
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+        self.buffer_size = buffer_size
+        self.buffer = []
+        self.buffered = 0
+        self.crc = 0
+        self.size = 0
+
+    def write(self, text):
+        self.buffer.append(text)
+        self.buffered += len(text)
+        if self.buffered >= self.buffer_size:
+            self.flush_buffer()
+
+    def flush_buffer(self):
+        data = ''.join(self.buffer).encode('utf-8')
+        self.buffer, self.buffered = [], 0
+        self.crc = zlib.crc32(data, self.crc)
+        self.size += len(data)
+        self.f.write(self.compressor.compress(data))
+
+    def close(self):
+        self.flush_buffer()
+        self.f.write(self.compressor.flush(zlib.Z_SYNC_FLUSH))
+        self.f.write(self.compressor.flush())
+
+
+def _write_value(writer, value):
+    if isinstance(value, Iterator):
+        writer.write('[')
+        for index, item in enumerate(value):
+            if index:
+                writer.write(', ')
+            if isinstance(item, Iterator):
+                _write_value(writer, item)
+            else:
+                writer.write(_encoder.encode(item))
+        writer.write(']')
+    elif isinstance(value, dict):
+        writer.write('{')
+        for index, (key, item) in enumerate(value.items()):
+            if index:
+                writer.write(', ')
+            writer.write(json.dumps(key) + ': ')
+            _write_value(writer, item)
+        writer.write('}')
+    else:
+        writer.write(_encoder.encode(value))
+
+
+def write_result(path, data):
+    """
+        Writes a result dict to a gzip compressed JSON file and returns the size of the JSON.
+        Values which are iterators (e.g. generators of nodes and edges, also in nested dicts)
+        are written item by item as they are produced, so the result is never held in memory
+        as a whole. The file is replaced only when it is complete.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # a unique temporary file, the same result may be written by several processes at once
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(GZIP_HEADER)
+            writer = _DeflateWriter(f, RESULT_COMPRESSION)
+            _write_value(writer, data)
+            writer.close()
+            f.write(struct.pack('<II', writer.crc, writer.size & 0xffffffff))
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return writer.size
+
+
+def read_result(path):
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def iter_result(path, chunk_size=RESULT_CHUNK_SIZE):
+    """
+        Decompressed JSON of a result file in chunks of at most chunk_size characters
+    """
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+def wrap_result(document):
+    """
+        JSON of document before and after the RESULT placeholder
+    """
+    head, tail = json.dumps(document).split(json.dumps(RESULT))
+    return head, tail
+
+
+def stream_result(document, path, chunk_size=RESULT_CHUNK_SIZE):
+    """
+        JSON of document with the result file in place of RESULT, in decompressed chunks
+    """
+    head, tail = wrap_result(document)
+    yield head
+    yield from iter_result(path, chunk_size)
+    yield tail
+
+
+def _gf2_times(matrix, vector):
+    total, index = 0, 0
+    while vector:
+        if vector & 1:
+            total ^= matrix[index]
+        vector >>= 1
+        index += 1
+    return total
+
+
+def _gf2_square(matrix):
+    return [_gf2_times(matrix, row) for row in matrix]
+
+
+def crc32_combine(crc1, crc2, size2):
+    """
+        crc32 of two byte strings joined, from their crc32 values and the size of the second
+        one (crc32_combine of zlib)
+    """
+    if size2 <= 0:
+        return crc1
+    odd = [0xedb88320] + [1 << n for n in range(31)]
+    even = _gf2_square(odd)
+    odd = _gf2_square(even)
+    while size2:
+        even = _gf2_square(odd)
+        if size2 & 1:
+            crc1 = _gf2_times(even, crc1)
+        size2 >>= 1
+        if not size2:
+            break
+        odd = _gf2_square(even)
+        if size2 & 1:
+            crc1 = _gf2_times(odd, crc1)
+        size2 >>= 1
+    return crc1 ^ crc2
+
+
+def is_spliceable(path):
+    """
+        Whether the deflate data of a result file can be copied by gzip_result
+    """
+    with open(path, 'rb') as f:
+        if f.read(len(GZIP_HEADER)) != GZIP_HEADER:
+            return False
+        f.seek(-TRAILER_SIZE - len(FINAL_BLOCK), os.SEEK_END)
+        return f.read(len(FINAL_BLOCK)) == FINAL_BLOCK
+
+
+def gzip_result(document, path, size=None, chunk_size=RESULT_CHUNK_SIZE):
+    """
+        gzip compressed JSON of document with the result file in place of RESULT. Compressed
+        data of the result is copied from the file, only the document around it is compressed.
+        size is the size of the decompressed result, by default taken from the gzip trailer.
+    """
+    head, tail = (part.encode('utf-8') for part in wrap_result(document))
+    with open(path, 'rb') as f:
+        f.seek(-TRAILER_SIZE, os.SEEK_END)
+        end = f.tell() - len(FINAL_BLOCK)
+        result_crc, result_size = struct.unpack('<II', f.read(TRAILER_SIZE))
+        if size is not None:
+            result_size = size
+
+        yield GZIP_HEADER
+        compressor = zlib.compressobj(RESULT_COMPRESSION, zlib.DEFLATED, -zlib.MAX_WBITS)
+        yield compressor.compress(head) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        f.seek(len(GZIP_HEADER))
+        while f.tell() < end:
+            yield f.read(min(chunk_size, end - f.tell()))
+        compressor = zlib.compressobj(RESULT_COMPRESSION, zlib.DEFLATED, -zlib.MAX_WBITS)
+        yield compressor.compress(tail) + compressor.flush()
+
+    crc = crc32_combine(crc32_combine(zlib.crc32(head), result_crc, result_size), zlib.crc32(tail), len(tail))
+    yield struct.pack('<II', crc, (len(head) + result_size + len(tail)) & 0xffffffff)
@@ -1,7 +1,10 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
 
-from profiles.models import TextFile, JsonFile, FORMATS
+from profiles.communities import apply_membership
+from profiles.models import TextFile, JsonFile, FORMATS, parse_vis_options, community_result
+from profiles.progress import get_progress
+from profiles.results import is_stored, RESULT
 from .tasks import create_json
 
 class UserSerializer(serializers.ModelSerializer):
@@ -38,12 +41,14 @@ class TextFileSerializerDetail(TextFileSerializer):
 
         chosen_format = self.context['view'].kwargs.get('vistype')
         selected_vars = [int(x) for x in self.context['request'].query_params.getlist('selectedVariables', None)]
+        options = parse_vis_options(self.context['request'].query_params)
         c = (chosen_format, chosen_format)
         if c in FORMATS:
             json_file, j_c = JsonFile.objects.get_or_create(
                 text_file=obj,
                 json_format=chosen_format,
-                selected_vars=selected_vars
+                selected_vars=selected_vars,
+                options=options
             )
             status = json_file.status
 
@@ -52,9 +57,13 @@ class TextFileSerializerDetail(TextFileSerializer):
                 msg = "Formatting started."
 
             if status == 'pending':
-                msg = str(json_file.progress)
+                msg = str(get_progress(json_file))
 
             if status == 'done':
+                if is_stored(json_file.content):
+                    # streamed by the view in place of RESULT
+                    self.stored_result = json_file
+                    return dict(data=RESULT)
                 return dict(data=json_file.content)
         else:
             msg = 'Format not supported.'
@@ -67,6 +76,7 @@ class TextFileSerializerDetail(TextFileSerializer):
 
 class JsonFileSerializer(serializers.ModelSerializer):
     name = serializers.SerializerMethodField(read_only=True)
+    progress = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
         model = JsonFile
@@ -76,13 +86,44 @@ class JsonFileSerializer(serializers.ModelSerializer):
         text_file = TextFile.objects.get(id=obj.text_file_id)
         return text_file.name
 
+    def get_progress(self, obj):
+        return get_progress(obj)
+
 class JsonFileSerializerDetail(serializers.ModelSerializer):
     name = serializers.SerializerMethodField(read_only=True)
+    progress = serializers.SerializerMethodField(read_only=True)
+    content = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
         model = JsonFile
-        fields = ('id', 'status', 'json_format', 'progress', 'content', 'selected_vars', 'text_file_id', 'name', 'task_id')
+        fields = ('id', 'status', 'json_format', 'progress', 'content', 'selected_vars', 'options', 'text_file_id', 'name',
+                  'task_id')
 
     def get_name(self, obj):
         text_file = TextFile.objects.get(id=obj.text_file_id)
-        return text_file.name
\ No newline at end of file
+        return text_file.name
+
+    def get_progress(self, obj):
+        return get_progress(obj)
+
+    def get_content(self, obj):
+        content = obj.content
+        # community results keep only membership of nodes of the visualization
+        if obj.json_format == 'community' and content and 'membership' in content:
+            try:
+                visualization = JsonFile.objects.get(pk=content['visualization'])
+            except JsonFile.DoesNotExist:
+                return content
+            if is_stored(visualization.content):
+                # the merged graph is written once and streamed by the view like other stored results
+                community_result(obj, visualization)
+                self.stored_result = obj
+                return RESULT
+            graph_dict = apply_membership(visualization.content, content['membership'])
+            graph_dict['stats'] = content.get('stats')
+            return graph_dict
+        if is_stored(content):
+            # streamed by the view in place of RESULT
+            self.stored_result = obj
+            return RESULT
+        return content
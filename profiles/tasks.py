@@ -1,29 +1,43 @@
 import itertools
 import logging
-import queue
+import os
 import re
 import time
-import uuid
 from subprocess import Popen, PIPE
 
 import matplotlib.pyplot as plt
 import numpy as np
+from celery import chord
 from colormap import rgb2hex as rgb2hexColormap
 from django.core.files import File
 from igraph import *
+from igraph.drawing.colors import ClusterColoringPalette
 
 from formulavis.celeryconf import app
-from formulavis.settings import SATELITE_PATH
-from profiles.communities import CommunityManager
+from formulavis.settings import SATELITE_PATH, HEATMAP_DENSE_LIMIT, HEATMAP_MAX_SIZE, HEATMAP_TILE_SIZE, \
+    HEATMAP_TILE_MAX_SIZE, RESOLUTION_HUB_PAIRS, RESOLUTION_FANOUT, COMMUNITY_ALGORITHM, COMMUNITY_TIME_BUDGET, \
+    CLUSTER_ALGORITHM, SUMMARY_GROUP, DPLL_TREE_NODES, DPLL_TREE_DEPTH, DPLL_TIME_LIMIT, DPLL_DECISION_LIMIT, \
+    DPLL_CONFLICT_LIMIT
+from profiles.communities import CommunityManager, CsrGraph, CLUSTER_ALGORITHMS, cluster_membership
 from profiles.email import EmailService
-from profiles.models import JsonFile, TextFile, Profile
-from profiles.vis_tasks import vis_2clause, vis_directed, vis_dpll
-from profiles.vis_tasks.i_dpll import DpllIteration
+from profiles.models import JsonFile, TextFile, Profile, heatmap_tiles_path, layout_cache_path, graph_summary_path, \
+    dpll_tree_path, save_content, load_content
+from profiles.progress import ProgressReporter, CancelCheck, clear_run
+from profiles.vis_tasks import edge_budget, vis_2clause, vis_directed, vis_dpll, vis_factor, vis_interaction, \
+    vis_layout, vis_matrix, vis_resolution, vis_summary
+from profiles.vis_tasks.cnf_parser import cached_parse_cnf, file_hash, CnfFormatError
+from profiles.vis_tasks.i_dpll import DpllIteration, SAT, UNSAT
 from profiles.vis_tasks.vis_dpll import DpllTree
-from profiles.vis_tasks.heatmap_helpers import regrid_x, regrid_y
+from profiles.vis_tasks.vis_tree import FormulaTree
+from profiles.vis_tasks.heatmap_helpers import heatmap_factors, dense_heatmap, color_bins, block_reduce, \
+    block_reduce_outer, block_pyramid, pyramid_levels, save_tile_pyramid, preview_shape
 
 logger = logging.getLogger('email_on_exception_logger')
 
+# heuristics of the DPLL visualization: {heuristic type: (name, prefix of content keys)}
+DPLL_HEURISTICS = {3: ('MOMS', 'moms'), 1: ('DLIS', 'dlis'), 2: ('Jeroslow Wang', 'jw')}
+DPLL_RESULTS = {SAT: 'sat', UNSAT: 'unsat'}
+
 
 @app.task()
 def create_json(obj_id, js_id, js_format, selected_vars):
@@ -50,7 +64,19 @@ def create_json(obj_id, js_id, js_format, selected_vars):
         ''
         'raw': create_raw
     }
-    formats.get(js_format)(obj_id, js_id, js_format, selected_vars)
+    try:
+        formats.get(js_format)(obj_id, js_id, js_format, selected_vars)
+    except CnfFormatError as e:
+        JsonFile.objects.filter(id=js_id).update(status='error', progress='Invalid formula file: ' + str(e))
+        return
+    # the DPLL visualization is finished by assemble_sat_vis_dpll after its solvers
+    if js_format == 'sat_vis_dpll':
+        return
+    start_layout(JsonFile.objects.get(id=js_id))
+    send_finished_email(obj_id, now)
+
+
+def send_finished_email(obj_id, started):
     email_service = EmailService()
     user = TextFile.objects.get(id=obj_id).profile.user
     later = time.time()
@@ -59,27 +85,50 @@ def create_json(obj_id, js_id, js_format, selected_vars):
     email_service.send_email(
         user.email,
         f'ForVis Virtualization {visualization}',
-        f'ForVis virtualization {visualization} finished with time {int(later - now)}'
+        f'ForVis virtualization {visualization} finished with time {int(later - started)}'
     )
 
 
+def start_layout(obj):
+    if obj.options.get('layout') in vis_layout.LAYOUTS and obj.json_format in vis_layout.LAYOUT_FORMATS:
+        create_layout.delay(obj.id)
+
+
+@app.task()
+def create_layout(js_id):
+    obj = JsonFile.objects.get(id=js_id)
+    algorithm = obj.options.get('layout')
+    content = load_content(obj)
+    content['layout'] = {"algorithm": algorithm, "status": 'pending'}
+    # a result stored in a file shows the layout status in its metadata
+    obj.content['layout'] = content['layout']
+    obj.save()
+
+    cache_path = layout_cache_path(obj)
+    positions = vis_layout.layout_content(content, obj.json_format, algorithm, vis_layout.load_layout(cache_path))
+    vis_layout.save_layout(cache_path, positions)
+    if 'options' in content:
+        content['options'].setdefault('physics', {})['enabled'] = False
+    content['layout']['status'] = 'done'
+    save_content(obj, content)
+    obj.save()
+
+
 @app.task()
 def create_community(visualization_id, result_id):
     result = JsonFile.objects.get(pk=result_id)
     visualization = JsonFile.objects.get(pk=visualization_id)
-    graph_dict = visualization.content
-    communities = CommunityManager(graph_dict, result).calculate_communities()
-
-    group = 0
-    for community in communities:
-        for vertex in community.vertex_list:
-            [x for x in graph_dict['nodes'] if x['id'] == vertex][0]['group'] = group
-        group += 1
-    for edge in graph_dict['edges']:
-        if 'color' in edge:
-            edge['color']['color'] = 'black'
-
-    result.content = graph_dict
+    graph_dict = load_content(visualization)
+    algorithm = result.options.get('algorithm', COMMUNITY_ALGORITHM)
+    time_budget = result.options.get('time', COMMUNITY_TIME_BUDGET)
+    manager = CommunityManager(graph_dict, result)
+    communities, stats = manager.find_communities(algorithm, time_budget)
+
+    result.content = {
+        "visualization": visualization.id,
+        "membership": manager.node_membership(communities),
+        "stats": stats
+    }
     result.status = 'done'
     result.progress = 'Progress: 100.0%'
     result.save()
@@ -101,52 +150,15 @@ def create_sat_vis_heatmap(obj_id, js_id, js_format, selected_vars):
     }
 
     text_file = TextFile.objects.get(id=obj_id)
+    store = load_clause_store(text_file)
+    data['info'] = store.info
 
-    var_count = cl_count = None
-    cl_dict = {}
-    sat = None
-    index_offset = 0
-    with open(text_file.content.path) as f:
-        text = File(f)
-        lines_amount = get_lines_amount_for(f)
-        for index, line in enumerate(text):
-            update_progress(index//3, lines_amount, obj)
-            line = line.strip()
-            if not line or line.startswith('c'):
-                index_offset += 1
-                continue
-            if line.startswith('p'):
-                index_offset += 1
-                data['info'] = line.replace("\n", "").split(' ')
-                init_line = line.split()
-                if var_count is None:
-                    var_count = int(init_line[2])
-                    cl_count = int(init_line[3])
-                    sat = np.zeros((cl_count, var_count), dtype=np.int8)
-                continue
-            # Parse clause
-            if sat is not None:
-                # Remove trailing 0 and split
-                clause_vars = [int(i) for i in line.split() if i != '0']
-                clause_idx = index - index_offset
-                for variable in clause_vars:
-                    if variable > 0:
-                        sat[clause_idx][variable-1] = 1
-                    else:
-                        sat[clause_idx][-variable-1] = -1
-                cl_dict[clause_idx] = np.count_nonzero(sat[clause_idx])
-
+    var_count = store.num_variables
+    cl_count = max(store.declared_clauses, len(store))
+    progress = ProgressReporter(obj, 100)
     print(f"Formatting cnf DONE. var_count={var_count}, cl_count={cl_count}")
-    if sat is not None:
-        print(f"SAT matrix after parsing:\n{sat}")
-    # Number of occurrences of variable in whole formula
-    if var_count is not None and sat is not None:
-        val_dict = {i: np.count_nonzero(sat[:, i]) for i in range(var_count)}
-    else:
-        val_dict = {}
-    print("Values Dict Creation DONE")
 
-    if not cl_count or not var_count or cl_count == 0 or var_count == 0 or sat is None:
+    if not len(store) or cl_count == 0 or var_count == 0:
         print("No clauses or variables found. Skipping heatmap creation.")
         obj.content = {"error": "Empty or malformed file. No heatmap generated."}
         obj.status = 'done'
@@ -154,37 +166,40 @@ def create_sat_vis_heatmap(obj_id, js_id, js_format, selected_vars):
         obj.save()
         return obj
 
-    heatmap = np.zeros([cl_count, var_count])
+    # heatmap is an outer product of per clause and per variable vectors
+    clause_factor, occurrences = heatmap_factors(store, cl_count, var_count)
+    print("Values Dict Creation DONE")
+    progress.update(25)
 
-    if heatmap.size == 0:
-        print("Heatmap array is empty after creation. Skipping further processing.")
-        obj.content = {"error": "Empty or malformed file. No heatmap generated."}
-        obj.status = 'done'
-        obj.progress = 'Progress: 100.0%'
-        obj.save()
-        return obj
+    # target resolution of the preview, at most HEATMAP_MAX_SIZE x HEATMAP_MAX_SIZE
+    shape = preview_shape(obj.options.get('rows', HEATMAP_MAX_SIZE), obj.options.get('cols', HEATMAP_MAX_SIZE),
+                          HEATMAP_MAX_SIZE)
+
+    # zoom levels of the heatmap split into tiles, zoom 0 is the coarsest level
+    tiles_shape = (min(cl_count, HEATMAP_TILE_MAX_SIZE), min(var_count, HEATMAP_TILE_MAX_SIZE))
+    levels = pyramid_levels(tiles_shape, HEATMAP_TILE_SIZE)
 
-    for i in range(len(heatmap)):
-        update_progress(lines_amount//3 + i//3, lines_amount, obj)
-        val_ctr = -1
-        for j in range(len(heatmap[i])):
-            val_ctr += 1
-            if cl_dict.get(i, 0) == 0:
-                heatmap[i][j] = 0
-            else:
-                heatmap[i][j] = (val_dict.get(val_ctr, 0)/cl_dict.get(i, 1))
-    print(f"Full Resolution Heatmap Creation DONE. heatmap shape: {heatmap.shape}")
-    print(f"Heatmap matrix:\n{heatmap}")
-
-    max_size = 500
-    # Only regrid if heatmap is larger than max_size
-    if heatmap.shape[0] > max_size:
-        step_x = int(np.ceil(heatmap.shape[0]/max_size))
-        heatmap = regrid_x(heatmap, step_x)
-    if heatmap.shape[1] > max_size:
-        step_y = int(np.ceil(heatmap.shape[1]/max_size))
-        heatmap = regrid_y(heatmap, step_y)
+    if cl_count * var_count <= HEATMAP_DENSE_LIMIT:
+        heatmap = dense_heatmap(clause_factor, occurrences)
+        print(f"Full Resolution Heatmap Creation DONE. heatmap shape: {heatmap.shape}")
+        pyramid = block_pyramid(heatmap, tiles_shape, levels)
+        heatmap = block_reduce(heatmap, shape)
+    else:
+        # block means of an outer product are computed from the factors only,
+        # so the full resolution matrix is never created
+        row_pyramid = block_pyramid(clause_factor[:, None], (tiles_shape[0], 1), levels)
+        col_pyramid = block_pyramid(occurrences[None, :], (1, tiles_shape[1]), levels)
+        pyramid = [dense_heatmap(rows[:, 0], cols[0, :]) for rows, cols in zip(row_pyramid, col_pyramid)]
+        heatmap = block_reduce_outer(clause_factor, occurrences, shape)
+    save_tile_pyramid(heatmap_tiles_path(obj), pyramid)
+    tiles = {
+        "tileSize": HEATMAP_TILE_SIZE,
+        "zoomLevels": [{"zoom": zoom, "rows": level.shape[0], "cols": level.shape[1]}
+                       for zoom, level in enumerate(reversed(pyramid))]
+    }
+    del pyramid
     print(f"Scaling down DONE. heatmap shape after regrid: {heatmap.shape}")
+    progress.update(50)
 
     cmap = plt.get_cmap('inferno')
 
@@ -197,25 +212,18 @@ def create_sat_vis_heatmap(obj_id, js_id, js_format, selected_vars):
         return obj
 
     max_val = heatmap.max()*1.1
-    sum_of_heatmap = heatmap.flatten().sum()
     step = max_val/num_colors
     ranges = []
     for clr in range(num_colors):
         ranges.append([clr*step, (clr+1)*step])
     color_list = [cmap(x/num_colors) for x in range(num_colors)]
     color_list_hex = [rgb2hexColormap(int(255*r), int(255*g), int(255*b)) for r, g, b, _ in color_list]
-    points = [[] for i in color_list]
-    for row_idx, row in enumerate(heatmap):
-        update_progress(2*lines_amount//3 + row_idx//3, lines_amount, obj)
-        for el_idx, el in enumerate(row):
-            entered = False
-            for rng_index, rng in enumerate(ranges):
-                if rng[0] <= el < rng[1]:
-                    points[rng_index].append({"x": row_idx, "y":el_idx})
-                    entered = True
-            if not entered:
-                points[0].append({"x": row_idx, "y": el_idx})
-    update_progress(50, 100, obj)
+    bins = color_bins(heatmap, ranges)
+    points = []
+    for rng_index in range(num_colors):
+        rows, cols = np.nonzero(bins == rng_index)
+        points.append([{"x": x, "y": y} for x, y in zip(rows.tolist(), cols.tolist())])
+    progress.update(75)
     datasets = []
     for i in range(len(color_list_hex)):
         datasets.append({
@@ -224,7 +232,7 @@ def create_sat_vis_heatmap(obj_id, js_id, js_format, selected_vars):
             "backgroundColor": color_list_hex[i]
         })
     print("Vis Heatmap all DONE")
-    obj.content = {"datasets": datasets}
+    save_content(obj, {"datasets": datasets, "tiles": tiles})
     obj.status = 'done'
     obj.progress = 'Progress: 100.0%'
     obj.save()
@@ -245,50 +253,13 @@ def create_sat_vis_directed(obj_id, js_id, js_format, selected_vars):
         "options": vis_directed.options
     }
 
-    nodes_tmp = {}
-    edges_tmp = {}
-
-    clause = 0
-
     text_file = TextFile.objects.get(id=obj_id)
-    with open(text_file.content.path) as f:
-        text = File(f)
-        lines_amount = get_lines_amount_for(f)
-        for index, line in enumerate(text, 1):
-            update_progress(index, lines_amount, obj)
-
-            if line.startswith('c') or line.startswith('C') or line in ['', ' ']:
-                continue
-            if line.startswith('p'):
-                data['info'] = line.replace("\n", "").split(' ')
-            else:
-                numbers = [int(x) for x in list(filter(lambda x: x != '', line.strip().split(' ')))[:-1]]
-                if not numbers:
-                    continue
-                clause += 1
-                c_id = 'c_' + str(clause)
-                nodes_tmp[c_id] = {"id": c_id,
-                                   "color": {"border": 'rgb(0,0,0)', "background": 'rgb(169,169,169)'},
-                                   "shape": 'square', "size": 15}
-                for n in numbers:
-                    l = abs(n)
-                    p_l = 'P' + str(l)
-                    n_l = 'N' + str(l)
-                    nodes_tmp[p_l] = vis_directed.node_json(p_l)
-                    nodes_tmp[n_l] = vis_directed.node_json(n_l)
-                    p_e = (p_l, c_id)
-                    n_e = (n_l, c_id)
-                    if n > 0:
-                        edges_tmp[p_e] = {"from": c_id, "to": p_l}
-                        edges_tmp[n_e] = {"from": n_l, "to": c_id}
-                    else:
-                        edges_tmp[p_e] = {"from": p_l, "to": c_id}
-                        edges_tmp[n_e] = {"from": c_id, "to": n_l}
-
-    data['nodes'] = [v for _, v in nodes_tmp.items()]
-    data['edges'] = [v for _, v in edges_tmp.items()]
-
-    obj.content = data
+    store = load_clause_store(text_file)
+    data['info'] = store.info
+    progress = ProgressReporter(obj, len(store))
+    data.update(vis_directed.directed_graph(store, progress))
+
+    save_content(obj, data)
     obj.status = 'done'
     obj.progress = 'Progress: 100.0%'
     obj.save()
@@ -309,108 +280,112 @@ def create_sat_vis_2clause(obj_id, js_id, js_format, selected_vars):
         "options": vis_2clause.options
     }
 
-    nodes_tmp = {}
-    edges_tmp = {}
-
     text_file = TextFile.objects.get(id=obj_id)
-    with open(text_file.content.path) as f:
-        text = File(f)
-        lines_amount = get_lines_amount_for(f)
-        for index, line in enumerate(text):
-            update_progress(index, lines_amount, obj)
-
-            if line.startswith('c') or line.startswith('C') or line in ['', ' ']:
-                continue
-            if line.startswith('p'):
-                data['info'] = line.replace("\n", "").split(' ')
-            else:
-                numbers = [int(x) for x in list(filter(lambda x: x != '', line.strip().split(' ')))[:-1]]
-                if not numbers:
-                    continue
-                for n in numbers:
-                    v = abs(n)
-                    nodes_tmp[v] = {"id": v, "label": str(v)}
-
-                if len(numbers) == 2:
-                    id2c = '2c' + str(sorted(numbers))
-                    if numbers[0] > 0 and numbers[1] > 0:
-                        ids = list(sorted(map(lambda x: abs(x), numbers)))
-                        try:
-                            vis_2clause.inc_edge(edges_tmp[id2c])
-                        except KeyError:
-                            edges_tmp[id2c] = vis_2clause.positive_positive(ids[0], ids[1])
-                    elif numbers[0] < 0 and numbers[1] < 0:
-                        ids = list(sorted(map(lambda x: abs(x), numbers)))
-                        try:
-                            vis_2clause.inc_edge(edges_tmp[id2c])
-                        except KeyError:
-                            edges_tmp[id2c] = vis_2clause.negative_negative(ids[0], ids[1])
-                    else:
-                        ids = list(map(lambda x: abs(x), sorted(numbers)))
-                        try:
-                            vis_2clause.inc_edge(edges_tmp[id2c])
-                        except KeyError:
-                            edges_tmp[id2c] = vis_2clause.negative_positive(ids[0], ids[1])
-                else:
-                    for p in itertools.combinations(numbers, 2):
-                        p = tuple(sorted(map(lambda x: abs(x), p)))
-                        try:
-                            vis_2clause.inc_edge(edges_tmp[p])
-                        except KeyError:
-                            edges_tmp[p] = vis_2clause.gt_2clause(p[0], p[1])
-
-    data['nodes'] = [v for k, v in nodes_tmp.items()]
-    data['edges'] = [v for k, v in edges_tmp.items()]
-
-    obj.content = data
+    store = load_clause_store(text_file)
+    data['info'] = store.info
+    progress = ProgressReporter(obj, len(store))
+    data.update(vis_2clause.two_clause_graph(store, progress))
+
+    save_content(obj, data)
     obj.status = 'done'
     obj.progress = 'Progress: 100.0%'
     obj.save()
+    return obj
 
 
 def create_sat_vis_dpll(obj_id, js_id, js_format, selected_vars):
     print("SAT_VIS_DPLL_SOLVER_VISUALIZATION")
+    started = time.time()
     obj = JsonFile.objects.get(id=js_id)
+    # a cancel request or progress parts left by a previous run must not affect this one
+    clear_run(obj)
 
     obj.status = 'pending'
     obj.progress = 'DPLL Sat-Solver working...'
     obj.save()
 
+    # the formula is parsed into the clause cache once, solvers of all heuristics load it from there
+    text_file = TextFile.objects.get(id=obj_id)
+    store = load_clause_store(text_file)
+
+    # a failed solver skips assemble_sat_vis_dpll and calls its error callback instead
+    callback = assemble_sat_vis_dpll.s(obj_id, js_id, store.info, started).on_error(fail_sat_vis_dpll.s(js_id=js_id))
+    chord(solve_sat_vis_dpll.s(obj_id, js_id, heuristic_type) for heuristic_type in DPLL_HEURISTICS)(callback)
+
+
+@app.task(ignore_result=False)
+def solve_sat_vis_dpll(obj_id, js_id, heuristic_type):
+    name, key = DPLL_HEURISTICS[heuristic_type]
+    obj = JsonFile.objects.get(id=js_id)
+    # solvers run in parallel, each reports its own part of the progress
+    progress = ProgressReporter(obj, 0, part=key)
+
+    text_file = TextFile.objects.get(id=obj_id)
+    store = load_clause_store(text_file)
+
+    idpll = DpllIteration(heuristic_type=heuristic_type, clause_store=store,
+                          time_limit=obj.options.get('time', DPLL_TIME_LIMIT),
+                          decision_limit=obj.options.get('decisions', DPLL_DECISION_LIMIT),
+                          conflict_limit=obj.options.get('conflicts', DPLL_CONFLICT_LIMIT),
+                          cancelled=CancelCheck(obj))
+    progress.message('DPLL Sat-Solver working [' + name + '] ...')
+    result = idpll.run()
+    progress.message('Building visualization tree [' + name + '] ...')
+    dpll_tree = DpllTree(idpll.assignment_trail)
+    dpll_tree.build_tree()
+    dpll_tree.visualize_tree(max_nodes=obj.options.get('nodes', DPLL_TREE_NODES),
+                             max_depth=obj.options.get('depth', DPLL_TREE_DEPTH))
+    if dpll_tree.collapsed:
+        # collapsed subtrees are expanded from the saved tree
+        dpll_tree.save(os.path.join(dpll_tree_path(obj), key))
+    progress.message('DPLL Sat-Solver finished [' + name + ']')
+
+    return {
+        key + "_nodes": [v for k, v in dpll_tree.v_nodes.items()],
+        key + "_edges": [v for k, v in dpll_tree.v_edges.items()],
+        key + "_result": DPLL_RESULTS.get(result, 'unresolved')
+    }
+
+
+@app.task()
+def assemble_sat_vis_dpll(results, obj_id, js_id, info, started):
+    obj = JsonFile.objects.get(id=js_id)
+
     data = {
-        "info": None,
+        "info": info,
         "moms_nodes": [],
         "moms_edges": [],
         "dlis_nodes": [],
         "dlis_edges": [],
         "jw_nodes": [],
         "jw_edges": [],
+        "moms_result": None,
+        "dlis_result": None,
+        "jw_result": None,
         "options": vis_dpll.options
     }
+    for result in results:
+        data.update(result)
 
-    heuristic_name_map = {1: 'DLIS', 2: 'Jeroslow Wang', 3: 'MOMS'}
-    heuristic_output_drop = {1: ["dlis_nodes", "dlis_edges"], 2: ["jw_nodes", "jw_edges"],
-                             3: ["moms_nodes", "moms_edges"]}
-
-    text_file = TextFile.objects.get(id=obj_id)
-
-    for heuristic_type in [3, 1, 2]:
-        idpll = DpllIteration(text_file.content.path, heuristic_type)
-        obj.progress = 'DPLL Sat-Solver working [' + heuristic_name_map[heuristic_type] + '] ...'
-        obj.save()
-        idpll.run()
-        obj.progress = 'Building visualization tree [' + heuristic_name_map[heuristic_type] + '] ...'
-        obj.save()
-        dpll_tree = DpllTree(idpll.assignment_trail)
-        dpll_tree.build_tree()
-        dpll_tree.visualize_tree()
-
-        data[heuristic_output_drop[heuristic_type][0]] = [v for k, v in dpll_tree.v_nodes.items()]
-        data[heuristic_output_drop[heuristic_type][1]] = [v for k, v in dpll_tree.v_edges.items()]
-
-    obj.content = data
+    save_content(obj, data)
     obj.status = 'done'
     obj.progress = 'Progress: 100.0%'
     obj.save()
+    clear_run(obj)
+    start_layout(obj)
+    send_finished_email(obj_id, started)
+
+
+@app.task()
+def fail_sat_vis_dpll(*args, js_id=None):
+    """
+        Error callback of the DPLL solvers, arguments of the failed task are ignored
+    """
+    obj = JsonFile.objects.get(id=js_id)
+    obj.status = 'error'
+    obj.progress = 'DPLL Sat-Solver failed'
+    obj.save(update_fields=['status', 'progress'])
+    clear_run(obj)
 
 
 def create_sat_vis_distribution(obj_id, js_id, js_format, selected_vars):
@@ -428,34 +403,15 @@ def create_sat_vis_distribution(obj_id, js_id, js_format, selected_vars):
     }
 
     text_file = TextFile.objects.get(id=obj_id)
+    store = load_clause_store(text_file)
+    data['info'] = store.info
 
-    with open(text_file.content.path) as f:
-        text = File(f)
-        lines_amount = get_lines_amount_for(f)
-        for index, line in enumerate(text, 1):
-            update_progress(index, lines_amount, obj)
-
-            if line.startswith('c') or line.startswith('C') or line in ['', ' ']:
-                continue
-            if line.startswith('p'):
-                number_of_variables = int((line.split(' '))[2])
-                positive = np.zeros((number_of_variables,), dtype=int)
-                negative = np.zeros((number_of_variables,), dtype=int)
-                labels = []
-
-                for i in range(number_of_variables - 1):
-                    labels.append(str(i + 1))
-
-                data['info'] = line.replace("\n", "").split(' ')
-                data['info'][3].replace("\n", "")
-            else:
-                numbers = [int(x) for x in list(filter(lambda x: x != '', line.strip().split(' ')))[:-1]]
-
-                for n in numbers:
-                    if n > 0:
-                        positive[n - 1] += 1
-                    if n < 0:
-                        negative[(n * (-1)) - 1] += 1
+    number_of_variables = store.num_variables
+    labels = [str(i + 1) for i in range(number_of_variables - 1)]
+
+    literals = store.literals
+    positive = np.bincount(literals[literals > 0], minlength=number_of_variables + 1)[1:]
+    negative = np.bincount(-literals[literals < 0], minlength=number_of_variables + 1)[1:]
 
     # if len(labels) > 10000:
     #     new_data = {}
@@ -485,11 +441,11 @@ def create_sat_vis_distribution(obj_id, js_id, js_format, selected_vars):
     data['positive'] = positive.tolist()
     data['negative'] = negative.tolist()
 
-    obj.content = data
+    save_content(obj, data)
     obj.status = 'done'
     obj.progress = 'Progress: 100.0%'
     obj.save()
-    return obj.content
+    return data
 
 
 def create_sat_vis_factor(obj_id, js_id, js_format, selected_vars):
@@ -505,43 +461,29 @@ def create_sat_vis_factor(obj_id, js_id, js_format, selected_vars):
         "edges": []
     }
 
-    nodes_tmp = {}
-    edges_tmp = {}
+    text_file = TextFile.objects.get(id=obj_id)
+    store = load_clause_store(text_file)
+    data['info'] = store.info
+    progress = ProgressReporter(obj, len(store))
+    size = store.num_variables
+    reducer = edge_budget.edge_reducer(obj.options, len(store), size, size + len(store), symmetric=False)
+    variables, clauses, positive = vis_factor.factor_edges(store, progress, reducer)
+    if reducer is None:
+        variables_list, clauses_list = store.variables().tolist(), range(1, len(store) + 1)
+    else:
+        variables_list, clauses_list = np.unique(variables).tolist(), np.unique(clauses).tolist()
 
-    clause = 0
+    if obj.options.get('summary') in vis_summary.SUMMARIES:
+        data.update(vis_summary.factor_summary(graph_summary_path(obj), variables_list, clauses_list, variables,
+                                               clauses, positive, obj.options['summary'],
+                                               obj.options.get('group', SUMMARY_GROUP)))
+    else:
+        data['nodes'] = itertools.chain(({"id": -c, "label": 'C_' + str(c), "group": 0} for c in clauses_list),
+                                        ({"id": v, "label": str(v), "group": 1} for v in variables_list))
+        data['edges'] = vis_factor.factor_edge_json(variables, clauses, positive)
+    data['reduction'] = edge_budget.reduction_info(reducer)
 
-    text_file = TextFile.objects.get(id=obj_id)
-    with open(text_file.content.path) as f:
-        text = File(f)
-        lines_amount = get_lines_amount_for(f)
-        for index, line in enumerate(text, 1):
-            update_progress(index, lines_amount, obj)
-
-            if line.startswith('c') or line.startswith('C') or line in ['', ' ']:
-                continue
-            if line.startswith('p'):
-                data['info'] = line.replace("\n", "").split(' ')
-            else:
-                numbers = [int(x) for x in list(filter(lambda x: x != '', line.strip().split(' ')))[:-1]]
-                if not numbers:
-                    continue
-                clause += 1
-                clause_id = -clause
-                nodes_tmp['C_' + str(clause)] = {"id": clause_id, "label": 'C_' + str(clause), "group": 0}
-
-                for n in numbers:
-                    y = abs(n)
-                    nodes_tmp[y] = {"id": y, "label": str(y), "group": 1}
-
-                for n in numbers:
-                    k = (abs(n), clause_id)
-                    color = 'red' if n < 0 else 'green'
-                    edges_tmp[k] = {"from": k[0], "to": k[1], "color": {"color": color, "opacity": 1}}
-
-    data['nodes'] = [v for k, v in nodes_tmp.items()]
-    data['edges'] = [v for k, v in edges_tmp.items()]
-
-    obj.content = data
+    save_content(obj, data)
     obj.status = 'done'
     obj.progress = 'Progress: 100.0%'
     obj.save()
@@ -561,40 +503,22 @@ def create_sat_vis_interaction(obj_id, js_id, js_format, selected_vars):
         "edges": []
     }
 
-    nodes_tmp = {}
-    edges_tmp = {}
-
     text_file = TextFile.objects.get(id=obj_id)
-    with open(text_file.content.path) as f:
-        text = File(f)
-        lines_amount = get_lines_amount_for(f)
-        for index, line in enumerate(text):
-            update_progress(index, lines_amount, obj)
-
-            if line.startswith('c') or line.startswith('C') or line in ['', ' ']:
-                continue
-            if line.startswith('p'):
-                data['info'] = line.replace("\n", "").split(' ')
-            else:
-                numbers = [int(x) for x in list(filter(lambda x: x != '', line.strip().split(' ')))[:-1]]
-                if not numbers:
-                    continue
-                for n in numbers:
-                    y = abs(n)
-                    nodes_tmp[y] = {"id": y, "label": str(y)}
-
-                for k in itertools.combinations(numbers, 2):
-                    k = tuple(sorted(map(lambda c: abs(c), k)))
-                    try:
-                        edges_tmp[k]["color"]["opacity"] += 0.1
-                    except KeyError:
-                        edges_tmp[k] = {"from": k[0], "to": k[1], "color": {"color": '#000000',
-                                                                            "opacity": 0.1}}
-
-    data['nodes'] = [v for k, v in nodes_tmp.items()]
-    data['edges'] = [v for k, v in edges_tmp.items()]
-
-    obj.content = data
+    store = load_clause_store(text_file)
+    data['info'] = store.info
+    progress = ProgressReporter(obj, len(store))
+    size = store.num_variables
+    reducer = edge_budget.edge_reducer(obj.options, size, size, size)
+    sources, targets, weights = vis_interaction.interaction_edges(store, size, progress, reducer)
+    if obj.options.get('summary') in vis_summary.SUMMARIES:
+        variables_list = np.union1d(sources, targets) if reducer is not None else store.variables()
+        data.update(vis_summary.interaction_summary(graph_summary_path(obj), variables_list, sources, targets, weights,
+                                                    obj.options['summary'], obj.options.get('group', SUMMARY_GROUP)))
+    else:
+        data.update(vis_interaction.interaction_graph(store, sources, targets, weights, reducer is not None))
+    data['reduction'] = edge_budget.reduction_info(reducer)
+
+    save_content(obj, data)
     obj.status = 'done'
     obj.progress = 'Progress: 100.0%'
     obj.save()
@@ -607,6 +531,7 @@ def create_sat_vis_cluster(obj_id, js_id, js_format, selected_vars):
     obj.status = 'pending'
     obj.save()
 
+    start = time.monotonic()
     data = {
         'clusteredNetwork': {
             'edges': [],
@@ -618,90 +543,18 @@ def create_sat_vis_cluster(obj_id, js_id, js_format, selected_vars):
         }
     }
 
-    edges_tmp = []
-
     text_file = TextFile.objects.get(id=obj_id)
-    with open(text_file.content.path) as f:
-        text = File(f)
-        lines_amount = get_lines_amount_for(f)
-        for index, line in enumerate(text):
-            update_progress(index, lines_amount, obj)
-
-            if line.startswith('c') or line.startswith('C') or line in ['', ' ']:
-                continue
-            if line.startswith('p'):
-                data['info'] = line.replace("\n", "").split(' ')
-            else:
-                numbers = [int(x) for x in list(filter(lambda x: x != '', line.strip().split(' ')))[:-1]]
-                if not numbers:
-                    continue
-
-                for k in itertools.combinations(numbers, 2):
-                    k = tuple(sorted(map(lambda c: abs(c), k)))
-                    edges_tmp.append((k[0], k[1]))
-
-    g = Graph(edges_tmp)
-    g.delete_vertices(0)
-    g.simplify()
-
-    dendogram = g.community_edge_betweenness()
-    clusters = dendogram.as_clustering()
-    membership = clusters.membership
-
-    layout1 = g.layout_kamada_kawai()
-
-    i = g.community_infomap()
-
-    unique_membership_classes = len(set(membership))
-    pal = drawing.colors.ClusterColoringPalette(unique_membership_classes)
-
-    clustered = g.copy()
-    clustered.contract_vertices(membership, combine_attrs='max')
-    clustered.simplify()
-
-    for vertex, cluster in zip(g.vs.indices, membership):
-        data['wholeNetwork']['nodes'].append({
-            'color': rgb2hex(pal.get(cluster)),
-            'id': vertex,
-            'label': str(vertex),
-            'cluster': cluster
-        })
-
-    for edge in g.get_edgelist():
-        data['wholeNetwork']['edges'].append({
-            'color':
-                {
-                    'color': '#888888',
-                    'opacity': 1
-                },
-            'from': edge[0],
-            'id': f"{edge[0]}_{edge[1]}",
-            'to': edge[1],
-            'width': 1  # You might want to add edge width
-        })
-
-    for vertex in clustered.vs.indices:
-        data['clusteredNetwork']['nodes'].append({
-            'color': rgb2hex(pal.get(vertex_idx)),
-            'id': vertex_idx,
-            'label': f"Cluster {vertex_idx}",
-            'size': 30 + (clustered.degree(vertex_idx) * 3),
-            'x': clustered_layout[vertex_idx][0] * 150,
-            'y': clustered_layout[vertex_idx][1] * 150
-        })
-
-    for edge in clustered.get_edgelist():
-        data['clusteredNetwork']['edges'].append({
-            'color':
-                {
-                    'color': '#888888',
-                    'opacity': 1
-                },
-            'from': edge[0],
-            'id': str(edge[0]) + '_' + str(edge[1]),
-            'to': edge[1]
-        })
-    obj.content = data
+    store = load_clause_store(text_file)
+    data['info'] = store.info
+    progress = ProgressReporter(obj, len(store))
+    size = store.num_variables
+    sources, targets, _ = vis_interaction.interaction_edges(store, size, progress)
+    graph = CsrGraph.from_edges(sources - 1, targets - 1, list(range(1, size + 1)))
+    rows, cols = graph.edges()
+    g = Graph(n=len(graph), edges=list(zip(rows.tolist(), cols.tolist())))
+
+    data.update(cluster_networks(graph, g, obj.options, start))
+    save_content(obj, data)
     obj.status = 'done'
     obj.progress = 'Progress: 100.0%'
     obj.save()
@@ -715,55 +568,23 @@ def create_sat_vis_matrix(obj_id, js_id, js_format, selected_vars):
     obj.save()
 
     data = {
-        "info": None,
-        "labels": [],
-        "rows": []
+        "info": None
     }
 
     text_file = TextFile.objects.get(id=obj_id)
-    with open(text_file.content.path) as f:
-        text = File(f)
-        lines_amount = get_lines_amount_for(f)
-        for index, line in enumerate(text):
-            update_progress(index, lines_amount, obj)
-
-            if line.startswith('c') or line.startswith('C') or line in ['', ' ']:
-                continue
-            if line.startswith('p'):
-                data['info'] = line.replace("\n", "").split(' ')
-                # initialize data['rows'] and data['labels']
-                numberOfVariables = int(data['info'][-2])
-                for indx1 in range(numberOfVariables):
-                    data['labels'].append(str(indx1))
-                    tmpRow = {
-                        "dependencies": []
-                    }
-                    for indx2 in range(numberOfVariables):
-                        if indx1 != indx2:
-                            tmpRow['dependencies'].append({
-                                "positive": 0,
-                                "negative": 0
-                            })
-                        else:
-                            tmpRow['dependencies'].append({
-                                "positive": -1,
-                                "negative": -1
-                            })
-                    data['rows'].append(tmpRow)
-            else:
-                numbers = [int(x) for x in list(filter(lambda x: x != '', line.strip().split(' ')))[:-1]]
-                if not numbers:
-                    continue
-                for n1 in numbers:
-                    for n2 in numbers:
-                        if n1 == n2:
-                            continue
-                        if n1 > 0:
-                            data['rows'][abs(n1) - 1]['dependencies'][abs(n2) - 1]['positive'] += 1
-                        else:
-                            data['rows'][abs(n1) - 1]['dependencies'][abs(n2) - 1]['negative'] += 1
-
-    obj.content = data
+    store = load_clause_store(text_file)
+    data['info'] = store.info
+
+    # only non-zero cells of numberOfVariables x numberOfVariables matrix are stored
+    numberOfVariables = store.num_variables
+    indptr, indices, positive, negative = vis_matrix.dependency_matrix(store, numberOfVariables)
+    order = None
+    if obj.options.get('order') in vis_matrix.ORDERS:
+        order = vis_matrix.variable_order(indptr, indices, positive + negative, numberOfVariables,
+                                          obj.options['order'])
+    data.update(vis_matrix.compact_matrix(indptr, indices, positive, negative, numberOfVariables, order))
+
+    save_content(obj, data)
     obj.status = 'done'
     obj.progress = 'Progress: 100.0%'
     obj.save()
@@ -783,28 +604,15 @@ def create_sat_vis_tree(obj_id, js_id, js_format, selected_vars):
         "edges": []
     }
 
-    formulas = []
-
     text_file = TextFile.objects.get(id=obj_id)
-    with open(text_file.content.path) as f:
-        text = File(f)
-        lines_amount = get_lines_amount_for(f)
-        for index, line in enumerate(text):
-            update_progress(index, lines_amount, obj)
-
-            if is_comment(line):
-                continue
-            if is_info(line):
-                data['info'] = get_info_array(line)
-            else:
-                formulas.append(get_numbers(line))
-
-        tree = FormulaTree(formulas, 0)
-        tree.serialize()
-        data['nodes'] = tree.nodes
-        data['edges'] = tree.edges
-
-    obj.content = data
+    store = load_clause_store(text_file)
+    data['info'] = store.info
+
+    tree = FormulaTree(store)
+    data['nodes'] = tree.iter_nodes()
+    data['edges'] = tree.iter_edges()
+
+    save_content(obj, data)
     obj.status = 'done'
     obj.progress = 'Progress: 100.0%'
     obj.save()
@@ -823,54 +631,29 @@ def create_sat_vis_resolution(obj_id, js_id, js_format, selected_vars):
         "edges": []
     }
 
-    nodes_tmp = {}
-    edges_tmp = {}
-
-    variables = {}
-    clause = 0
-
     text_file = TextFile.objects.get(id=obj_id)
-    with open(text_file.content.path) as f:
-        text = File(f)
-
-        print("Working on vis resolution.")
-        lines_amount = get_lines_amount_for(f)
-
-        for index, line in enumerate(text, 1):
-
-            update_progress(index, lines_amount, obj)
-
-            if line.startswith('c') or line.startswith('C') or line in ['', ' ']:
-                continue
-            if line.startswith('p'):
-                data['info'] = line.replace("\n", "").split(' ')
-            else:
-                numbers = [int(x) for x in list(filter(lambda x: x != '', line.strip().split(' ')))[:-1]]
-                if not numbers:
-                    continue
-                clause += 1
-                nodes_tmp[clause] = {"id": clause, "label": 'C_' + str(clause)}
-                for n in numbers:
-                    if n not in variables and (selected_vars is None or len(selected_vars) == 0 or
-                                               n in selected_vars or -n in selected_vars):
-                        variables[n] = []
-                    if n in variables:
-                        variables[n].append(clause)
-
-        for v, clause_list_1 in variables.items():
-            if v < 0:
-                continue
-            if -v in variables.keys():
-                clause_list_2 = variables[-v]
-
-                for c1 in clause_list_1:
-                    for c2 in clause_list_2:
-                        edges_tmp[(c1, c2)] = {"from": c1, "to": c2}
-
-    data['nodes'] = [v for k, v in nodes_tmp.items()]
-    data['edges'] = [v for k, v in edges_tmp.items()]
-
-    obj.content = data
+    store = load_clause_store(text_file)
+    data['info'] = store.info
+
+    print("Working on vis resolution.")
+    progress = ProgressReporter(obj, len(store))
+    clauses = len(store)
+    # edge keys of clauses and hubs of variables
+    size = vis_resolution.node_count(store)
+    if selected_vars:
+        store = store.restrict(selected_vars)
+    reducer = edge_budget.edge_reducer(obj.options, size, size, size)
+    (sources, targets), hubs, counts = vis_resolution.resolution_edges(
+        store, obj.options.get('resolution', 'full'), obj.options.get('fanout', RESOLUTION_FANOUT),
+        RESOLUTION_HUB_PAIRS, progress, reducer)
+    clauses_list = range(1, clauses + 1) if reducer is None else None
+
+    data.update(vis_resolution.resolution_graph(lambda c: {"id": c, "label": 'C_' + str(c)}, sources, targets, hubs,
+                                                clauses_list))
+    data['resolution'] = counts
+    data['reduction'] = edge_budget.reduction_info(reducer)
+
+    save_content(obj, data)
     obj.status = 'done'
     obj.progress = 'Progress: 100.0%'
     obj.save()
@@ -888,33 +671,14 @@ def create_variables_list(obj_id, js_id, js_format, selected_vars):
         "variables": []
     }
 
-    variables = {}
-
     text_file = TextFile.objects.get(id=obj_id)
-    with open(text_file.content.path) as f:
-        text = File(f)
-        lines_amount = get_lines_amount_for(f)
-        for index, line in enumerate(text):
-
-            update_progress(index, lines_amount, obj)
-
-            if line.startswith('c') or line.startswith('C') or line in ['', ' ']:
-                continue
-            if line.startswith('p'):
-                data['info'] = line.replace("\n", "").split(' ')
-            else:
-                numbers = [int(x) for x in list(filter(lambda x: x != '', line.strip().split(' ')))[:-1]]
-                if not numbers:
-                    continue
-                for n in numbers:
-                    if n >= 0 and n not in variables.keys():
-                        variables[n] = []
-                    if n < 0 and -n not in variables.keys():
-                        variables[-n] = []
-
-    data['variables'] = list(variables.keys())
-
-    obj.content = data
+    store = load_clause_store(text_file)
+    data['info'] = store.info
+
+    # variables in order of their first occurrence
+    data['variables'] = list(dict.fromkeys(np.abs(store.literals).tolist()))
+
+    save_content(obj, data)
     obj.status = 'done'
     obj.progress = 'Progress: 100.0%'
     obj.save()
@@ -931,12 +695,18 @@ def create_raw(obj_id, js_id, js_format, selected_vars):
         text = File(f)
         t = text.read()
         data["raw"] = t
-        obj.content = data
+        save_content(obj, data)
     obj.status = 'done'
     obj.progress = 'Progress: 100.0%'
     obj.save()
 
 
+@app.task()
+def create_clause_cache(obj_id):
+    text_file = TextFile.objects.get(id=obj_id)
+    load_clause_store(text_file, weighted=text_file.kind == 'maxsat')
+
+
 @app.task()
 def create_minimized(obj_id, profile_id):
     print("MINIMIZING: {}".format(obj_id))
@@ -989,47 +759,32 @@ def create_maxsat_vis_factor(obj_id, js_id, js_format, selected_vars):
         "edges": []
     }
 
-    nodes_tmp = {}
-    edges_tmp = {}
-    clause_weights = {}
-    clause = 0
-
     text_file = TextFile.objects.get(id=obj_id)
-    with open(text_file.content.path) as f:
-        text = File(f)
-        lines_amount = get_lines_amount_for(f)
-        for index, line in enumerate(text):
-
-            update_progress(index, lines_amount, obj)
-
-            if line.startswith('c') or line.startswith('C') or line in ['', ' ']:
-                continue
-            if line.startswith('p'):
-                data['info'] = line.replace("\n", "").split(' ')
-            else:
-                numbers = [int(x) for x in list(filter(lambda x: x != '', line.strip().split(' ')))[:-1]]
-                if not numbers:
-                    continue
-                clause += 1
-                clause_weights[clause] = numbers[0]
-                del numbers[0]
-
-                for n in numbers:
-                    y = abs(n)
-                    nodes_tmp[y] = {"id": y, "label": str(y)}
-
-                for n in numbers:
-                    k = (abs(n), -clause)
-                    color = 'red' if n < 0 else 'green'
-                    edges_tmp[k] = {"from": k[0], "to": k[1], "color": {"color": color, "opacity": 1}}
-
-    min_cw = min(clause_weights.values())
-    max_cw = max(clause_weights.values())
-    data['nodes'] = [v for k, v in nodes_tmp.items()]
-    data['nodes'].extend([get_node(-c, cw, min_cw, max_cw) for c, cw in clause_weights.items()])
-    data['edges'] = [v for k, v in edges_tmp.items()]
-
-    obj.content = data
+    store = load_clause_store(text_file, weighted=True)
+    data['info'] = store.info
+    progress = ProgressReporter(obj, len(store))
+    size = store.num_variables
+    reducer = edge_budget.edge_reducer(obj.options, len(store), size, size + len(store), symmetric=False)
+    variables, clauses, positive = vis_factor.factor_edges(store, progress, reducer)
+    if reducer is None:
+        variables_list, clauses_list = store.variables().tolist(), range(1, len(store) + 1)
+    else:
+        variables_list, clauses_list = np.unique(variables).tolist(), np.unique(clauses).tolist()
+
+    if obj.options.get('summary') in vis_summary.SUMMARIES:
+        data.update(vis_summary.factor_summary(graph_summary_path(obj), variables_list, clauses_list, variables,
+                                               clauses, positive, obj.options['summary'],
+                                               obj.options.get('group', SUMMARY_GROUP)))
+    else:
+        weights = store.weights.tolist()
+        min_cw = min(weights)
+        max_cw = max(weights)
+        data['nodes'] = itertools.chain(({"id": v, "label": str(v)} for v in variables_list),
+                                        (get_node(-c, weights[c - 1], min_cw, max_cw) for c in clauses_list))
+        data['edges'] = vis_factor.factor_edge_json(variables, clauses, positive)
+    data['reduction'] = edge_budget.reduction_info(reducer)
+
+    save_content(obj, data)
     obj.status = 'done'
     obj.progress = 'Progress: 100.0%'
     obj.save()
@@ -1048,41 +803,22 @@ def create_maxsat_vis_interaction(obj_id, js_id, js_format, selected_vars):
         "edges": []
     }
 
-    nodes_tmp = {}
-    edges_tmp = {}
-
     text_file = TextFile.objects.get(id=obj_id)
-    with open(text_file.content.path) as f:
-        text = File(f)
-        lines_amount = get_lines_amount_for(f)
-        for index, line in enumerate(text):
-
-            update_progress(index, lines_amount, obj)
-
-            if line.startswith('c') or line.startswith('C') or line in ['', ' ']:
-                continue
-            if line.startswith('p'):
-                data['info'] = line.replace("\n", "").split(' ')
-            else:
-                numbers = [int(x) for x in list(filter(lambda x: x != '', line.strip().split(' ')))[:-1]]
-                if not numbers:
-                    continue
-                for n in numbers:
-                    y = abs(n)
-                    nodes_tmp[y] = {"id": y, "label": str(y)}
-
-                for k in itertools.combinations(numbers, 2):
-                    k = tuple(sorted(map(lambda c: abs(c), k)))
-                    try:
-                        edges_tmp[k]["color"]["opacity"] += 0.1
-                    except KeyError:
-                        edges_tmp[k] = {"from": k[0], "to": k[1], "color": {"color": '#000000',
-                                                                            "opacity": 0.1}}
-
-    data['nodes'] = [v for k, v in nodes_tmp.items()]
-    data['edges'] = [v for k, v in edges_tmp.items()]
-
-    obj.content = data
+    store = load_clause_store(text_file, weighted=True)
+    data['info'] = store.info
+    progress = ProgressReporter(obj, len(store))
+    size = store.num_variables
+    reducer = edge_budget.edge_reducer(obj.options, size, size, size)
+    sources, targets, weights = vis_interaction.interaction_edges(store, size, progress, reducer)
+    if obj.options.get('summary') in vis_summary.SUMMARIES:
+        variables_list = np.union1d(sources, targets) if reducer is not None else store.variables()
+        data.update(vis_summary.interaction_summary(graph_summary_path(obj), variables_list, sources, targets, weights,
+                                                    obj.options['summary'], obj.options.get('group', SUMMARY_GROUP)))
+    else:
+        data.update(vis_interaction.interaction_graph(store, sources, targets, weights, reducer is not None))
+    data['reduction'] = edge_budget.reduction_info(reducer)
+
+    save_content(obj, data)
     obj.status = 'done'
     obj.progress = 'Progress: 100.0%'
     obj.save()
@@ -1095,6 +831,7 @@ def create_maxsat_vis_cluster(obj_id, js_id, js_format, selected_vars):
     obj.status = 'pending'
     obj.save()
 
+    start = time.monotonic()
     data = {
         'clusteredNetwork': {
             'edges': [],
@@ -1106,85 +843,18 @@ def create_maxsat_vis_cluster(obj_id, js_id, js_format, selected_vars):
         }
     }
 
-    edges_tmp = []
-
     text_file = TextFile.objects.get(id=obj_id)
-    with open(text_file.content.path) as f:
-        text = File(f)
-        lines_amount = get_lines_amount_for(f)
-        for index, line in enumerate(text):
-
-            update_progress(index, lines_amount, obj)
-
-            if line.startswith('c') or line.startswith('C') or line in ['', ' ']:
-                continue
-            if line.startswith('p'):
-                data['info'] = line.replace("\n", "").split(' ')
-            else:
-                numbers = [int(x) for x in list(filter(lambda x: x != '', line.strip().split(' ')))[:-1]]
-                if not numbers:
-                    continue
-
-                for k in itertools.combinations(numbers, 2):
-                    k = tuple(sorted(map(lambda c: abs(c), k)))
-                    edges_tmp.append((k[0], k[1]))
-
-    g = Graph(edges_tmp)
-    g.delete_vertices(0)
-    g.simplify()
-
-    dendogram = g.community_edge_betweenness()
-    clusters = dendogram.as_clustering()
-    membership = clusters.membership
-
-    layout1 = g.layout_kamada_kawai()
-
-    i = g.community_infomap()
-    pal = drawing.colors.ClusterColoringPalette(len(i))
-
-    clustered = g.copy()
-    clustered.contract_vertices(membership, combine_attrs='max')
-    clustered.simplify()
-
-    for vertex, cluster in zip(g.vs.indices, membership):
-        data['wholeNetwork']['nodes'].append({
-            'color': rgb2hex(pal.get(cluster)),
-            'id': vertex,
-            'label': str(vertex),
-            'cluster': cluster
-        })
-
-    for edge in g.get_edgelist():
-        data['wholeNetwork']['edges'].append({
-            'color':
-                {
-                    'color': '#888888',
-                    'opacity': 1
-                },
-            'from': edge[0],
-            'id': str(edge[0]) + '_' + str(edge[1]),
-            'to': edge[1]
-        })
-
-    for vertex in clustered.vs.indices:
-        data['clusteredNetwork']['nodes'].append({
-            'color': rgb2hex(pal.get(vertex)),
-            'id': vertex,
-            'label': str(vertex),
-        })
-
-    for edge in clustered.get_edgelist():
-        data['clusteredNetwork']['edges'].append({
-            'color':
-                {
-                    'color': '#888888',
-                    'opacity': 1
-                },
-            'from': edge[0],
-            'id': str(edge[0]) + '_' + str(edge[1]),
-            'to': edge[1]
-        })
-    obj.content = data
+    store = load_clause_store(text_file, weighted=True)
+    data['info'] = store.info
+    progress = ProgressReporter(obj, len(store))
+    size = store.num_variables
+    sources, targets, _ = vis_interaction.interaction_edges(store, size, progress)
+    graph = CsrGraph.from_edges(sources - 1, targets - 1, list(range(1, size + 1)))
+    rows, cols = graph.edges()
+    g = Graph(n=len(graph), edges=list(zip(rows.tolist(), cols.tolist())))
+
+    data.update(cluster_networks(graph, g, obj.options, start))
+    save_content(obj, data)
     obj.status = 'done'
     obj.progress = 'Progress: 100.0%'
     obj.save()
@@ -1198,56 +868,23 @@ def create_maxsat_vis_matrix(obj_id, js_id, js_format, selected_vars):
     obj.save()
 
     data = {
-        "info": None,
-        "labels": [],
-        "rows": []
+        "info": None
     }
 
     text_file = TextFile.objects.get(id=obj_id)
-    with open(text_file.content.path) as f:
-        text = File(f)
-        lines_amount = get_lines_amount_for(f)
-        for index, line in enumerate(text):
-
-            update_progress(index, lines_amount, obj)
-
-            if line.startswith('c') or line.startswith('C') or line in ['', ' ']:
-                continue
-            if line.startswith('p'):
-                data['info'] = line.replace("\n", "").split(' ')
-                # initialize data['rows'] and data['labels']
-                numberOfVariables = int(data['info'][-2])
-                for indx1 in range(numberOfVariables):
-                    data['labels'].append(str(indx1))
-                    tmpRow = {
-                        "dependencies": []
-                    }
-                    for indx2 in range(numberOfVariables):
-                        if indx1 != indx2:
-                            tmpRow['dependencies'].append({
-                                "positive": 0,
-                                "negative": 0
-                            })
-                        else:
-                            tmpRow['dependencies'].append({
-                                "positive": -1,
-                                "negative": -1
-                            })
-                    data['rows'].append(tmpRow)
-            else:
-                numbers = [int(x) for x in list(filter(lambda x: x != '', line.strip().split(' ')))[:-1]]
-                if not numbers:
-                    continue
-                for n1 in numbers:
-                    for n2 in numbers:
-                        if n1 == n2:
-                            continue
-                        if n1 > 0:
-                            data['rows'][abs(n1) - 1]['dependencies'][abs(n2) - 1]['positive'] += 1
-                        else:
-                            data['rows'][abs(n1) - 1]['dependencies'][abs(n2) - 1]['negative'] += 1
-
-    obj.content = data
+    store = load_clause_store(text_file, weighted=True)
+    data['info'] = store.info
+
+    # only non-zero cells of numberOfVariables x numberOfVariables matrix are stored
+    numberOfVariables = store.num_variables
+    indptr, indices, positive, negative = vis_matrix.dependency_matrix(store, numberOfVariables)
+    order = None
+    if obj.options.get('order') in vis_matrix.ORDERS:
+        order = vis_matrix.variable_order(indptr, indices, positive + negative, numberOfVariables,
+                                          obj.options['order'])
+    data.update(vis_matrix.compact_matrix(indptr, indices, positive, negative, numberOfVariables, order))
+
+    save_content(obj, data)
     obj.status = 'done'
     obj.progress = 'Progress: 100.0%'
     obj.save()
@@ -1258,7 +895,7 @@ def create_maxsat_vis_tree(obj_id, js_id, js_format, selected_vars):
 
     obj = JsonFile.objects.get(id=js_id)
 
-    obj.stJsonFileatus = 'pending'
+    obj.status = 'pending'
     obj.save()
 
     data = {
@@ -1267,28 +904,15 @@ def create_maxsat_vis_tree(obj_id, js_id, js_format, selected_vars):
         "edges": []
     }
 
-    formulas = []
-
     text_file = TextFile.objects.get(id=obj_id)
-    with open(text_file.content.path) as f:
-        text = File(f)
-        lines_amount = get_lines_amount_for(f)
-        for index, line in enumerate(f):
-
-            update_progress(index, lines_amount, obj)
-
-            if is_comment(line):
-                continue
-            if is_info(line):
-                data['info'] = get_info_array(line)
-            else:
-                formulas.append(get_numbers(line))
-        tree = FormulaTree(formulas, 0)
-        tree.serialize()
-        data['nodes'] = tree.nodes
-        data['edges'] = tree.edges
-
-    obj.content = data
+    store = load_clause_store(text_file, weighted=True)
+    data['info'] = store.info
+
+    tree = FormulaTree(store)
+    data['nodes'] = tree.iter_nodes()
+    data['edges'] = tree.iter_edges()
+
+    save_content(obj, data)
     obj.status = 'done'
     obj.progress = 'Progress: 100.0%'
     obj.save()
@@ -1307,60 +931,106 @@ def create_maxsat_vis_resolution(obj_id, js_id, js_format, selected_vars):
         "edges": []
     }
 
-    clause_weights = {}
-    nodes_tmp = {}
-    edges_tmp = {}
-
-    variables = {}
-    clause = 0
-
     text_file = TextFile.objects.get(id=obj_id)
-    with open(text_file.content.path) as f:
-        text = File(f)
-        lines_amount = get_lines_amount_for(f)
-        for index, line in enumerate(text):
-
-            update_progress(index, lines_amount, obj)
-
-            if line.startswith('c') or line.startswith('C') or line in ['', ' ']:
-                continue
-            if line.startswith('p'):
-                data['info'] = line.replace("\n", "").split(' ')
-            else:
-                numbers = [int(x) for x in list(filter(lambda x: x != '', line.strip().split(' ')))[:-1]]
-                if not numbers:
-                    continue
-                clause += 1
-                clause_weights[clause] = numbers[0]
-                del numbers[0]
-                for n in numbers:
-                    if n not in variables and (selected_vars is None or len(
-                            selected_vars) == 0 or n in selected_vars or -n in selected_vars):
-                        variables[n] = []
-                    if n in variables:
-                        variables[n].append(clause)
-
-    for v, clause_list_1 in variables.items():
-        if v < 0:
-            continue
-        if -v in variables.keys():
-            clause_list_2 = variables[-v]
-
-            for c1 in clause_list_1:
-                for c2 in clause_list_2:
-                    edges_tmp[(c1, c2)] = {"from": c1, "to": c2}
-
-    min_cw = min(clause_weights.values())
-    max_cw = max(clause_weights.values())
-    data['nodes'] = [get_node(c, cw, min_cw, max_cw) for c, cw in clause_weights.items()]
-    data['edges'] = [v for k, v in edges_tmp.items()]
-
-    obj.content = data
+    store = load_clause_store(text_file, weighted=True)
+    data['info'] = store.info
+    progress = ProgressReporter(obj, len(store))
+    clauses = len(store)
+    # edge keys of clauses and hubs of variables
+    size = vis_resolution.node_count(store)
+    if selected_vars:
+        store = store.restrict(selected_vars)
+    reducer = edge_budget.edge_reducer(obj.options, size, size, size)
+    (sources, targets), hubs, counts = vis_resolution.resolution_edges(
+        store, obj.options.get('resolution', 'full'), obj.options.get('fanout', RESOLUTION_FANOUT),
+        RESOLUTION_HUB_PAIRS, progress, reducer)
+    clauses_list = range(1, clauses + 1) if reducer is None else None
+
+    weights = store.weights.tolist()
+    min_cw = min(weights)
+    max_cw = max(weights)
+    data.update(vis_resolution.resolution_graph(lambda c: get_node(c, weights[c - 1], min_cw, max_cw), sources,
+                                                targets, hubs, clauses_list))
+    data['resolution'] = counts
+    data['reduction'] = edge_budget.reduction_info(reducer)
+
+    save_content(obj, data)
     obj.status = 'done'
     obj.progress = 'Progress: 100.0%'
     obj.save()
 
 
+def cluster_networks(graph, g, options, start):
+    """
+        'wholeNetwork' with cluster of every variable and 'clusteredNetwork' with one node
+        per cluster, clusters are found within the time budget counted from start
+    """
+    algorithm = options.get('algorithm')
+    if algorithm not in CLUSTER_ALGORITHMS:
+        algorithm = CLUSTER_ALGORITHM
+    time_budget = options.get('time', COMMUNITY_TIME_BUDGET)
+    membership, timed_out = cluster_membership(graph, g, algorithm, start + time_budget)
+
+    clusters = max(membership, default=-1) + 1
+    pal = ClusterColoringPalette(max(clusters, 1))
+
+    clustered = g.copy()
+    clustered.contract_vertices(membership, combine_attrs='max')
+    clustered.simplify()
+    clustered_layout = clustered.layout_fruchterman_reingold()
+    degrees = clustered.degree()
+
+    rows, cols = graph.edges()
+    return {
+        'wholeNetwork': {
+            'nodes': ({
+                'color': rgb2hex(pal.get(cluster)),
+                'id': vertex,
+                'label': str(vertex),
+                'cluster': cluster
+            } for vertex, cluster in enumerate(membership)),
+            'edges': ({
+                'color':
+                    {
+                        'color': '#888888',
+                        'opacity': 1
+                    },
+                'from': u,
+                'id': f"{u}_{v}",
+                'to': v,
+                'width': 1
+            } for u, v in zip(rows.tolist(), cols.tolist()))
+        },
+        'clusteredNetwork': {
+            'nodes': ({
+                'color': rgb2hex(pal.get(vertex_idx)),
+                'id': vertex_idx,
+                'label': f"Cluster {vertex_idx}",
+                'size': 30 + (degrees[vertex_idx] * 3),
+                'x': clustered_layout[vertex_idx][0] * 150,
+                'y': clustered_layout[vertex_idx][1] * 150
+            } for vertex_idx in clustered.vs.indices),
+            'edges': ({
+                'color':
+                    {
+                        'color': '#888888',
+                        'opacity': 1
+                    },
+                'from': edge[0],
+                'id': str(edge[0]) + '_' + str(edge[1]),
+                'to': edge[1]
+            } for edge in clustered.get_edgelist())
+        },
+        'stats': {
+            'algorithm': algorithm,
+            'modularity': g.modularity(membership) if g.ecount() else 0.0,
+            'clusters': clusters,
+            'elapsed': round(time.monotonic() - start, 3),
+            'timedOut': timed_out
+        }
+    }
+
+
 def get_node(clause, clause_weight, min_cw, max_cw):
     return {"id": clause, "color": {"background": get_clause_color(clause_weight, min_cw, max_cw)},
             "label": 'C_{}'.format(abs(clause))}
@@ -1375,120 +1045,12 @@ def normalize_value(v, min_v, max_v):
     return int((v - min_v) * 255 / (max_v - min_v))
 
 
-def is_comment(line):
-    if line.startswith('c') or line.startswith('C') or line in ['', ' ']:
-        return True
-    return False
-
-
-def is_info(line):
-    if line.startswith('p'):
-        return True
-    return False
-
-
-def get_info_array(line):
-    return line.split(' ')
-
-
-def get_numbers(line):
-    return [int(x) for x in list(filter(lambda x: x != '', line.strip().split(' ')))[:-1]]
-
-
-def join_lists(lst):
-    result = []
-    [result.extend(el) for el in lst]
-    return result
-
-
-def most_common(lst):
-    if not lst or lst == [[]]:
-        return None
-    joined = join_lists(lst)
-    return max(joined, key=joined.count)
-
-
-def get_lines_amount_for(file):
-    linesAmount = 0
-    for line in file:
-        linesAmount += 1
-    return linesAmount
-
-
-def update_progress(index, linesAmount, obj):
-    progress = float(index) / float(linesAmount) * float(100)
-    obj.progress = "Progress: " + str(round(progress, 2)) + "%"
-    obj.save()
-
-
-class FormulaNode(object):
-    def __init__(self, formula_list, level):
-        self.children = []
-        self.id = str(uuid.uuid4())
-        self.level = level
-
-        self.data = most_common(formula_list)
-        self.formula_list = formula_list
-
-        for formula in self.formula_list:
-            formula.remove(self.data)
-
-        [self.add_child(child) for child in FormulaTree(formula_list, level + 1).roots]
-
-    def add_child(self, obj):
-        self.children.append(obj)
-
-    def set_level(self, level):
-        self.level = level
-
-    def set_id(self, id):
-        self.id = id
-
-
-class FormulaTree(object):
-    def __init__(self, formula_list, start_level):
-        self.nodes = []
-        self.edges = []
-
-        self.roots = []
-        self.grouped_formula = []
-        self.formula_list = self.group_formulas(formula_list)
-
-        for formula in self.grouped_formula:
-            if (formula != [[]]):
-                self.roots.append(FormulaNode(formula, start_level))
-
-    def group_formulas(self, lst):
-        formulas = []
-        tmp = []
-        f = []
-        root = most_common(lst)
-        if not root:
-            return formulas
-        for formula in lst:
-            if root in formula:
-                f.append(formula)
-            else:
-                tmp.append(formula)
-        self.grouped_formula.append(f)
-        return self.group_formulas(tmp)
-
-    def serialize(self):
-        q = queue.Queue()
-
-        for root in self.roots:
-            q.put(root)
-
-        for root in self.roots:
-            root.set_level(0)
-
-        while not q.empty():
-            node = q.get()
-            for child in node.children:
-                self.edges.append({"from": node.id, "to": child.id, "color": {"color": '#ff383f'}})
-                q.put(child)
-
-            self.nodes.append({"id": node.id, "label": str(node.data), "level": node.level})
+def load_clause_store(text_file, weighted=False):
+    if not text_file.content_hash:
+        # files uploaded before hashes were stored
+        text_file.content_hash = file_hash(text_file.content.path)
+        TextFile.objects.filter(pk=text_file.pk).update(content_hash=text_file.content_hash)
+    return cached_parse_cnf(text_file.content.path, weighted, text_file.content_hash)
 
 
 def rgb2hex(rgb):
@@ -0,0 +1,106 @@
+import os
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+import numpy as np
+
+from profiles.vis_tasks.cnf_parser import parse_cnf_lines, cached_parse_cnf, cache_path_for, remove_clause_cache, \
+    file_hash, check_cnf, CnfFormatError
+
+
+class TestCnfParser(TestCase):
+
+    def test_parse_cnf_lines(self):
+        lines = [
+            'c comment\n',
+            'p cnf 3 3\n',
+            '1 -2 0\n',
+            '2 3\n',
+            '-1 0\n',
+            '0\n',
+            '-3 0\n',
+        ]
+        store = parse_cnf_lines(lines)
+        self.assertEqual(store.info, ['p', 'cnf', '3', '3'])
+        self.assertEqual(len(store), 3)
+        self.assertEqual(list(store.clauses()), [[1, -2], [2, 3, -1], [-3]])
+        self.assertEqual(store.offsets.tolist(), [0, 2, 5, 6])
+        self.assertEqual(store.clause_index().tolist(), [0, 0, 1, 1, 1, 2])
+        self.assertEqual(store.num_variables, 3)
+        self.assertIsNone(store.weights)
+
+    def test_parse_satlib_trailer(self):
+        lines = ['c uf3\n', 'p cnf 3 2\n', ' 1 -2 3 0\n', '-1 2 -3 0\n', '%\n', '0\n', '\n']
+        store = parse_cnf_lines(lines)
+        self.assertEqual(list(store.clauses()), [[1, -2, 3], [-1, 2, -3]])
+
+    def test_parse_in_chunks(self):
+        lines = ['p cnf 3 3\n', '1 -2\n', '0 2 3\n', '-1 0\n', '-3 0\n']
+        store = parse_cnf_lines(lines, chunk_size=4)
+        self.assertEqual(list(store.clauses()), [[1, -2], [2, 3, -1], [-3]])
+
+    def test_parse_invalid_token(self):
+        for line in ('1 3a 0\n', '1 2.5 0\n', 'x 0\n'):
+            with self.assertRaises(CnfFormatError):
+                parse_cnf_lines(['p cnf 3 2\n', '-1 2 0\n', line, '3 0\n'], chunk_size=4)
+
+    def test_check_cnf(self):
+        check_cnf(parse_cnf_lines(['c x\n', 'p cnf 3 2\n', '1 -2\n', '3 0\n', '-1 0\n', '%\n', '0\n']))
+        for lines in (['1 0\n'], ['p cnf 0 1\n', '1 0\n'], ['p wcnf 1 1\n', '1 0\n'], ['p cnf 2 2\n', '1 0\n']):
+            with self.assertRaises(CnfFormatError):
+                check_cnf(parse_cnf_lines(lines))
+
+    def test_parse_weighted_cnf_lines(self):
+        lines = [
+            'p wcnf 2 2\n',
+            '10 1 -2 0\n',
+            '3 2 0\n',
+        ]
+        store = parse_cnf_lines(lines, weighted=True)
+        self.assertEqual(list(store.clauses()), [[1, -2], [2]])
+        self.assertEqual(store.weights.tolist(), [10, 3])
+
+    def test_literal_pairs(self):
+        store = parse_cnf_lines(['1 -2 0\n', '3 0\n', '2 -3 1 0\n'])
+        pairs = []
+        for first, second in store.literal_pairs(max_pairs=4):
+            pairs.extend(zip(store.literals[first].tolist(), store.literals[second].tolist()))
+        expected = [(a, b) for clause in store.clauses() for a in clause for b in clause]
+        self.assertEqual(sorted(pairs), sorted(expected))
+
+    def test_parse_empty(self):
+        store = parse_cnf_lines([])
+        self.assertIsNone(store.info)
+        self.assertEqual(len(store), 0)
+        self.assertEqual(store.num_variables, 0)
+
+    def test_cached_parse_cnf(self):
+        with TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'x.cnf')
+            with open(path, 'w') as f:
+                f.write('p cnf 3 2\n1 -3 0\n2 3 -1 0\n')
+
+            store = cached_parse_cnf(path)
+            self.assertTrue(os.path.isdir(cache_path_for(path)))
+
+            cached = cached_parse_cnf(path)
+            self.assertIsInstance(cached.literals, np.memmap)
+            self.assertEqual(list(cached.clauses()), list(store.clauses()))
+            self.assertEqual(cached.info, ['p', 'cnf', '3', '2'])
+
+            remove_clause_cache(path)
+            self.assertFalse(os.path.isdir(cache_path_for(path)))
+
+    def test_cached_parse_cnf_with_known_hash(self):
+        with TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'x.cnf')
+            with open(path, 'w') as f:
+                f.write('p cnf 2 1\n1 -2 0\n')
+            content_hash = file_hash(path)
+
+            cached_parse_cnf(path, content_hash=content_hash)
+            os.remove(path)
+            # the cache is found by the stored hash without reading the file
+            self.assertEqual(list(cached_parse_cnf(path, content_hash=content_hash).clauses()), [[1, -2]])
+            remove_clause_cache(path, content_hash)
+            self.assertFalse(os.path.isdir(cache_path_for(path, content_hash=content_hash)))
@@ -0,0 +1,55 @@
+from unittest import TestCase
+
+from profiles.communities import CsrGraph, CommunityManager, apply_membership
+
+
+class TestCommunities(TestCase):
+
+    def setUp(self):
+        self.graph_dict = {
+            'nodes': [{'id': 'a'}, {'id': 'b'}, {'id': 'c'}, {'id': 'd'}],
+            'edges': [
+                {'from': 'a', 'to': 'b'},
+                {'from': 'b', 'to': 'a'},
+                {'from': 'b', 'to': 'c'},
+                {'from': 'c', 'to': 'c'},
+            ]
+        }
+
+    def test_csr_graph_from_json(self):
+        graph = CsrGraph.from_json(self.graph_dict)
+        self.assertEqual(graph.vertex_ids, ['a', 'b', 'c', 'd'])
+        self.assertEqual(graph.indptr.tolist(), [0, 1, 3, 4, 4])
+        self.assertEqual(graph.indices.tolist(), [1, 0, 2, 1])
+        self.assertEqual(graph.degree.tolist(), [2, 3, 3, 0])
+        self.assertEqual(graph.m, 4)
+        rows, cols = graph.edges()
+        self.assertEqual(list(zip(rows.tolist(), cols.tolist())), [(0, 1), (1, 2)])
+
+    def test_modularity(self):
+        manager = CommunityManager(self.graph_dict)
+        # (2 * 1 - (2 * 3 + 3 * 2) / 8) / 8 for the community a, b
+        self.assertEqual(manager.calculate_modularity([['a', 'b']]), 0.0625)
+        self.assertEqual(manager.calculate_modularity([['d']]), 0.0)
+
+    def test_find_communities(self):
+        # two triangles joined by one edge
+        graph_dict = {
+            'nodes': [{'id': x} for x in range(1, 7)],
+            'edges': [{'from': u, 'to': v} for u, v in [(1, 2), (2, 3), (1, 3), (3, 4), (4, 5), (5, 6), (4, 6)]]
+        }
+        manager = CommunityManager(graph_dict)
+        for algorithm in ('cnm', 'louvain'):
+            communities, stats = manager.find_communities(algorithm)
+            self.assertEqual(sorted(c.vertex_list for c in communities), [[1, 2, 3], [4, 5, 6]])
+            self.assertEqual(stats['algorithm'], algorithm)
+            self.assertAlmostEqual(stats['modularity'], 5 / 14)
+            self.assertFalse(stats['timedOut'])
+
+    def test_apply_membership(self):
+        manager = CommunityManager(self.graph_dict)
+        membership = manager.node_membership(manager.calculate_communities())
+        self.assertEqual(len(membership), 4)
+        self.assertEqual(membership[0], membership[1])
+        graph_dict = apply_membership(self.graph_dict, membership)
+        self.assertEqual([node['group'] for node in graph_dict['nodes']], membership)
@@ -0,0 +1,42 @@
+from unittest import TestCase
+
+import numpy as np
+
+from profiles.vis_tasks.edge_budget import TopEdges, SampledEdges, DegreeCappedEdges, edge_reducer
+
+
+class TestEdgeBudget(TestCase):
+
+    def setUp(self):
+        # complete graph on 6 nodes, key = row * 6 + col, weight = row + col
+        rows, cols = np.triu_indices(6, 1)
+        self.keys = (rows * 6 + cols).astype(np.int64)
+        self.weights = (rows + cols).astype(np.int64)
+
+    def add_in_blocks(self, reducer, keys, weights, block=4):
+        for i in range(0, len(keys), block):
+            reducer.add(keys[i:i + block], weights[i:i + block])
+        return reducer.result()
+
+    def test_top_edges(self):
+        keys, weights, _ = self.add_in_blocks(TopEdges(3, 6), self.keys, self.weights)
+        # (2, 5) and (3, 4) have the same weight, the smaller key is kept
+        self.assertEqual(keys.tolist(), [17, 23, 29])
+        self.assertEqual(weights.tolist(), [7, 8, 9])
+
+    def test_sampled_edges_do_not_depend_on_order(self):
+        first, _, _ = self.add_in_blocks(SampledEdges(5, 6, seed=1), self.keys, self.weights)
+        second, _, _ = self.add_in_blocks(SampledEdges(5, 6, seed=1), self.keys[::-1], self.weights[::-1], 3)
+        self.assertEqual(len(first), 5)
+        self.assertEqual(first.tolist(), second.tolist())
+
+    def test_degree_capped_edges(self):
+        keys, _, _ = self.add_in_blocks(DegreeCappedEdges(100, 6, 6, 2), self.keys, self.weights)
+        degree = np.bincount(np.concatenate(np.divmod(keys, 6)), minlength=6)
+        self.assertTrue((degree <= 2).all())
+        self.assertGreaterEqual(len(keys), 5)
+
+    def test_edge_reducer(self):
+        self.assertIsNone(edge_reducer({}, 6, 6, 6))
+        self.assertIsInstance(edge_reducer({'edges': 10, 'reduce': 'sample'}, 6, 6, 6), SampledEdges)
+        self.assertEqual(edge_reducer({'edges': 9, 'reduce': 'degree'}, 6, 6, 6).max_degree, 3)
@@ -0,0 +1,68 @@
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+import numpy as np
+
+from profiles.vis_tasks.cnf_parser import parse_cnf_lines
+from profiles.vis_tasks.heatmap_helpers import heatmap_factors, dense_heatmap, color_bins, block_reduce, \
+    block_reduce_outer, block_reduce_sparse, block_pyramid, pyramid_levels, save_tile_pyramid, load_tile, preview_shape
+
+
+class TestHeatmapHelpers(TestCase):
+
+    def test_heatmap_factors(self):
+        store = parse_cnf_lines(['p cnf 3 3\n', '1 -2 0\n', '2 2 3 -1 0\n', '-3 0\n'])
+        clause_factor, occurrences = heatmap_factors(store, 3, 3)
+        self.assertEqual(occurrences.tolist(), [2, 2, 2])
+        self.assertEqual(clause_factor.tolist(), [1 / 2, 1 / 3, 1])
+        heatmap = dense_heatmap(clause_factor, occurrences)
+        self.assertEqual(heatmap.shape, (3, 3))
+        self.assertEqual(heatmap[2].tolist(), [2, 2, 2])
+
+    def test_preview_shape(self):
+        self.assertEqual(preview_shape(100000, 100000, 500), (500, 500))
+        self.assertEqual(preview_shape(20, -5, 500), (20, 1))
+
+    def test_color_bins(self):
+        heatmap = np.array([[0.0, 0.5], [1.0, 2.5]])
+        ranges = [[0, 1], [1, 2], [2, 3]]
+        self.assertEqual(color_bins(heatmap, ranges).tolist(), [[0, 0], [1, 2]])
+        self.assertEqual(color_bins(np.array([[3.0, -1.0]]), ranges).tolist(), [[0, 0]])
+
+    def test_block_reduce(self):
+        heatmap = np.arange(20, dtype=float).reshape(4, 5)
+        self.assertEqual(block_reduce(heatmap, (2, 5)).tolist(), [[2.5, 3.5, 4.5, 5.5, 6.5],
+                                                                  [12.5, 13.5, 14.5, 15.5, 16.5]])
+        self.assertEqual(block_reduce(heatmap, (1, 2), 'sum').tolist(), [[64, 126]])
+        self.assertEqual(block_reduce(heatmap, (2, 2), 'max').tolist(), [[6, 9], [16, 19]])
+        self.assertEqual(block_reduce(heatmap, (10, 10)).shape, (4, 5))
+
+    def test_block_reduce_outer_and_sparse(self):
+        rows = np.array([1.0, 2.0, 0.0, 4.0, 5.0])
+        cols = np.array([3.0, 0.0, 1.0])
+        heatmap = np.outer(rows, cols)
+        for reducer in ('mean', 'sum', 'max'):
+            expected = block_reduce(heatmap, (2, 2), reducer)
+            self.assertTrue(np.allclose(block_reduce_outer(rows, cols, (2, 2), reducer), expected))
+            r, c = np.nonzero(heatmap)
+            sparse = block_reduce_sparse(r, c, heatmap[r, c], heatmap.shape, (2, 2), reducer)
+            self.assertTrue(np.allclose(sparse, expected))
+
+    def test_block_pyramid(self):
+        heatmap = np.arange(64, dtype=float).reshape(8, 8)
+        pyramid = block_pyramid(heatmap, (8, 8), 3)
+        self.assertEqual([level.shape for level in pyramid], [(8, 8), (4, 4), (2, 2)])
+        self.assertTrue(np.allclose(pyramid[2], block_reduce(heatmap, (2, 2))))
+
+    def test_tile_pyramid(self):
+        heatmap = np.random.rand(10, 6)
+        levels = pyramid_levels(heatmap.shape, 4)
+        self.assertEqual(levels, 3)
+        pyramid = block_pyramid(heatmap, heatmap.shape, levels)
+        with TemporaryDirectory() as directory:
+            save_tile_pyramid(directory, pyramid)
+            self.assertEqual(load_tile(directory, 0, 0, 0, 4).shape, (3, 2))
+            tile = load_tile(directory, 2, 1, 2, 4)
+            self.assertTrue(np.allclose(tile, heatmap[8:10, 4:6]))
+            self.assertIsNone(load_tile(directory, 2, 2, 0, 4))
+            self.assertIsNone(load_tile(directory, 3, 0, 0, 4))
@@ -0,0 +1,77 @@
+from unittest import TestCase
+
+from profiles.vis_tasks.cnf_parser import parse_cnf_lines
+from profiles.vis_tasks.i_dpll import DpllIteration, WatchedFormula, IndexedHeap, LiteralScores, MomsScores, SAT, \
+    UNSAT, UNRESOLVED
+
+
+class TestIDpll(TestCase):
+
+    @staticmethod
+    def solve(lines, heuristic_type):
+        idpll = DpllIteration(heuristic_type=heuristic_type, clause_store=parse_cnf_lines(lines))
+        idpll.load_clause_store(idpll.clause_store)
+        return idpll.dpll(), idpll.assignment_trail
+
+    def test_unsat_trail(self):
+        lines = ['p cnf 2 4\n', '1 2 0\n', '-1 2 0\n', '1 -2 0\n', '-1 -2 0\n']
+        for heuristic_type in (1, 2, 3):
+            result, trail = self.solve(lines, heuristic_type)
+            self.assertEqual(result, UNSAT)
+            self.assertEqual(trail, ['d', 1, 1, 2, 'c', 'b', 1, 'd', -1, -1, 2, 'c', 'unsat'])
+
+    def test_sat_trail(self):
+        result, trail = self.solve(['p cnf 3 5\n', '1 -2 3 0\n', '-1 2 0\n', '2 3 3 0\n', '-3 -2 0\n', '1 0\n'], 3)
+        self.assertEqual(result, SAT)
+        self.assertEqual(trail, [1, 2, -3, 'sat'])
+
+        # a clause with a repeated literal is not a unit clause
+        result, trail = self.solve(['p cnf 3 4\n', '1 1 0\n', '-1 2 0\n', '-2 3 -1 0\n', '-3 -3 2 0\n'], 1)
+        self.assertEqual(result, SAT)
+        self.assertEqual(trail, ['d', 1, 1, 2, 3, 'sat'])
+
+    def test_watched_formula_backtrack(self):
+        formula = WatchedFormula([[1, 2, 3], [-1, 2], [-2, -3]])
+        self.assertEqual(formula.assign(1), (False, [(1, 2)]))
+        self.assertEqual(formula.assign(2), (False, [(2, -3)]))
+        self.assertEqual(formula.residual(), {2: [-3]})
+        formula.backtrack(1)
+        self.assertEqual(formula.trail, [1])
+        self.assertEqual(formula.residual(), {1: [2], 2: [-2, -3]})
+        self.assertEqual(formula.assign(-2), (True, []))
+        self.assertEqual(formula.residual(), {1: []})
+
+    def test_indexed_heap(self):
+        heap = IndexedHeap()
+        for item, key in ((1, 5), (2, 3), (3, 3), (4, 7)):
+            heap.push(item, key)
+        self.assertEqual(sorted(heap.ties()), [2, 3])
+        heap.update(3, 1)
+        heap.remove(2)
+        self.assertEqual(heap.top(), 3)
+        heap.push(3, 9)
+        self.assertEqual((heap.top(), len(heap), 2 in heap), (1, 3, False))
+
+    def test_incremental_scores(self):
+        formula = WatchedFormula([[1, 2], [-2, 3, 3], [2, -3], [-1, -2, 3]])
+        dlis, jw, moms = LiteralScores(formula), LiteralScores(formula, True), MomsScores(formula)
+        formula.listener = dlis
+        self.assertEqual(dlis.select(), 3)
+        self.assertEqual(jw.select(), 2)
+        self.assertEqual(moms.select(), 2)
+
+        formula.assign(-3)
+        self.assertEqual(dlis.select(), -2)
+        formula.backtrack(0)
+        self.assertEqual(dlis.select(), 3)
+        self.assertEqual(dlis.score[-2], 2)
+
+    def test_limits(self):
+        lines = ['p cnf 2 4\n', '1 2 0\n', '-1 2 0\n', '1 -2 0\n', '-1 -2 0\n']
+        idpll = DpllIteration(heuristic_type=3, clause_store=parse_cnf_lines(lines), conflict_limit=1)
+        self.assertEqual(idpll.run(), UNRESOLVED)
+        self.assertEqual(idpll.assignment_trail, ['d', 1, 1, 2, 'c', 'b', 1, 'd', -1, 'unresolved'])
+
+        idpll = DpllIteration(heuristic_type=3, clause_store=parse_cnf_lines(lines), cancelled=lambda: True)
+        self.assertEqual(idpll.run(), UNRESOLVED)
+        self.assertEqual(idpll.assignment_trail, ['unresolved'])
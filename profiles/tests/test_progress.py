@@ -0,0 +1,79 @@
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+import redis
+
+from profiles.progress import ProgressReporter, CancelCheck, get_progress, clear_run
+
+
+class TestProgressReporter(TestCase):
+
+    def test_update_is_throttled(self):
+        obj = Mock()
+        progress = ProgressReporter(obj, 100000, min_step=1.0, min_interval=3600, backend='db')
+        for index in range(100000):
+            progress.update(index)
+        self.assertEqual(obj.save.call_count, 100)
+        obj.save.assert_called_with(update_fields=['progress'])
+
+    def test_update_after_interval(self):
+        obj = Mock()
+        progress = ProgressReporter(obj, 100000, min_step=50.0, min_interval=0, backend='db')
+        progress.update(1)
+        progress.update(2)
+        self.assertEqual(obj.save.call_count, 2)
+
+    def test_redis_backend(self):
+        obj = Mock(pk=7)
+        client = Mock()
+        with patch('profiles.progress.get_redis_client', return_value=client):
+            progress = ProgressReporter(obj, 10, backend='redis')
+            progress.update(5)
+        client.set.assert_called_once()
+        self.assertEqual(client.set.call_args[0][:2], ('forvis:progress:7', 'Progress: 50.0%'))
+        obj.save.assert_not_called()
+
+    def test_parts(self):
+        obj = Mock(pk=7, status='pending', progress='', json_format='sat_vis_dpll')
+        client = Mock()
+        with patch('profiles.progress.get_redis_client', return_value=client):
+            ProgressReporter(obj, 10, backend='db', part='moms').message('[MOMS] working')
+            client.hset.assert_called_once_with('forvis:progress:7:parts', 'moms', '[MOMS] working')
+            client.hgetall.return_value = {b'moms': b'[MOMS] working', b'dlis': b'[DLIS] done'}
+            self.assertEqual(get_progress(obj), '[DLIS] done | [MOMS] working')
+        obj.save.assert_not_called()
+
+    def test_parts_only_for_dpll(self):
+        obj = Mock(pk=7, status='pending', progress='Progress: 5.0%', json_format='sat_vis_factor')
+        client = Mock()
+        with patch('profiles.progress.get_redis_client', return_value=client), \
+                patch('profiles.progress.PROGRESS_BACKEND', 'db'):
+            self.assertEqual(get_progress(obj), 'Progress: 5.0%')
+        client.hgetall.assert_not_called()
+
+    def test_redis_unavailable(self):
+        obj = Mock(pk=7, status='pending', progress='Progress: 5.0%', json_format='sat_vis_dpll')
+        client = Mock()
+        client.hgetall.side_effect = redis.ConnectionError()
+        with patch('profiles.progress.get_redis_client', return_value=client):
+            self.assertEqual(get_progress(obj), 'Progress: 5.0%')
+
+    def test_clear_run(self):
+        client = Mock()
+        with patch('profiles.progress.get_redis_client', return_value=client):
+            clear_run(Mock(pk=7))
+        client.delete.assert_called_once_with('forvis:cancel:7', 'forvis:progress:7:parts')
+
+    def test_cancel_check_is_throttled(self):
+        client = Mock()
+        client.exists.return_value = 0
+        with patch('profiles.progress.get_redis_client', return_value=client):
+            cancelled = CancelCheck(Mock(pk=7), interval=3600)
+            self.assertFalse(cancelled())
+            client.exists.return_value = 1
+            self.assertFalse(cancelled())
+            cancelled.last_time -= 3600
+            self.assertTrue(cancelled())
+            self.assertTrue(cancelled())
+        self.assertEqual(client.exists.call_count, 2)
+        client.exists.assert_called_with('forvis:cancel:7')
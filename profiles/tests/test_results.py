@@ -0,0 +1,58 @@
+import gzip
+import json
+import os
+import random
+import tempfile
+import zlib
+from unittest import TestCase
+
+from profiles.results import write_result, read_result, iter_result, stream_result, gzip_result, result_metadata, \
+    materialized, is_stored, crc32_combine, is_spliceable, RESULT
+
+
+class TestResults(TestCase):
+
+    def test_write_streamed_values(self):
+        path = os.path.join(tempfile.mkdtemp(), 'results', '1.json.gz')
+        nodes = ({"id": i, "label": str(i)} for i in range(3))
+        data = {"info": ["c x"], "nodes": nodes, "edges": iter([]), "options": {"physics": {"enabled": True}},
+                "network": {"edges": iter([{"from": 0, "to": 1}])}}
+        size = write_result(path, data)
+        self.assertEqual(read_result(path), {"info": ["c x"], "nodes": [{"id": 0, "label": '0'}, {"id": 1, "label": '1'},
+                                                                    {"id": 2, "label": '2'}],
+                                             "edges": [], "options": {"physics": {"enabled": True}},
+                                             "network": {"edges": [{"from": 0, "to": 1}]}})
+        self.assertFalse(os.path.exists(path + '.tmp'))
+
+        self.assertEqual(''.join(iter_result(path, 5)), json.dumps(read_result(path)))
+        self.assertEqual(size, len(json.dumps(read_result(path))))
+        document = {"id": 1, "content": {"data": RESULT}}
+        streamed = json.loads(''.join(stream_result(document, path, 7)))
+        self.assertEqual(streamed, {"id": 1, "content": {"data": read_result(path)}})
+
+    def test_gzip_result(self):
+        path = os.path.join(tempfile.mkdtemp(), '1.json.gz')
+        random.seed(0)
+        data = {"nodes": ({"id": i, "label": str(random.random())} for i in range(20000)), "size": 3}
+        write_result(path, data)
+        self.assertTrue(is_spliceable(path))
+        document = {"id": 1, "name": 'f\u00e9.cnf', "content": RESULT}
+        compressed = b''.join(gzip_result(document, path, chunk_size=1000))
+        # gzip checks crc32 and size of the whole stream
+        self.assertEqual(json.loads(gzip.decompress(compressed)), {"id": 1, "name": 'f\u00e9.cnf',
+                                                                   "content": read_result(path)})
+
+    def test_crc32_combine(self):
+        first, second = b'head of a document', b'x' * 70000
+        self.assertEqual(crc32_combine(zlib.crc32(first), zlib.crc32(second), len(second)),
+                         zlib.crc32(first + second))
+
+    def test_materialized(self):
+        data = {"nodes": iter([1, 2]), "info": [3], "network": {"edges": iter([4])}}
+        self.assertEqual(materialized(data), {"nodes": [1, 2], "info": [3], "network": {"edges": [4]}})
+
+    def test_metadata(self):
+        metadata = result_metadata({"info": ["c x"], "nodes": [], "layout": {"status": 'done'}}, 10)
+        self.assertEqual(metadata, {"info": ["c x"], "layout": {"status": 'done'}, "stored": 'file', "stored_size": 10})
+        self.assertTrue(is_stored(metadata))
+        self.assertFalse(is_stored({"nodes": []}))
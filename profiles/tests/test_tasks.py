@@ -60,7 +60,7 @@ class TestTasks(TestCase):
         x = CommunityManager(graph).calculate_communities()
         self.assertEqual(len(x), 2)
         self.assertEqual(x[0].vertex_list, [1, 2, 3])
-        self.assertEqual(x[1].vertex_list, [5, 6, 4])
+        self.assertEqual(x[1].vertex_list, [4, 5, 6])
 
     def test_calculate_communities_performance(self):
         # 100 25 sec
@@ -78,8 +78,9 @@ class TestTasks(TestCase):
     def test_start_community_task(self):
         json_file = self._create_graph()
         start_community_task(None, json_file.id)
-        graph_dict = JsonFile.objects.filter(~Q(id=json_file.id)).get().content
-        self.assertEqual(len(graph_dict['nodes']), 7)
+        content = JsonFile.objects.filter(~Q(id=json_file.id)).get().content
+        self.assertEqual(content['visualization'], json_file.id)
+        self.assertEqual(len(content['membership']), 7)
 
     @staticmethod
     def _create_graph():
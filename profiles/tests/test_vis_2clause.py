@@ -0,0 +1,21 @@
+from unittest import TestCase
+
+from profiles.vis_tasks.cnf_parser import parse_cnf_lines
+from profiles.vis_tasks.vis_2clause import two_clause_graph
+
+
+class TestVis2Clause(TestCase):
+
+    def test_two_clause_graph(self):
+        store = parse_cnf_lines(['3 -1 0\n', '-1 3 0\n', '1 2 3 0\n', '2 1 0\n'] + ['-2 -3 0\n'] * 25)
+        data = two_clause_graph(store)
+        self.assertEqual([n['id'] for n in data['nodes']], [3, 1, 2])
+        edges = [(e['from'], e['to'], e['label'], e['width'], e['color']['color']) for e in data['edges']]
+        self.assertEqual(edges, [
+            (1, 3, '2', 2, 'rgb(0,0,255)'),
+            (1, 2, '1', 1, 'rgb(0,0,0)'),
+            (1, 3, '1', 1, 'rgb(0,0,0)'),
+            (2, 3, '1', 1, 'rgb(0,0,0)'),
+            (1, 2, '1', 1, 'rgb(255,0,0)'),
+            (2, 3, '25', 20, 'rgb(0,128,0)'),
+        ])
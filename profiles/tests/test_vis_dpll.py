@@ -0,0 +1,52 @@
+import tempfile
+from unittest import TestCase
+
+from profiles.vis_tasks.vis_dpll import DpllTree, expand_subtree, DECISION, CONFLICT, UNSAT, UNRESOLVED_COLOR
+
+
+class TestVisDpll(TestCase):
+
+    def test_build_tree(self):
+        trail = ['d', 1, 1, 2, 'c', 'b', 1, 'd', -1, -1, 2, 'c', 'unsat']
+        tree = DpllTree(trail)
+        tree.build_tree()
+        tree.visualize_tree()
+        self.assertEqual(len(trail), 13)
+        self.assertEqual(list(tree.v_nodes), ['1.1', '2.1', 'CONF.1', '2.2', 'UNSAT'])
+        self.assertEqual([node['level'] for node in tree.v_nodes.values()], [0, 1, 2, 1, 2])
+        self.assertEqual([tree.ntype[node] for node in range(len(tree))], [DECISION, 0, CONFLICT, 0, UNSAT])
+        self.assertEqual(list(tree.v_edges), ['1.1-2.1:1', '2.1-CONF.1:1', '1.1-2.2:0', '2.2-UNSAT:1'])
+
+    def test_back_to_nearest_node(self):
+        trail = ['d', 1, 1, 'd', 2, 2, 'd', 3, 3, 'c', 'b', 3, 'd', -3, -3, 'c', 'b', 2, 'd', -2, -2, 3, 'sat']
+        tree = DpllTree(trail)
+        tree.build_tree()
+        tree.visualize_tree()
+        self.assertEqual(list(tree.v_edges), ['1.1-2.1:1', '2.1-3.1:1', '3.1-CONF.1:1', '3.1-CONF.2:0', '2.1-3.2:0',
+                                              '3.2-SAT:1'])
+
+    def test_bounded_tree_expand(self):
+        trail = ['d', 1, 1, 'd', 2, 2, 'd', 3, 3, 'c', 'b', 3, 'd', -3, -3, 'c', 'b', 2, 'd', -2, -2, 3, 'sat']
+        tree = DpllTree(trail)
+        tree.build_tree()
+        tree.visualize_tree(max_nodes=2)
+        self.assertEqual(list(tree.v_nodes), ['1.1', '2.1', 'sub.2', 'sub.5'])
+        self.assertEqual(tree.v_nodes['sub.2']['collapsed'],
+                         {"node": 2, "nodes": 3, "decisions": 1, "conflicts": 2, "depth": 3})
+        self.assertEqual(tree.v_edges['2.1-sub.2:1']['to'], 'sub.2')
+
+        directory = tempfile.mkdtemp() + '/moms'
+        tree.save(directory)
+        expanded = expand_subtree(directory, 2, max_depth=1)
+        self.assertEqual(expanded['parent'], 'sub.2')
+        self.assertEqual([node['id'] for node in expanded['nodes']], ['3.1', 'CONF.1', 'CONF.2'])
+        self.assertEqual([(edge['from'], edge['to']) for edge in expanded['edges']],
+                         [('3.1', 'CONF.1'), ('3.1', 'CONF.2'), ('2.1', '3.1')])
+        self.assertIsNone(expand_subtree(directory, 9))
+
+    def test_unresolved_leaf(self):
+        tree = DpllTree(['d', 1, 1, 2, 'c', 'b', 1, 'd', -1, 'unresolved'])
+        tree.build_tree()
+        tree.visualize_tree()
+        self.assertEqual(list(tree.v_edges), ['1.1-2.1:1', '2.1-CONF.1:1', '1.1-UNRESOLVED:0'])
+        self.assertEqual(tree.v_nodes['UNRESOLVED']['color']['background'], UNRESOLVED_COLOR)
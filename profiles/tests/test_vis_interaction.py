@@ -0,0 +1,20 @@
+from unittest import TestCase
+
+from profiles.vis_tasks.cnf_parser import parse_cnf_lines
+from profiles.vis_tasks.vis_interaction import interaction_edges, interaction_graph
+
+
+class TestVisInteraction(TestCase):
+
+    def test_interaction_graph(self):
+        store = parse_cnf_lines(['p cnf 4 3\n', '1 -2 3 0\n', '-3 2 0\n', '4 -4 0\n'])
+        sources, targets, weights = interaction_edges(store, 4)
+        data = interaction_graph(store, sources, targets, weights)
+        self.assertEqual([n['id'] for n in data['nodes']], [1, 2, 3, 4])
+        edges = {(e['from'], e['to']): (e['weight'], e['color']['opacity']) for e in data['edges']}
+        self.assertEqual(edges, {
+            (1, 2): (1, 0.1),
+            (1, 3): (1, 0.1),
+            (2, 3): (2, 0.2),
+            (4, 4): (1, 0.1),
+        })
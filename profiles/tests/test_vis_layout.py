@@ -0,0 +1,40 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from profiles.vis_tasks.vis_layout import graph_arrays, seed_positions, layout_content, save_layout, load_layout, \
+    LAYOUT_SCALE
+
+
+class TestVisLayout(TestCase):
+
+    def test_graph_arrays(self):
+        nodes = [{"id": 3}, {"id": 'v1'}, {"id": -2}]
+        edges = [{"from": 3, "to": -2}, {"from": 'v1', "to": 7}, {"from": -2, "to": 'v1'}]
+        ids, sources, targets = graph_arrays(nodes, edges)
+        self.assertEqual(ids, [3, 'v1', -2])
+        self.assertEqual(sources.tolist(), [0, 2])
+        self.assertEqual(targets.tolist(), [2, 1])
+
+    def test_seed_positions(self):
+        cached = {'nodes:1': (1.0, 2.0), 'nodes:2': (3.0, 4.0)}
+        positions = seed_positions(['nodes:2', 'nodes:1', 'nodes:5'], cached)
+        self.assertEqual(positions[:2].tolist(), [[3.0, 4.0], [1.0, 2.0]])
+        self.assertIn(tuple(positions[2]), cached.values())
+        self.assertIsNone(seed_positions(['nodes:1', 'nodes:5', 'nodes:6'], cached))
+
+    def test_layout_content_and_cache(self):
+        for algorithm in ('drl', 'fr'):
+            content = {
+                "nodes": [{"id": i} for i in range(1, 7)],
+                "edges": [{"from": i, "to": i % 6 + 1} for i in range(1, 7)],
+            }
+            positions = layout_content(content, 'sat_vis_interaction', algorithm)
+            self.assertEqual(len(positions), 6)
+            xs = [node['x'] for node in content['nodes']]
+            ys = [node['y'] for node in content['nodes']]
+            self.assertLessEqual(max(max(xs) - min(xs), max(ys) - min(ys)), LAYOUT_SCALE + 0.01)
+
+            path = os.path.join(tempfile.mkdtemp(), '.layouts', 'layout.npz')
+            save_layout(path, positions)
+            self.assertEqual(load_layout(path), positions)
@@ -0,0 +1,25 @@
+from unittest import TestCase
+
+from profiles.vis_tasks.cnf_parser import parse_cnf_lines
+from profiles.vis_tasks.vis_matrix import dependency_matrix, variable_order, compact_matrix
+
+
+class TestVisMatrix(TestCase):
+
+    def test_dependency_matrix(self):
+        store = parse_cnf_lines(['p cnf 3 2\n', '1 -2 0\n', '-1 -2 3 0\n'])
+        indptr, indices, positive, negative = dependency_matrix(store, 3)
+        self.assertEqual(indptr.tolist(), [0, 2, 4, 6])
+        self.assertEqual(indices.tolist(), [1, 2, 0, 2, 0, 1])
+        self.assertEqual(positive.tolist(), [1, 0, 0, 0, 1, 1])
+        self.assertEqual(negative.tolist(), [1, 1, 2, 1, 0, 0])
+
+    def test_compact_matrix_with_order(self):
+        store = parse_cnf_lines(['p cnf 3 2\n', '2 3 0\n', '-3 1 0\n'])
+        indptr, indices, positive, negative = dependency_matrix(store, 3)
+        order = variable_order(indptr, indices, positive + negative, 3, 'degree')
+        self.assertEqual(order.tolist(), [2, 0, 1])
+        data = compact_matrix(indptr, indices, positive, negative, 3, order)
+        self.assertEqual(data['labels'], ['2', '0', '1'])
+        cells = set(zip(data['rows'], data['cols']))
+        self.assertEqual(cells, {(0, 1), (0, 2), (1, 0), (2, 0)})
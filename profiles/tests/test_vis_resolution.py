@@ -0,0 +1,62 @@
+from unittest import TestCase
+
+from profiles.vis_tasks.cnf_parser import parse_cnf_lines
+from profiles.vis_tasks.edge_budget import TopEdges, DegreeCappedEdges
+from profiles.vis_tasks.vis_resolution import resolution_edges, resolution_graph, node_count
+
+
+class TestVisResolution(TestCase):
+
+    def setUp(self):
+        self.store = parse_cnf_lines(['1 2 0\n', '-1 2 0\n', '-1 -2 0\n', '1 -2 3 0\n'])
+
+    def test_full(self):
+        (sources, targets), hubs, counts = resolution_edges(self.store)
+        edges = set(zip(sources.tolist(), targets.tolist()))
+        self.assertEqual(edges, {(1, 2), (1, 3), (4, 2), (4, 3), (1, 4), (2, 3), (2, 4)})
+        self.assertEqual(counts, {"pairs": 8, "hubs": 0})
+        self.assertEqual(len(hubs[0]), 0)
+
+    def test_hub(self):
+        (sources, targets), hubs, counts = resolution_edges(self.store, 'full', hub_pairs=3)
+        # variables 1 and 2 both have 2 * 2 pairs and become hubs
+        self.assertEqual(counts["hubs"], 2)
+        self.assertEqual(len(sources), 0)
+        data = resolution_graph(lambda c: {"id": c}, sources, targets, hubs)
+        edges = list(data['edges'])
+        self.assertIn({"from": 1, "to": 'v1', "color": {"color": 'green'}}, edges)
+        self.assertIn({"from": 'v1', "to": 2, "color": {"color": 'red'}}, edges)
+        self.assertEqual(len(edges), 8)
+        self.assertEqual([n['id'] for n in data['nodes']], [1, 2, 3, 4, 'v1', 'v2'])
+
+    def test_fanout(self):
+        (sources, targets), _, _ = resolution_edges(self.store, 'fanout', fanout=1)
+        self.assertEqual(len(sources), 4)
+
+    def test_fanout_hubs(self):
+        # without a fanout limit variables above hub_pairs still become hubs
+        (sources, targets), hubs, counts = resolution_edges(self.store, 'fanout', hub_pairs=3)
+        self.assertEqual(counts["hubs"], 2)
+        self.assertEqual(len(sources), 0)
+        (sources, targets), hubs, counts = resolution_edges(self.store, 'fanout', fanout=1, hub_pairs=3)
+        self.assertEqual(counts["hubs"], 0)
+        self.assertEqual(len(sources), 4)
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            resolution_edges(self.store, 'fast')
+
+    def test_selected_variables(self):
+        (sources, targets), _, _ = resolution_edges(self.store.restrict([-2]))
+        edges = set(zip(sources.tolist(), targets.tolist()))
+        self.assertEqual(edges, {(1, 3), (1, 4), (2, 3), (2, 4)})
+
+    def test_hub_mode_budget(self):
+        size = node_count(self.store)
+        for reducer in (TopEdges(5, size), DegreeCappedEdges(5, size, size, 2)):
+            (sources, targets), hubs, _ = resolution_edges(self.store, 'hub', reducer=reducer)
+            edges = list(resolution_graph(lambda c: {"id": c}, sources, targets, hubs)['edges'])
+            self.assertLessEqual(len(edges), 5)
+            self.assertGreater(len(edges), 0)
+            for edge in edges:
+                self.assertIn(edge['color']['color'], ('green', 'red'))
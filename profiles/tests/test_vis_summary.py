@@ -0,0 +1,39 @@
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+
+from profiles.vis_tasks.vis_summary import bounded_levels, factor_summary, interaction_summary, expand_supernode
+
+
+class TestVisSummary(TestCase):
+
+    def test_bounded_levels(self):
+        levels = bounded_levels([np.zeros(10, dtype=np.int64)], 10, 3)
+        self.assertEqual([len(level) for level in levels], [10, 4])
+        self.assertLessEqual(max(np.bincount(levels[0])), 3)
+        self.assertLessEqual(max(np.bincount(levels[1])), 3)
+        self.assertEqual(bounded_levels([np.zeros(3, dtype=np.int64)], 3, 3), [])
+
+    def test_interaction_summary_expand(self):
+        directory = tempfile.mkdtemp() + '/summary'
+        sources, targets = np.array([1, 1, 2, 4, 5]), np.array([2, 5, 3, 5, 6])
+        weights = np.array([1, 2, 1, 3, 1])
+        data = interaction_summary(directory, [1, 2, 3, 4, 5, 6], sources, targets, weights, 'index', 3)
+        self.assertEqual([node['id'] for node in data['nodes']], ['s1_0', 's1_1'])
+        self.assertEqual([(e['from'], e['to'], e['weight']) for e in data['edges']], [('s1_0', 's1_1', 2)])
+
+        expanded = expand_supernode(directory, 's1_0')
+        self.assertEqual([node['id'] for node in expanded['nodes']], [1, 2, 3])
+        edges = {(e['from'], e['to'], e['weight']) for e in expanded['edges']}
+        self.assertEqual(edges, {(1, 2, 1), (2, 3, 1), (1, 's1_1', 2)})
+        self.assertIsNone(expand_supernode(directory, 's2_0'))
+
+    def test_factor_summary(self):
+        directory = tempfile.mkdtemp() + '/summary'
+        data = factor_summary(directory, [1, 2], range(1, 3), np.array([1, 1, 2]), np.array([1, 2, 1]),
+                              np.array([True, False, True]))
+        self.assertEqual(data['summary']['levels'], 0)
+        self.assertEqual({node['id'] for node in data['nodes']}, {1, 2, -1, -2})
+        colors = {(e['from'], e['to']): e['color']['color'] for e in data['edges']}
+        self.assertEqual(colors, {(1, -1): 'green', (1, -2): 'red', (2, -1): 'green'})
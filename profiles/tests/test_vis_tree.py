@@ -0,0 +1,26 @@
+from unittest import TestCase
+
+from profiles.vis_tasks.cnf_parser import parse_cnf_lines
+from profiles.vis_tasks.vis_tree import FormulaTree
+
+
+class TestVisTree(TestCase):
+
+    @staticmethod
+    def tree(lines):
+        tree = FormulaTree(parse_cnf_lines(lines))
+        tree.serialize()
+        return tree
+
+    def test_groups_by_most_common_literal(self):
+        tree = self.tree(['p cnf 3 4\n', '1 2 0\n', '-3 2 0\n', '3 1 0\n', '2 3 0\n'])
+        self.assertEqual([(node['label'], node['level']) for node in tree.nodes],
+                         [('2', 0), ('3', 0), ('1', 1), ('-3', 1), ('3', 1), ('1', 1)])
+        labels = {node['id']: node['label'] for node in tree.nodes}
+        edges = [(labels[edge['from']], labels[edge['to']]) for edge in tree.edges]
+        self.assertEqual(edges, [('2', '1'), ('2', '-3'), ('2', '3'), ('3', '1')])
+
+    def test_repeated_clauses(self):
+        tree = self.tree(['p cnf 2 3\n', '1 2 0\n', '1 2 0\n', '1 1 0\n'])
+        self.assertEqual([(node['label'], node['level']) for node in tree.nodes],
+                         [('1', 0), ('2', 1), ('1', 1)])
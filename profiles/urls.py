@@ -11,6 +11,13 @@ urlpatterns = [
     url(r'^file/maxsat/(?P<pk>\d+)/(?P<vistype>\w+)/$', TextMaxSatFileView.as_view(), name='maxsat_file'),
     url(r'^visualizations', VisualizationView.as_view(), name='visualizations'),
     url(r'^visualization/(?P<pk>\d+)/(?P<vistype>\w+)/$', JsonFileView.as_view(), name='json_file'),
+    url(r'^visualization/(?P<pk>\d+)/tile/(?P<zoom>\d+)/(?P<x>\d+)/(?P<y>\d+)/$', HeatmapTileView.as_view(),
+        name='heatmap_tile'),
+    url(r'^visualization/(?P<pk>\d+)/expand/(?P<node>s\d+_\d+)/$', SupernodeExpandView.as_view(),
+        name='supernode_expand'),
+    url(r'^visualization/(?P<pk>\d+)/dpll/(?P<heuristic>moms|dlis|jw)/(?P<node>\d+)/$', DpllSubtreeView.as_view(),
+        name='dpll_subtree'),
+    url(r'^visualization/(?P<pk>\d+)/cancel/$', cancel_task, name='cancel_task'),
     url(r'^visualization/community/(?P<visualization_id>\d+)/$', start_community_task, name='start_community_task'),
     url(r'^register/$', RegistrationView.as_view(), name='user'),
     # url(r'^auth/api-token-auth/$', ObtainLoginTokenView.as_view(), name='user'),
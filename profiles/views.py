@@ -1,13 +1,14 @@
 import json
 import logging
-import re
+import os
 
+import numpy as np
 import requests
 from django.contrib.auth.models import update_last_login
-from django.core.files import File
-from django.http import JsonResponse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
 from django.http.response import Http404
 from rest_framework import status
+from rest_framework.decorators import api_view
 from rest_framework.generics import ListAPIView, DestroyAPIView, RetrieveAPIView, CreateAPIView
 from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import AllowAny
@@ -19,9 +20,18 @@ from django.utils.decorators import method_decorator
 from celery.result import AsyncResult
 
 
-from profiles.models import Profile
+from formulavis.celeryconf import app
+from formulavis.settings import HEATMAP_TILE_SIZE, DPLL_TREE_NODES, DPLL_TREE_DEPTH
+from profiles.models import Profile, parse_vis_options, heatmap_tiles_path, graph_summary_path, dpll_tree_path, \
+    result_path
+from profiles.progress import cancel, CANCELLABLE_FORMATS
+from profiles.results import stream_result, gzip_result, is_spliceable, SIZE_KEY
 from profiles.serializers import *
-from profiles.tasks import create_json, is_comment, is_info, get_lines_amount_for, create_community
+from profiles.tasks import create_json, create_community, load_clause_store
+from profiles.vis_tasks.cnf_parser import check_cnf, CnfFormatError
+from profiles.vis_tasks.heatmap_helpers import load_tile
+from profiles.vis_tasks.vis_dpll import expand_subtree
+from profiles.vis_tasks.vis_summary import expand_supernode
 
 MAX_CNF_SIZE = [100000, 100000]
 logger = logging.getLogger('profiles')
@@ -55,7 +65,8 @@ def start_community_task(request, visualization_id):
         result = JsonFile.objects.create(
             text_file=TextFile.objects.get(id=existing_visualization.text_file_id),
             json_format='community',
-            selected_vars=[]
+            selected_vars=[],
+            options=parse_vis_options(request.GET) if request is not None else {}
         )
         status = result.status
 
@@ -84,6 +95,31 @@ def start_community_task(request, visualization_id):
     return JsonResponse(json_payload)
 
 
+@api_view(['POST'])
+def cancel_task(request, pk):
+    """
+    Revokes the task of a visualization which has not started yet, the visualization can be started again.
+    Running tasks can be cancelled only for formats in CANCELLABLE_FORMATS, their solvers are asked to stop
+    and finish with the part of the search done so far.
+    """
+    profile = get_profile(request.user)
+    try:
+        json_file = JsonFile.objects.get(pk=pk, text_file__profile=profile, status__in=('empty', 'pending'))
+    except JsonFile.DoesNotExist:
+        return Response({"message": "There is no running task", "status": "not ok"}, status=status.HTTP_404_NOT_FOUND)
+    if json_file.status == 'empty' and json_file.task_id:
+        app.control.revoke(json_file.task_id)
+        # the task may have started meanwhile, then it is handled as a running one
+        if JsonFile.objects.filter(pk=pk, status='empty').update(progress='Cancelled'):
+            return Response({"message": "The task has been cancelled", "status": "ok"})
+        json_file.refresh_from_db()
+    if json_file.status != 'pending' or json_file.json_format not in CANCELLABLE_FORMATS:
+        return Response({"message": "This task cannot be cancelled", "status": "not ok"},
+                        status=status.HTTP_409_CONFLICT)
+    cancel(json_file)
+    return Response({"message": "The task has been cancelled", "status": "ok"})
+
+
 def start_task(request, format, text_file_id):
     json_payload = None
     try:
@@ -95,7 +131,8 @@ def start_task(request, format, text_file_id):
         json_file, j_c = JsonFile.objects.get_or_create(
             text_file=TextFile.objects.get(id=text_file_id),
             json_format=format,
-            selected_vars=[]
+            selected_vars=[],
+            options=parse_vis_options(request.GET)
         )
         status = json_file.status
 
@@ -332,10 +369,6 @@ class SatFileUploadView(APIView):
     def put(self, request, filename):
         file_obj = request.FILES['file']
 
-        INFO_LINE_REGEX = re.compile('^p cnf [1-9][0-9]* [1-9][0-9]*$')
-        COMMENT_LINE_REGEX = re.compile('^c .*$')
-        CNF_LINE_REGEX = re.compile('^((-?[1-9]\d*)\s)*0$')
-
         current_user = request.user
         profile = get_profile(current_user)
 
@@ -346,32 +379,12 @@ class SatFileUploadView(APIView):
             kind='sat'
         )
 
-        success = True
-
-        with open(text_file.content.path) as f:
-            text = File(f)
-            lines_amount = get_lines_amount_for(f)
-            for index, line in enumerate(text):
-                if (not (is_comment(line) or is_info(line))):
-                    if(not CNF_LINE_REGEX.match(line)):
-                        success = False
-                        break
-                elif is_comment(line):
-                    lines_amount -= 1
-                    if (not COMMENT_LINE_REGEX.match(line)):
-                        success = False
-                        break
-                elif is_info(line):
-                    lines_amount -= 1
-                    if (not INFO_LINE_REGEX.match(line) or
-                        int (line.replace("\n", "").split(" ")[3]) != lines_amount):
-                        success = False
-                        break
-
-        if(success):
-            return Response(status=204)
-        else:
+        # the formula is parsed into the clause cache used by its visualizations
+        try:
+            check_cnf(load_clause_store(text_file, weighted=False))
+        except CnfFormatError:
             return Response(status=400)
+        return Response(status=204)
 
 
 class MaxSatFileUploadView(APIView):
@@ -380,10 +393,6 @@ class MaxSatFileUploadView(APIView):
     def put(self, request, filename):
         file_obj = request.FILES['file']
 
-        INFO_LINE_REGEX = re.compile('^p cnf [1-9][0-9]* [1-9][0-9]*$')
-        COMMENT_LINE_REGEX = re.compile('^c .*$')
-        CNF_LINE_REGEX = re.compile('^((-?[1-9]\d*)\s)*0$')
-
         current_user = request.user
         profile = get_profile(current_user)
 
@@ -394,32 +403,12 @@ class MaxSatFileUploadView(APIView):
             kind='maxsat'
         )
 
-        success = True
-
-        with open(text_file.content.path) as f:
-            text = File(f)
-            lines_amount = get_lines_amount_for(f)
-            for index, line in enumerate(text):
-                if (not (is_comment(line) or is_info(line))):
-                    if (not CNF_LINE_REGEX.match(line)):
-                        success = False
-                        break
-                elif is_comment(line):
-                    lines_amount -= 1
-                    if (not COMMENT_LINE_REGEX.match(line)):
-                        success = False
-                        break
-                elif is_info(line):
-                    lines_amount -= 1
-                    if (not INFO_LINE_REGEX.match(line) or
-                            int(line.replace("\n", "").split(" ")[3]) != lines_amount):
-                        success = False
-                        break
-
-        if (success):
-            return Response(status=204)
-        else:
+        # the formula is parsed into the clause cache used by its visualizations
+        try:
+            check_cnf(load_clause_store(text_file, weighted=True))
+        except CnfFormatError:
             return Response(status=400)
+        return Response(status=204)
 
 
 class TextSatFilesView(ListAPIView):
@@ -441,7 +430,40 @@ class TextMaxSatFilesView(ListAPIView):
         return TextFile.objects.filter(profile=profile, kind='maxsat')
 
 
-class TextSatFileView(DestroyAPIView, RetrieveAPIView):
+def stored_result_response(request, document, json_file):
+    """
+    Document with the stored result of a visualization in place of RESULT. Clients accepting gzip
+    get the compressed result as it is stored, otherwise it is decompressed in chunks.
+    """
+    path = result_path(json_file)
+    if 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '') and is_spliceable(path):
+        response = StreamingHttpResponse(gzip_result(document, path, json_file.content.get(SIZE_KEY)),
+                                         content_type='application/json')
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = StreamingHttpResponse(stream_result(document, path), content_type='application/json')
+    response['Vary'] = 'Accept-Encoding'
+    return response
+
+
+class StoredResultMixin:
+    """
+    Retrieves an object whose serializer puts RESULT in place of a result stored in a file,
+    the result is streamed without loading it
+    """
+
+    def retrieve(self, request, *args, **kwargs):
+        serializer = self.get_serializer(self.get_object())
+        document = serializer.data
+        stored = getattr(serializer, 'stored_result', None)
+        if stored is None:
+            return Response(document)
+        if not os.path.isfile(result_path(stored)):
+            raise Http404
+        return stored_result_response(request, document, stored)
+
+
+class TextSatFileView(StoredResultMixin, DestroyAPIView, RetrieveAPIView):
     queryset = TextFile.objects.all()
     serializer_class = TextFileSerializerDetail
 
@@ -456,7 +478,7 @@ class TextSatFileView(DestroyAPIView, RetrieveAPIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class TextMaxSatFileView(DestroyAPIView, RetrieveAPIView):
+class TextMaxSatFileView(StoredResultMixin, DestroyAPIView, RetrieveAPIView):
     queryset = TextFile.objects.all()
     serializer_class = TextFileSerializerDetail
 
@@ -471,7 +493,7 @@ class TextMaxSatFileView(DestroyAPIView, RetrieveAPIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class JsonFileView(DestroyAPIView, RetrieveAPIView):
+class JsonFileView(StoredResultMixin, DestroyAPIView, RetrieveAPIView):
     queryset = JsonFile.objects.all()
     serializer_class = JsonFileSerializerDetail
 
@@ -486,6 +508,71 @@ class JsonFileView(DestroyAPIView, RetrieveAPIView):
             raise Http404
 
 
+class HeatmapTileView(APIView):
+    """
+    One tile of heatmap zoom level as raw float32 values in row-major order,
+    tile shape is sent in X-Tile-Rows and X-Tile-Cols headers
+    """
+
+    def get(self, request, pk=None, zoom=None, x=None, y=None):
+        profile = get_profile(request.user)
+        try:
+            json_file = JsonFile.objects.only('id', 'text_file').get(
+                id=pk, text_file__profile=profile, json_format='sat_vis_heatmap', status='done'
+            )
+        except JsonFile.DoesNotExist:
+            raise Http404
+        tile = load_tile(heatmap_tiles_path(json_file), int(zoom), int(x), int(y), HEATMAP_TILE_SIZE)
+        if tile is None:
+            raise Http404
+        response = HttpResponse(tile.astype(np.float32).tobytes(), content_type='application/octet-stream')
+        response['X-Tile-Rows'] = tile.shape[0]
+        response['X-Tile-Cols'] = tile.shape[1]
+        return response
+
+
+class SupernodeExpandView(APIView):
+    """
+    Children of a supernode of a summarized factor or interaction graph with their edges
+    """
+
+    def get(self, request, pk=None, node=None):
+        profile = get_profile(request.user)
+        try:
+            json_file = JsonFile.objects.only('id', 'text_file', 'options').get(
+                id=pk, text_file__profile=profile, status='done'
+            )
+        except JsonFile.DoesNotExist:
+            raise Http404
+        if not json_file.options.get('summary'):
+            raise Http404
+        data = expand_supernode(graph_summary_path(json_file), node)
+        if data is None:
+            raise Http404
+        return JsonResponse(data)
+
+
+class DpllSubtreeView(APIView):
+    """
+    Collapsed subtree of a DPLL tree of one heuristic, bounded like the tree itself
+    """
+
+    def get(self, request, pk=None, heuristic=None, node=None):
+        profile = get_profile(request.user)
+        try:
+            json_file = JsonFile.objects.only('id', 'text_file', 'options').get(
+                id=pk, text_file__profile=profile, json_format='sat_vis_dpll', status='done'
+            )
+        except JsonFile.DoesNotExist:
+            raise Http404
+        data = expand_subtree(os.path.join(dpll_tree_path(json_file), heuristic), int(node),
+                              json_file.options.get('nodes', DPLL_TREE_NODES),
+                              json_file.options.get('depth', DPLL_TREE_DEPTH))
+        if data is None:
+            raise Http404
+        return JsonResponse(data)
+
+
 from django.contrib.auth.models import User
 from django.contrib.auth.models import update_last_login
 from rest_framework_jwt.views import ObtainJSONWebToken
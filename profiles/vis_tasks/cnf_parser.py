@@ -0,0 +1,294 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import warnings
+
+import numpy as np
+
+CACHE_DIR_NAME = '.clause_cache'
+PAIRS_CHUNK = 1 << 22
+# characters of clause lines converted to numbers at once
+PARSE_CHUNK = 1 << 24
+
+
+class CnfFormatError(ValueError):
+    """
+        Raised when a formula is not valid DIMACS
+    """
+
+
+class ClauseStore:
+    """
+        Columnar (CSR-like) representation of a DIMACS formula:
+            literals - flat int32 array with literals of all clauses
+            offsets  - int64 array, clause i is literals[offsets[i]:offsets[i + 1]]
+            weights  - int64 array with clause weights (MaxSAT only, otherwise None)
+            info     - split 'p' line, same format as data['info'] in visualizations
+    """
+
+    def __init__(self, literals, offsets, weights=None, info=None):
+        self.literals = literals
+        self.offsets = offsets
+        self.weights = weights
+        self.info = info
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @property
+    def declared_variables(self):
+        try:
+            return int(self.info[2])
+        except (TypeError, IndexError, ValueError):
+            return 0
+
+    @property
+    def declared_clauses(self):
+        try:
+            return int(self.info[3])
+        except (TypeError, IndexError, ValueError):
+            return 0
+
+    @property
+    def num_variables(self):
+        max_var = int(np.abs(self.literals).max()) if len(self.literals) else 0
+        return max(self.declared_variables, max_var)
+
+    def clause(self, index):
+        return self.literals[self.offsets[index]:self.offsets[index + 1]]
+
+    def clauses(self):
+        """
+            Yields every clause as a list of python ints
+        """
+        literals = self.literals.tolist()
+        offsets = self.offsets.tolist()
+        for start, end in zip(offsets, offsets[1:]):
+            yield literals[start:end]
+
+    def clause_lengths(self):
+        return np.diff(self.offsets)
+
+    def clause_index(self):
+        """
+            Clause number of every entry in literals (row indices of the CSR structure)
+        """
+        return np.repeat(np.arange(len(self), dtype=np.int64), self.clause_lengths())
+
+    def variables(self):
+        return np.unique(np.abs(self.literals))
+
+    def restrict(self, variables):
+        """
+            Store with only the literals of given variables (of any sign), clause numbers
+            are kept so clauses without these variables become empty
+        """
+        literals = np.asarray(self.literals)
+        selected = np.isin(np.abs(literals), np.abs(np.asarray(variables, dtype=np.int64)))
+        offsets = np.zeros(len(self.offsets), dtype=np.int64)
+        np.cumsum(np.bincount(self.clause_index()[selected], minlength=len(self)), out=offsets[1:])
+        return ClauseStore(literals[selected], offsets, self.weights, self.info)
+
+    def literal_pairs(self, max_pairs=PAIRS_CHUNK):
+        """
+            Yields (first, second) arrays with positions in literals of all ordered pairs of
+            literals from the same clause (including pairs of a literal with itself), in chunks
+            of whole clauses with about max_pairs pairs
+        """
+        lengths = self.clause_lengths()
+        pair_ends = np.cumsum(lengths * lengths)
+        offsets = np.asarray(self.offsets)
+        start = 0
+        while start < len(self):
+            done = pair_ends[start - 1] if start else 0
+            end = max(int(np.searchsorted(pair_ends, done + max_pairs, side='right')), start + 1)
+            yield _clause_pairs(offsets[start:end + 1], lengths[start:end])
+            start = end
+
+    def save(self, directory):
+        np.save(os.path.join(directory, 'literals.npy'), self.literals)
+        np.save(os.path.join(directory, 'offsets.npy'), self.offsets)
+        if self.weights is not None:
+            np.save(os.path.join(directory, 'weights.npy'), self.weights)
+        with open(os.path.join(directory, 'info.json'), 'w') as f:
+            json.dump(self.info, f)
+
+    @classmethod
+    def load(cls, directory, mmap_mode='r'):
+        literals = np.load(os.path.join(directory, 'literals.npy'), mmap_mode=mmap_mode)
+        offsets = np.load(os.path.join(directory, 'offsets.npy'), mmap_mode=mmap_mode)
+        weights = None
+        weights_path = os.path.join(directory, 'weights.npy')
+        if os.path.isfile(weights_path):
+            weights = np.load(weights_path, mmap_mode=mmap_mode)
+        with open(os.path.join(directory, 'info.json')) as f:
+            info = json.load(f)
+        return cls(literals, offsets, weights, info)
+
+
+def _clause_pairs(offsets, lengths):
+    # per literal: start and length of its clause
+    owner_length = np.repeat(lengths, lengths)
+    owner_start = np.repeat(offsets[:-1], lengths)
+    first = np.repeat(np.arange(offsets[0], offsets[-1], dtype=np.int64), owner_length)
+    pair_starts = np.repeat(np.cumsum(owner_length) - owner_length, owner_length)
+    second = np.repeat(owner_start, owner_length) + np.arange(len(first), dtype=np.int64) - pair_starts
+    return first, second
+
+
+def is_comment_line(line):
+    return line.startswith('c') or line.startswith('C')
+
+
+def parse_tokens(text):
+    """
+        Integers of whitespace separated text, raises CnfFormatError on any other token
+    """
+    try:
+        with warnings.catch_warnings():
+            # older numpy only warns about a bad token and returns the numbers before it
+            warnings.simplefilter('ignore', DeprecationWarning)
+            tokens = np.fromstring(text, dtype=np.int64, sep=' ')
+    except ValueError:
+        tokens = None
+    words = text.split()
+    if tokens is None or len(tokens) != len(words):
+        bad = next((word for word in words if not _is_int(word)), None)
+        raise CnfFormatError('Invalid token in clauses: {!r}'.format(bad))
+    return tokens
+
+
+def _is_int(word):
+    try:
+        int(word)
+    except ValueError:
+        return False
+    return True
+
+
+def parse_cnf_lines(lines, weighted=False, chunk_size=PARSE_CHUNK):
+    """
+        Reads DIMACS lines in a single pass. Clauses are terminated by 0 and may span
+        several lines, empty clauses are skipped. For weighted (MaxSAT) formulas the first
+        number of every clause is its weight. Reading stops at a '%' line (the trailer of
+        SATLIB formulas). Clause lines are converted to numbers in blocks of about
+        chunk_size characters.
+    """
+    info = None
+    chunks, block, block_size = [], [], 0
+    for line in lines:
+        if is_comment_line(line):
+            continue
+        if line.startswith('p'):
+            info = line.replace("\n", "").split(' ')
+            continue
+        if line.startswith('%'):
+            break
+        block.append(line)
+        block_size += len(line)
+        if block_size >= chunk_size:
+            chunks.append(parse_tokens(' '.join(block)))
+            block, block_size = [], 0
+    chunks.append(parse_tokens(' '.join(block)))
+
+    tokens = np.concatenate(chunks)
+    ends = np.flatnonzero(tokens == 0)
+    if len(tokens) and tokens[-1] != 0:
+        ends = np.append(ends, len(tokens))
+    starts = np.concatenate(([0], ends[:-1] + 1)).astype(np.int64)
+
+    weights = None
+    if weighted:
+        non_empty = ends > starts
+        starts, ends = starts[non_empty], ends[non_empty]
+        weights = tokens[starts]
+        starts = starts + 1
+
+    lengths = ends - starts
+    non_empty = lengths > 0
+    if weights is not None:
+        weights = weights[non_empty]
+    starts, lengths = starts[non_empty], lengths[non_empty]
+
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    # index of every literal in tokens: start of its clause + position within the clause
+    positions = np.repeat(starts - offsets[:-1], lengths) + np.arange(offsets[-1], dtype=np.int64)
+    literals = tokens[positions].astype(np.int32)
+
+    return ClauseStore(literals, offsets, weights, info)
+
+
+def check_cnf(store):
+    """
+        Raises CnfFormatError unless the formula has a 'p cnf <variables> <clauses>' line with
+        positive numbers and the declared number of clauses
+    """
+    info = store.info
+    if not info or len(info) != 4 or info[:2] != ['p', 'cnf'] or \
+            store.declared_variables < 1 or store.declared_clauses < 1:
+        raise CnfFormatError('Invalid problem line: {!r}'.format(' '.join(info or [])))
+    if store.declared_clauses != len(store):
+        raise CnfFormatError('{} clauses declared, {} found'.format(store.declared_clauses, len(store)))
+
+
+def parse_cnf(path, weighted=False):
+    with open(path) as f:
+        return parse_cnf_lines(f, weighted)
+
+
+def file_hash(path, chunk_size=1 << 20):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_path_for(path, weighted=False, content_hash=None):
+    """
+        Cache directory of a formula: <file dir>/.clause_cache/<sha1 of content>[_w]
+    """
+    content_hash = content_hash or file_hash(path)
+    suffix = '_w' if weighted else ''
+    return os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIR_NAME, content_hash + suffix)
+
+
+def cached_parse_cnf(path, weighted=False, content_hash=None):
+    """
+        Returns memory-mapped ClauseStore from the cache, the formula is parsed and
+        written to the cache on first use. With a known content_hash the file is not
+        read to find its cache.
+    """
+    cache_path = cache_path_for(path, weighted, content_hash)
+    if os.path.isdir(cache_path):
+        try:
+            return ClauseStore.load(cache_path)
+        except (OSError, ValueError):
+            shutil.rmtree(cache_path, ignore_errors=True)
+
+    store = parse_cnf(path, weighted)
+    cache_root = os.path.dirname(cache_path)
+    try:
+        os.makedirs(cache_root, exist_ok=True)
+        tmp_path = tempfile.mkdtemp(dir=cache_root)
+        store.save(tmp_path)
+        try:
+            os.rename(tmp_path, cache_path)
+        except OSError:
+            # another worker has already written the same formula
+            shutil.rmtree(tmp_path, ignore_errors=True)
+    except OSError:
+        pass
+    return store
+
+
+def remove_clause_cache(path, content_hash=None):
+    if not content_hash:
+        if not os.path.isfile(path):
+            return
+        content_hash = file_hash(path)
+    for weighted in (False, True):
+        shutil.rmtree(cache_path_for(path, weighted, content_hash), ignore_errors=True)
@@ -0,0 +1,219 @@
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+REDUCTIONS = ('top', 'degree', 'sample')
+# Kept edges are compacted when this many new edges are buffered
+COMPACT_SIZE = 1 << 20
+# Rounds of greedy acceptance of one block by DegreeCappedEdges
+ACCEPT_ROUNDS = 8
+
+
+def unique_last(keys):
+    """
+        Indices of the last occurrence of every key, in order of keys
+    """
+    reversed_keys = keys[::-1]
+    _, index = np.unique(reversed_keys, return_index=True)
+    return len(keys) - 1 - index
+
+
+def _mix(keys, seed):
+    # splitmix64 finalizer, a fixed pseudo-random priority of every key
+    x = keys.astype(np.uint64) + np.uint64(seed * 0x9E3779B97F4A7C15 % (1 << 64))
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+class EdgeReducer(ABC):
+    """
+        Keeps at most 'budget' edges out of edges added in blocks. Edges are int64 keys
+        row * size + col with weights and optional values (e.g. sign of a literal).
+        An edge added more than once is kept once.
+    """
+
+    def __init__(self, budget, size):
+        self.budget = budget
+        self.size = size
+        self.total = 0
+        self.keys = np.zeros(0, dtype=np.int64)
+        self.weights = np.zeros(0, dtype=np.int64)
+        self.values = None
+
+    @abstractmethod
+    def add(self, keys, weights, values=None):
+        pass
+
+    def result(self):
+        """
+            Kept (keys, weights, values) ordered by key
+        """
+        order = np.argsort(self.keys, kind='stable')
+        values = self.values[order] if self.values is not None else None
+        return self.keys[order], self.weights[order], values
+
+    def _append(self, keys, weights, values):
+        self.keys = np.concatenate((self.keys, keys))
+        self.weights = np.concatenate((self.weights, weights))
+        if values is not None:
+            self.values = values if self.values is None else np.concatenate((self.values, values))
+
+    def _take(self, index):
+        self.keys = self.keys[index]
+        self.weights = self.weights[index]
+        if self.values is not None:
+            self.values = self.values[index]
+
+
+class TopEdges(EdgeReducer):
+    """
+        Heaviest edges, ties are broken by smaller key
+    """
+
+    def __init__(self, budget, size):
+        super().__init__(budget, size)
+        self.buffered = 0
+
+    def add(self, keys, weights, values=None):
+        self.total += len(keys)
+        self._append(keys, weights, values)
+        self.buffered += len(keys)
+        if self.buffered >= max(self.budget, COMPACT_SIZE):
+            self._compact()
+
+    def result(self):
+        self._compact()
+        return super().result()
+
+    def _priority(self):
+        return -self.weights
+
+    def _compact(self):
+        self.buffered = 0
+        if not len(self.keys):
+            return
+        # the same edge from different blocks: keep its highest priority copy
+        priority = self._priority()
+        order = np.lexsort((priority, self.keys))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = self.keys[order[1:]] != self.keys[order[:-1]]
+        self._take(order[first])
+        if len(self.keys) > self.budget:
+            order = np.lexsort((self.keys, self._priority()))
+            self._take(order[:self.budget])
+
+
+class SampledEdges(TopEdges):
+    """
+        Uniform sample of edges. Every edge gets a pseudo-random priority computed from
+        its key and the seed, so the sample is reproducible and independent of the order
+        in which edges are added.
+    """
+
+    def __init__(self, budget, size, seed=0):
+        super().__init__(budget, size)
+        self.seed = seed
+
+    def _priority(self):
+        return _mix(self.keys, self.seed)
+
+
+class DegreeCappedEdges(EdgeReducer):
+    """
+        Edges accepted greedily, heaviest first within every added block, as long as
+        both ends have less than max_degree kept edges. With symmetric=True rows and
+        cols are the same nodes (e.g. variables of the interaction graph).
+    """
+
+    def __init__(self, budget, size, rows, max_degree, symmetric=True):
+        super().__init__(budget, size)
+        self.max_degree = max_degree
+        self.symmetric = symmetric
+        self.rows = rows
+        self.degree = np.zeros(rows if symmetric else rows + size, dtype=np.int64)
+
+    def add(self, keys, weights, values=None):
+        self.total += len(keys)
+        remaining = self.budget - len(self.keys)
+        if remaining <= 0 or not len(keys):
+            return
+        new = ~np.isin(keys, self.keys)
+        order = np.flatnonzero(new)[np.argsort(-weights[new], kind='stable')]
+        keys, weights = keys[order], weights[order]
+        if values is not None:
+            values = values[order]
+
+        rows, cols = np.divmod(keys, self.size)
+        if not self.symmetric:
+            cols = cols + self.rows
+        candidates = np.arange(len(keys))
+        for _ in range(ACCEPT_ROUNDS):
+            free = (self.degree[rows[candidates]] < self.max_degree) & \
+                   (self.degree[cols[candidates]] < self.max_degree)
+            candidates = candidates[free]
+            if remaining <= 0 or not len(candidates):
+                break
+            accepted = self._accept(rows[candidates], cols[candidates])[:remaining]
+            chosen = candidates[accepted]
+            self._append(keys[chosen], weights[chosen], values[chosen] if values is not None else None)
+            self.degree += np.bincount(np.concatenate((rows[chosen], cols[chosen])), minlength=len(self.degree))
+            remaining -= len(chosen)
+            candidates = np.delete(candidates, accepted)
+
+    def _accept(self, rows, cols):
+        """
+            Indices of edges which fit under the cap even if every earlier edge of the
+            block with the same node is accepted
+        """
+        ends = np.concatenate((rows, cols))
+        by_node = np.argsort(ends, kind='stable')
+        sorted_ends = ends[by_node]
+        starts = np.flatnonzero(np.concatenate(([True], sorted_ends[1:] != sorted_ends[:-1])))
+        group_start = np.repeat(starts, np.diff(np.append(starts, len(ends))))
+        rank = np.empty(len(ends), dtype=np.int64)
+        rank[by_node] = np.arange(len(ends)) - group_start
+        return np.flatnonzero((self.degree[rows] + rank[:len(rows)] < self.max_degree) &
+                              (self.degree[cols] + rank[len(rows):] < self.max_degree))
+
+
+def edge_reducer(options, size, rows, nodes, symmetric=True):
+    """
+        Reducer for the 'edges' (budget), 'reduce' ('top', 'degree' or 'sample'),
+        'degree' and 'seed' options of a visualization, None when there is no budget
+    """
+    budget = options.get('edges')
+    if budget is None or budget < 0:
+        return None
+    method = options.get('reduce', 'top')
+    if method == 'sample':
+        return SampledEdges(budget, size, options.get('seed', 0))
+    if method == 'degree':
+        max_degree = options.get('degree') or max(1, 2 * budget // max(nodes, 1))
+        return DegreeCappedEdges(budget, size, rows, max_degree, symmetric)
+    return TopEdges(budget, size)
+
+
+def collect_edges(blocks, reducer=None):
+    """
+        Concatenates (keys, weights, values) blocks or passes them through the reducer
+    """
+    if reducer is not None:
+        for keys, weights, values in blocks:
+            reducer.add(keys, weights, values)
+        return reducer.result()
+    keys, weights, values = [], [], []
+    for block_keys, block_weights, block_values in blocks:
+        keys.append(block_keys)
+        weights.append(block_weights)
+        if block_values is not None:
+            values.append(block_values)
+    if not keys:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), None
+    return np.concatenate(keys), np.concatenate(weights), np.concatenate(values) if values else None
+
+
+def reduction_info(reducer):
+    if reducer is None:
+        return None
+    return {"budget": reducer.budget, "total": reducer.total, "kept": len(reducer.keys)}
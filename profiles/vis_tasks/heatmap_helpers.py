@@ -1,33 +1,193 @@
+import os
+import shutil
+
 import numpy as np
 
+REDUCERS = ('mean', 'sum', 'max')
+
+
+def preview_shape(rows, cols, max_size):
+    """
+        Requested resolution of a heatmap preview limited to 1..max_size cells per axis
+    """
+    return max(1, min(int(rows), max_size)), max(1, min(int(cols), max_size))
+
+
+def block_edges(size, target):
+    """
+        Boundaries of min(target, size) nearly equal, non empty blocks covering range(size)
+    """
+    target = max(1, min(int(target), size))
+    return np.linspace(0, size, target + 1).astype(np.int64)
+
+
+def _reduce_axis(array, edges, axis, reducer):
+    size = array.shape[axis]
+    blocks = len(edges) - 1
+    if size % blocks == 0:
+        # equal blocks, reduce with a reshaped view
+        shape = array.shape[:axis] + (blocks, size // blocks) + array.shape[axis + 1:]
+        blocked = array.reshape(shape)
+        return blocked.max(axis=axis + 1) if reducer == 'max' else blocked.sum(axis=axis + 1)
+    ufunc = np.maximum if reducer == 'max' else np.add
+    return ufunc.reduceat(array, edges[:-1], axis=axis)
+
+
+def _block_counts(row_edges, col_edges):
+    return np.outer(np.diff(row_edges), np.diff(col_edges))
+
+
+def _check_reducer(reducer):
+    if reducer not in REDUCERS:
+        raise ValueError(f'Unknown reducer {reducer}, expected one of {REDUCERS}')
+
+
+def block_reduce(heatmap, shape, reducer='mean'):
+    """
+        Reduces 2D heatmap to at most shape=(rows, cols) cells, every cell of the result is
+        mean, sum or max of one block of the input
+    """
+    _check_reducer(reducer)
+    heatmap = np.asarray(heatmap, dtype=float)
+    row_edges = block_edges(heatmap.shape[0], shape[0])
+    col_edges = block_edges(heatmap.shape[1], shape[1])
+    reduced = _reduce_axis(_reduce_axis(heatmap, row_edges, 0, reducer), col_edges, 1, reducer)
+    if reducer == 'mean':
+        reduced = reduced / _block_counts(row_edges, col_edges)
+    return reduced
+
+
+def block_reduce_outer(row_factor, col_factor, shape, reducer='mean'):
+    """
+        block_reduce of np.outer(row_factor, col_factor) without creating the outer product,
+        factors have to be non-negative for the 'max' reducer
+    """
+    _check_reducer(reducer)
+    row_factor = np.asarray(row_factor, dtype=float)
+    col_factor = np.asarray(col_factor, dtype=float)
+    row_edges = block_edges(len(row_factor), shape[0])
+    col_edges = block_edges(len(col_factor), shape[1])
+    rows = _reduce_axis(row_factor, row_edges, 0, reducer)
+    cols = _reduce_axis(col_factor, col_edges, 0, reducer)
+    if reducer == 'mean':
+        rows = rows / np.diff(row_edges)
+        cols = cols / np.diff(col_edges)
+    return np.outer(rows, cols)
+
+
+def block_reduce_sparse(rows, cols, values, size, shape, reducer='mean'):
+    """
+        block_reduce of a sparse heatmap given in coordinate format (rows, cols, values) with
+        size=(height, width), missing cells are zeros and values have to be non-negative
+        for the 'max' reducer
+    """
+    _check_reducer(reducer)
+    row_edges = block_edges(size[0], shape[0])
+    col_edges = block_edges(size[1], shape[1])
+    block_rows = np.searchsorted(row_edges, rows, side='right') - 1
+    block_cols = np.searchsorted(col_edges, cols, side='right') - 1
+    result_shape = (len(row_edges) - 1, len(col_edges) - 1)
+    block_ids = np.ravel_multi_index((block_rows, block_cols), result_shape)
+    values = np.asarray(values, dtype=float)
+
+    if reducer == 'max':
+        reduced = np.zeros(result_shape[0] * result_shape[1])
+        np.maximum.at(reduced, block_ids, values)
+    else:
+        reduced = np.bincount(block_ids, weights=values, minlength=result_shape[0] * result_shape[1])
+    reduced = reduced.reshape(result_shape)
+    if reducer == 'mean':
+        reduced = reduced / _block_counts(row_edges, col_edges)
+    return reduced
+
+
+def block_pyramid(heatmap, shape, levels, reducer='mean'):
+    """
+        Zoom levels of a heatmap in one pass: the first level is block_reduce(heatmap, shape),
+        every next level merges 2x2 blocks of the previous one
+    """
+    _check_reducer(reducer)
+    heatmap = np.asarray(heatmap, dtype=float)
+    row_edges = block_edges(heatmap.shape[0], shape[0])
+    col_edges = block_edges(heatmap.shape[1], shape[1])
+    reduced = _reduce_axis(_reduce_axis(heatmap, row_edges, 0, reducer), col_edges, 1, reducer)
+    counts = _block_counts(row_edges, col_edges)
+
+    pyramid = []
+    for level in range(levels):
+        if level:
+            row_starts = np.arange(0, reduced.shape[0], 2)
+            col_starts = np.arange(0, reduced.shape[1], 2)
+            ufunc = np.maximum if reducer == 'max' else np.add
+            reduced = ufunc.reduceat(ufunc.reduceat(reduced, row_starts, axis=0), col_starts, axis=1)
+            counts = np.add.reduceat(np.add.reduceat(counts, row_starts, axis=0), col_starts, axis=1)
+        pyramid.append(reduced / counts if reducer == 'mean' else reduced)
+    return pyramid
+
+
+def pyramid_levels(shape, tile_size):
+    """
+        Number of zoom levels needed until the coarsest one fits into a single tile
+    """
+    levels = 1
+    size = max(shape)
+    while size > tile_size:
+        size = (size + 1) // 2
+        levels += 1
+    return levels
+
+
+def save_tile_pyramid(directory, pyramid):
+    """
+        Saves zoom levels (finest first) as float32 arrays, zoom 0 is the coarsest level
+    """
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory)
+    for zoom, level in enumerate(reversed(pyramid)):
+        np.save(os.path.join(directory, f'zoom_{zoom}.npy'), level.astype(np.float32))
+
+
+def load_tile(directory, zoom, x, y, tile_size):
+    """
+        Tile x (column) and y (row) of a zoom level, None if it does not exist
+    """
+    path = os.path.join(directory, f'zoom_{zoom}.npy')
+    if not os.path.isfile(path):
+        return None
+    level = np.load(path, mmap_mode='r')
+    if y * tile_size >= level.shape[0] or x * tile_size >= level.shape[1]:
+        return None
+    return np.array(level[y * tile_size:(y + 1) * tile_size, x * tile_size:(x + 1) * tile_size])
+
 
-def regrid_x(heatmap, step):
-    step = int(step)
-    new_indexes = np.asarray(list(range(0, heatmap.shape[0], step)))
-    new_indexes = new_indexes[1:-1]
-    new_heatmap = np.zeros((len(new_indexes), heatmap.shape[1]))
+def heatmap_factors(store, cl_count, var_count):
+    """
+        The heatmap cell (clause i, variable j) is occurrences[j] / clause_length[i], so the
+        whole matrix is an outer product of two vectors:
+            clause_factor[i] = 1 / number of distinct variables in clause i (0 for empty clause)
+            occurrences[j]   = number of clauses containing variable j
+    """
+    variables = np.abs(store.literals).astype(np.int64) - 1
+    keys = np.unique(store.clause_index() * var_count + variables)
+    clause_idx, var_idx = np.divmod(keys, var_count)
 
-    zone_size = step
-    zone_offset = int(zone_size//2)
+    clause_length = np.bincount(clause_idx, minlength=cl_count)
+    occurrences = np.bincount(var_idx, minlength=var_count).astype(float)
 
-    for variable_index in range(heatmap.shape[1]):
-        for i, new_index in enumerate(new_indexes):
-            batch = heatmap[new_index - zone_offset:new_index+zone_offset + 1, variable_index]
-            new_heatmap[i][variable_index] = np.mean(batch)
-    return new_heatmap
+    clause_factor = np.zeros(cl_count)
+    np.divide(1.0, clause_length, out=clause_factor, where=clause_length != 0)
+    return clause_factor, occurrences
 
 
-def regrid_y(heatmap, step):
-    step = int(step)
-    new_indexes = np.asarray(list(range(0, heatmap.shape[1], step)))
-    new_indexes = new_indexes[1:-1]
-    new_heatmap = np.zeros((heatmap.shape[0], len(new_indexes)))
+def dense_heatmap(clause_factor, occurrences):
+    return clause_factor[:, None] * occurrences[None, :]
 
-    zone_size = step
-    zone_offset = int(zone_size // 2)
 
-    for clause_index in range(heatmap.shape[0]):
-        for i, new_index in enumerate(new_indexes):
-            batch = heatmap[clause_index, new_index - zone_offset:new_index + zone_offset + 1]
-            new_heatmap[clause_index][i] = np.mean(batch)
-    return new_heatmap
+def color_bins(heatmap, ranges):
+    """
+        Index of the [low, high) range for every cell, cells outside all ranges get 0
+    """
+    bounds = np.asarray([rng[0] for rng in ranges] + [ranges[-1][1]])
+    bins = np.digitize(heatmap, bounds[1:-1])
+    bins[(heatmap < bounds[0]) | (heatmap >= bounds[-1])] = 0
+    return bins
@@ -1,7 +1,6 @@
 import operator
 import time
 import os
-import marshal
 
 # CONSTANT
 VERSION = 'FINAL_v0.1'
@@ -11,16 +10,414 @@ UNRESOLVED = -1
 K_MOMS = 1024  # 2^10, k = 10
 
 
+class WatchedFormula:
+    """
+        Clauses with two watched literals each. Assigned literals are kept on a trail and
+        undone back to a trail position, watches are not changed by undo.
+            clauses - lists of literals (a literal may occur more than once)
+            watch   - positions of the two watched literals of every clause (the same
+                      position twice for clauses of one literal)
+            watches - {lit: [numbers of clauses watching lit]}, a clause watching the same
+                      literal at both positions is listed twice
+            value   - value of every literal indexed by the literal itself
+            true_count - number of true literals of every clause, kept up to date through
+                      occurrences {lit: [numbers of clauses containing lit]}
+            free_count - number of unassigned literals of every clause
+            unsatisfied - number of clauses without a true literal
+            listener   - heuristic scores, told about clauses which got or lost their only
+                      true literal or an unassigned literal of a clause without a true one
+    """
+
+    def __init__(self, clauses):
+        self.clauses = clauses
+        self.num_variables = max((abs(lit) for clause in clauses for lit in clause), default=0)
+        # value of every literal: 1 true, -1 false, 0 unassigned, negative literals are at the end
+        self.value = [0] * (2 * self.num_variables + 1)
+        self.trail = []
+        self.watch = []
+        self.watches = {}
+        self.occurrences = {}
+        self.true_count = [0] * len(clauses)
+        self.free_count = [len(clause) for clause in clauses]
+        self.unsatisfied = len(clauses)
+        self.listener = None
+        for clause_nr, clause in enumerate(clauses):
+            for lit in clause:
+                self.occurrences.setdefault(lit, []).append(clause_nr)
+            positions = [0, 1] if len(clause) > 1 else [0, 0]
+            self.watch.append(positions)
+            for position in set(positions) if clause else ():
+                self.watches.setdefault(clause[position], []).append(clause_nr)
+
+    def assign(self, lit):
+        """
+            Assigns lit and visits clauses watching -lit. Returns (conflict, units), units
+            are (clause number, literal) of clauses with one unassigned literal left, the
+            visit stops at the first clause with all literals false.
+        """
+        value = self.value
+        value[lit], value[-lit] = 1, -1
+        self.trail.append(lit)
+        self._count(lit, 1)
+        false_lit = -lit
+        watching = self.watches.get(false_lit)
+        if not watching:
+            return False, []
+
+        keep, units, conflict = [], [], False
+        for i, clause_nr in enumerate(watching):
+            clause = self.clauses[clause_nr]
+            watch = self.watch[clause_nr]
+            mine = 0 if clause[watch[0]] == false_lit else 1
+            other_lit = clause[watch[1 - mine]]
+            other_value = value[other_lit]
+            if other_value == 1:
+                keep.append(clause_nr)
+                continue
+
+            for position, candidate in enumerate(clause):
+                if position != watch[0] and position != watch[1] and value[candidate] != -1:
+                    watch[mine] = position
+                    self.watches.setdefault(candidate, []).append(clause_nr)
+                    break
+            else:
+                keep.append(clause_nr)
+                if other_value == 0:
+                    units.append((clause_nr, other_lit))
+                else:
+                    conflict = True
+                    keep.extend(watching[i + 1:])
+                    break
+        self.watches[false_lit] = keep
+        return conflict, units
+
+    def backtrack(self, size):
+        """
+            Undoes assignments back to trail length size
+        """
+        while len(self.trail) > size:
+            lit = self.trail.pop()
+            self.value[lit] = self.value[-lit] = 0
+            self._count(lit, -1)
+
+    def _count(self, lit, step):
+        """
+            Updates counts of clauses with lit and -lit after lit is assigned (step 1) or
+            unassigned (step -1), and tells the listener about the changed clauses
+        """
+        true_count, free_count = self.true_count, self.free_count
+        touched = []
+        for clause_nr in self.occurrences.get(lit, ()):
+            count = true_count[clause_nr]
+            true_count[clause_nr] = count + step
+            free_count[clause_nr] -= step
+            if not count or not count + step:
+                self.unsatisfied -= step
+                touched.append(clause_nr)
+        for clause_nr in self.occurrences.get(-lit, ()):
+            free_count[clause_nr] -= step
+            if not true_count[clause_nr]:
+                touched.append(clause_nr)
+        if self.listener is not None:
+            self.listener.changed(lit, touched)
+
+    def residual(self):
+        """
+            {clause number: unassigned literals} of clauses without a true literal, the
+            formula simplified by the current assignment
+        """
+        value = self.value
+        residual = {}
+        for clause_nr, (clause, true_count) in enumerate(zip(self.clauses, self.true_count)):
+            if not true_count:
+                residual[clause_nr] = [lit for lit in clause if not value[lit]]
+        return residual
+
+
+class IndexedHeap:
+    """
+        Binary min-heap of items with keys, position of every item is known so its key
+        can be changed or the item removed in O(log n)
+    """
+
+    def __init__(self):
+        self.items = []
+        self.keys = {}
+        self.positions = {}
+
+    def __contains__(self, item):
+        return item in self.positions
+
+    def __len__(self):
+        return len(self.items)
+
+    def top(self):
+        return self.items[0]
+
+    def ties(self):
+        """
+            All items with the smallest key
+        """
+        if not self.items:
+            return []
+        items, keys, best = self.items, self.keys, self.keys[self.items[0]]
+        found, stack = [], [0]
+        while stack:
+            i = stack.pop()
+            if i < len(items) and keys[items[i]] == best:
+                found.append(items[i])
+                stack.extend((2 * i + 1, 2 * i + 2))
+        return found
+
+    def push(self, item, key):
+        """
+            Adds item or changes its key
+        """
+        if item in self.positions:
+            self.update(item, key)
+            return
+        self.keys[item] = key
+        self.positions[item] = len(self.items)
+        self.items.append(item)
+        self._up(len(self.items) - 1)
+
+    def update(self, item, key):
+        old_key = self.keys[item]
+        self.keys[item] = key
+        if key < old_key:
+            self._up(self.positions[item])
+        elif key > old_key:
+            self._down(self.positions[item])
+
+    def remove(self, item):
+        i = self.positions.pop(item)
+        del self.keys[item]
+        last = self.items.pop()
+        if i < len(self.items):
+            self.items[i] = last
+            self.positions[last] = i
+            self._up(i)
+            self._down(self.positions[last])
+
+    def _up(self, i):
+        items, keys, positions = self.items, self.keys, self.positions
+        item, key = items[i], keys[items[i]]
+        while i:
+            parent = (i - 1) >> 1
+            if keys[items[parent]] <= key:
+                break
+            items[i] = items[parent]
+            positions[items[i]] = i
+            i = parent
+        items[i] = item
+        positions[item] = i
+
+    def _down(self, i):
+        items, keys, positions = self.items, self.keys, self.positions
+        size, item, key = len(items), items[i], keys[items[i]]
+        while True:
+            child = 2 * i + 1
+            if child >= size:
+                break
+            if child + 1 < size and keys[items[child + 1]] < keys[items[child]]:
+                child += 1
+            if keys[items[child]] >= key:
+                break
+            items[i] = items[child]
+            positions[items[i]] = i
+            i = child
+        items[i] = item
+        positions[item] = i
+
+
+class LiteralScores:
+    """
+        Incremental DLIS (weight 1 per occurrence) or Jeroslow-Wang (weight 2^-length)
+        scores of literals in clauses without a true literal. Jeroslow-Wang weights are
+        kept as integers 2^(longest clause - length) so sums are exact. The heap holds
+        unassigned literals keyed by the highest score and then the first occurrence in
+        the simplified formula, which is the literal the full scan picks. Changed clauses
+        are collected and scores fixed only when a literal is selected.
+            weight    - weight of every clause, 0 for satisfied ones
+            flat      - literals of all clauses one after another
+            offsets   - position of the first literal of every clause in flat
+            positions - {lit: positions of lit in flat}, first - index in positions of the
+                        first occurrence in a clause with a weight
+    """
+
+    def __init__(self, formula, jeroslow_wang=False):
+        self.formula = formula
+        self.longest = max((len(clause) for clause in formula.clauses), default=0)
+        self.jeroslow_wang = jeroslow_wang
+        self.flat, self.offsets, self.clause_of, self.rank = [], [], [], []
+        self.positions, self.score, self.first = {}, {}, {}
+        self.touched, self.dirty = set(), set()
+        self.weight = [self._weight(clause_nr) for clause_nr in range(len(formula.clauses))]
+        for clause_nr, clause in enumerate(formula.clauses):
+            self.offsets.append(len(self.flat))
+            for lit in clause:
+                positions = self.positions.setdefault(lit, [])
+                self.rank.append(len(positions))
+                positions.append(len(self.flat))
+                self.flat.append(lit)
+                self.clause_of.append(clause_nr)
+                self.score[lit] = self.score.get(lit, 0) + self.weight[clause_nr]
+        self.offsets.append(len(self.flat))
+        self.end = len(self.flat)
+        self.heap = IndexedHeap()
+        for lit in self.positions:
+            self.first[lit] = 0
+            if not formula.value[lit]:
+                self.heap.push(lit, self._key(lit))
+
+    def _weight(self, clause_nr):
+        if self.formula.true_count[clause_nr]:
+            return 0
+        return 1 << (self.longest - self.formula.free_count[clause_nr]) if self.jeroslow_wang else 1
+
+    def _key(self, lit):
+        positions, first = self.positions[lit], self.first[lit]
+        return -self.score[lit] * (self.end + 1) + (positions[first] if first < len(positions) else self.end)
+
+    def changed(self, lit, touched):
+        self.dirty.add(lit)
+        self.dirty.add(-lit)
+        self.touched.update(touched)
+
+    def _update(self):
+        flat, weight, rank, score, first, dirty = self.flat, self.weight, self.rank, self.score, self.first, self.dirty
+        for clause_nr in self.touched:
+            new_weight, old_weight = self._weight(clause_nr), weight[clause_nr]
+            if new_weight == old_weight:
+                continue
+            weight[clause_nr] = new_weight
+            delta = new_weight - old_weight
+            for position in range(self.offsets[clause_nr], self.offsets[clause_nr + 1]):
+                clause_lit = flat[position]
+                score[clause_lit] += delta
+                if not old_weight:
+                    first[clause_lit] = min(first[clause_lit], rank[position])
+                elif not new_weight:
+                    positions, index = self.positions[clause_lit], first[clause_lit]
+                    while index < len(positions) and not weight[self.clause_of[positions[index]]]:
+                        index += 1
+                    first[clause_lit] = index
+                dirty.add(clause_lit)
+        self.touched.clear()
+
+    def select(self):
+        self._update()
+        heap, value = self.heap, self.formula.value
+        for lit in self.dirty:
+            if lit not in self.positions:
+                continue
+            if value[lit]:
+                if lit in heap:
+                    heap.remove(lit)
+            else:
+                heap.push(lit, self._key(lit))
+        self.dirty.clear()
+        return heap.top()
+
+
+class MomsScores:
+    """
+        Incremental MOMS scores. Unassigned literals of every clause without a true
+        literal are counted in the bucket of its length, every bucket keeps a heap of
+        variables keyed by (pos + neg) * K_MOMS + pos * neg. Changed clauses are counted
+        again and heap keys fixed only when a variable is selected. Ties go to the variable occurring first in the
+        shortest clauses, as in the full scan.
+            length - bucket of every clause (0 for satisfied ones), counted - its literals
+    """
+
+    def __init__(self, formula):
+        self.formula = formula
+        self.length, self.counted = [], []
+        self.pos, self.neg, self.heaps, self.clauses, self.dirty = {}, {}, {}, {}, {}
+        self.touched = set()
+        self.clause_of, self.var_positions = [], {}
+        for clause_nr, clause in enumerate(formula.clauses):
+            for lit in clause:
+                self.var_positions.setdefault(abs(lit), []).append(len(self.clause_of))
+                self.clause_of.append(clause_nr)
+            self.length.append(0)
+            self.counted.append([])
+            self._register(clause_nr)
+
+    def _register(self, clause_nr):
+        formula = self.formula
+        length = 0 if formula.true_count[clause_nr] else formula.free_count[clause_nr]
+        counted = [lit for lit in formula.clauses[clause_nr] if not formula.value[lit]] if length else []
+        if length == self.length[clause_nr] and counted == self.counted[clause_nr]:
+            return
+        self._add(self.length[clause_nr], self.counted[clause_nr], -1)
+        self._add(length, counted, 1)
+        self.length[clause_nr], self.counted[clause_nr] = length, counted
+
+    def _add(self, length, lits, step):
+        if not length:
+            return
+        self.clauses[length] = self.clauses.get(length, 0) + step
+        if not self.clauses[length]:
+            del self.clauses[length]
+        pos, neg = self.pos.setdefault(length, {}), self.neg.setdefault(length, {})
+        dirty = self.dirty.setdefault(length, set())
+        for lit in lits:
+            if lit > 0:
+                pos[lit] = pos.get(lit, 0) + step
+                dirty.add(lit)
+            else:
+                neg[-lit] = neg.get(-lit, 0) + step
+                dirty.add(-lit)
+
+    def changed(self, lit, touched):
+        self.touched.update(touched)
+
+    def select(self):
+        for clause_nr in self.touched:
+            self._register(clause_nr)
+        self.touched.clear()
+        length = min(self.clauses)
+        pos, neg = self.pos[length], self.neg[length]
+        heap = self.heaps.setdefault(length, IndexedHeap())
+        for var in self.dirty[length]:
+            pos_value, neg_value = pos.get(var, 0), neg.get(var, 0)
+            if pos_value + neg_value:
+                heap.push(var, -((pos_value + neg_value) * K_MOMS + pos_value * neg_value))
+            elif var in heap:
+                heap.remove(var)
+        self.dirty[length].clear()
+        candidates = heap.ties()
+        if len(candidates) == 1:
+            return candidates[0]
+
+        def first_occurrence(var):
+            for position in self.var_positions[var]:
+                if self.length[self.clause_of[position]] == length:
+                    return position
+
+        return min(candidates, key=first_occurrence)
+
+
 class DpllIteration:
-    def __init__(self, cnf_file=None, heuristic_type=3):
+    def __init__(self, cnf_file=None, heuristic_type=3, clause_store=None, time_limit=None, decision_limit=None,
+                 conflict_limit=None, cancelled=None):
         self.cnf_file = cnf_file
+        self.clause_store = clause_store
         self.heuristic_type = heuristic_type
+        # the run stops as UNRESOLVED after time_limit seconds, decision_limit decisions, conflict_limit
+        # conflicts or when cancelled() returns True, it is called before every decision
+        self.time_limit, self.decision_limit, self.conflict_limit = time_limit, decision_limit, conflict_limit
+        self.cancelled = cancelled
+        self.start_time = 0.0
         self.assignment_list, self.assignment_trail = [], []
-        self.formula_backtrack_l, self.assign_backtrack_l, self.decision_backtrack_l = {}, {}, {}
+        self.level_start_l, self.decision_backtrack_l = {}, {}
         self.conflict_cnt, self.split_cnt, self.decision_cnt, self.var_cnt, self.clause_cnt = 0, 0, 0, 0, 0
-        self.f_list, self.v_list = {}, {}
+        self.f_list = {}
+        self.formula = None
+        self.scores = None
         # f_list: {key:value} = {clause number: [clause]}
-        # v_list: {key:value} = {lit: [list of clause numbers in which lit occurs]}
+        # level_start_l: {key:value} = {decision level: length of assignment_list before its decision}
 
     @staticmethod
     def check_formula(formula, assignment):
@@ -62,37 +459,23 @@ class DpllIteration:
                             print('This is not proper file format in line', clause_nr, '. Line discarded.')
                             continue
                         self.f_list[clause_nr] = clause
-                        self.add_variable(clause, clause_nr)
                         s = ''
                         clause_nr += 1
 
-    def add_variable(self, clause, clause_nr):
-        for lit in clause:
-            try:
-                self.v_list[lit].append(clause_nr)
-            except KeyError:
-                self.v_list[lit] = [clause_nr]
+    # read clauses from already parsed ClauseStore (profiles.vis_tasks.cnf_parser)
+    def load_clause_store(self, clause_store):
+        for clause_nr, clause in enumerate(clause_store.clauses()):
+            self.f_list[clause_nr] = clause
 
     # tworzenie listy literal z listy formula
     @staticmethod
     def literal(f_list):
-        literal_list = []
-        for clause in f_list.values():
-            for lit in clause:
-                if lit not in literal_list:
-                    literal_list.append(lit)
-        return literal_list
+        return list(dict.fromkeys(lit for clause in f_list.values() for lit in clause))
 
     # tworzenie listy variable z listy literal
     @staticmethod
     def variable(f_list):
-        variable_list = []
-        for clause in f_list.values():
-            for lit in clause:
-                v = abs(lit)
-                if v not in variable_list:
-                    variable_list.append(v)
-        return variable_list
+        return list(dict.fromkeys(abs(lit) for clause in f_list.values() for lit in clause))
 
     # Unit clause: clause containing only single literal, i.e. (1), i.e. (-2)
     #   * remove all clauses containing single literal
@@ -100,41 +483,25 @@ class DpllIteration:
     # i.e. unit_list: [-52, 53]
     @staticmethod
     def unit_clause(f_list):
-        unit_l = []
+        unit_l, unit_set = [], set()
 
         for clause in f_list.values():
             if len(clause) == 1:
                 lit = clause[0]
-                if (lit not in unit_l) and (-lit not in unit_l):
+                if (lit not in unit_set) and (-lit not in unit_set):
                     unit_l.append(lit)
+                    unit_set.add(lit)
         return unit_l
 
     # unit propagation
+    #   * assign every lit from unit_list, clauses watching -lit look for another literal to watch
+    #   * clauses left with one unassigned literal give new unit literals, in order of clause numbers
     def unit_propagation(self, unit_list):
         new_unit_list, conflict = [], False
+        queued, new_units = set(unit_list), set()
 
         for lit in unit_list:
-            # delete clauses contained lit
-            if lit in self.v_list:
-                for clause_nr in self.v_list[lit]:
-                    if clause_nr in self.f_list:
-                        del self.f_list[clause_nr]
-
-            # delete -lit from clauses
-            if -lit in self.v_list:
-                for clause_nr in self.v_list[-lit]:
-                    if clause_nr in self.f_list:
-                        self.f_list[clause_nr].remove(-lit)
-                        cl = self.f_list[clause_nr]
-                        if not cl:  # check if conflict
-                            conflict = True
-                            break
-                        if len(cl) == 1:  # check if unit clause
-                            literal = self.f_list[clause_nr][0]
-                            if literal not in new_unit_list and literal not in unit_list:
-                                new_unit_list.append(literal)
-
-            self.assignment_list.append(lit)
+            conflict, units = self.formula.assign(lit)
 
             if conflict:
                 self.assignment_trail.append(lit)
@@ -143,6 +510,11 @@ class DpllIteration:
             else:
                 self.assignment_trail.append(lit)
 
+            for _, literal in sorted(units):
+                if literal not in new_units and literal not in queued:
+                    new_unit_list.append(literal)
+                    new_units.add(literal)
+
         return conflict, new_unit_list
 
     def heuristic(self, heuristic_nr, f_list):
@@ -285,6 +657,18 @@ class DpllIteration:
         lit = dispatch[heuristic_nr](f_list)
         return lit
 
+    def exhausted(self):
+        """
+            True if a limit of the run is reached or the run is cancelled
+        """
+        if self.decision_limit is not None and self.decision_cnt >= self.decision_limit:
+            return True
+        if self.conflict_limit is not None and self.conflict_cnt >= self.conflict_limit:
+            return True
+        if self.time_limit is not None and time.monotonic() - self.start_time >= self.time_limit:
+            return True
+        return self.cancelled is not None and bool(self.cancelled())
+
     def conflict_analyze(self):
         dec_lev_to_delete, back_lit, back_dec_level = [], 0, -1
         self.conflict_cnt += 1  # conflicts counter
@@ -307,15 +691,17 @@ class DpllIteration:
         if dec_lev_to_delete:
             for d in dec_lev_to_delete:
                 del self.decision_backtrack_l[d]
-                del self.assign_backtrack_l[d]
-                del self.formula_backtrack_l[d]
+                del self.level_start_l[d]
 
         return back_dec_level, back_lit
 
     def dpll(self):
         result, conflict, decision_level, lit = UNRESOLVED, False, 0, 0
+        self.start_time = time.monotonic()
+        self.formula = WatchedFormula(list(self.f_list.values()))
+        self.assignment_list = self.formula.trail
         # just for tests
-        self.var_cnt = len(self.variable(self.f_list))
+        self.var_cnt = len({abs(lit) for clause in self.f_list.values() for lit in clause})
         self.clause_cnt = len(self.f_list)
 
         # check if formula SAT
@@ -329,6 +715,11 @@ class DpllIteration:
                 self.assignment_trail.append('unsat')
                 return UNSAT
 
+        # scores of dlis, jw and moms follow the assignments instead of scanning the formula
+        scores = {1: LiteralScores, 2: lambda formula: LiteralScores(formula, True), 3: MomsScores}
+        if self.heuristic_type in scores:
+            self.scores = self.formula.listener = scores[self.heuristic_type](self.formula)
+
         # unit propagation before branching any literals by decision
         unit_list = self.unit_clause(self.f_list)
         while unit_list:
@@ -339,6 +730,9 @@ class DpllIteration:
 
         # idpll loop
         while result == UNRESOLVED:
+            if self.exhausted():
+                self.assignment_trail.append('unresolved')
+                return UNRESOLVED
             conflict = False
 
             while unit_list:
@@ -351,15 +745,18 @@ class DpllIteration:
                     break
 
             if not conflict:  # no conflict # check if formula empty -> SAT
-                if not self.f_list:
+                if not self.formula.unsatisfied:
                     self.assignment_trail.append('sat')
                     return SAT
 
                 decision_level += 1  # increase decision level
                 self.decision_cnt += 1  # counters just for statistic reports
-                self.formula_backtrack_l[decision_level] = marshal.loads(marshal.dumps(self.f_list))
-                self.assign_backtrack_l[decision_level] = marshal.loads(marshal.dumps(self.assignment_list))
-                lit = self.heuristic(self.heuristic_type, self.f_list)  # lit selection using heuristic: 1:'dlis', 2:'jw', 3:'moms'
+                self.level_start_l[decision_level] = len(self.assignment_list)
+                # lit selection using heuristic: 1:'dlis', 2:'jw', 3:'moms', 4: 'jw two-sided', 5: 'weighted dlis'
+                if self.scores is not None:
+                    lit = self.scores.select()
+                else:
+                    lit = self.heuristic(self.heuristic_type, self.formula.residual())
                 unit_list = [lit]  # add lit to unit_list
                 self.decision_backtrack_l[decision_level] = [lit]  # decision_lit    # add decision_lit to bactrack
                 self.assignment_trail.append('d')  # for solution tree visualization
@@ -367,9 +764,8 @@ class DpllIteration:
                 result = UNRESOLVED  # set result
             else:  # split: dec_level and lit get back from backtracks
                 self.split_cnt += 1  # counters just for statistic reports
-                # return formula and assignment from backtrack
-                self.f_list = self.formula_backtrack_l[decision_level]
-                self.assignment_list = self.assign_backtrack_l[decision_level]
+                # undo assignments made since the decision at dec_level
+                self.formula.backtrack(self.level_start_l[decision_level])
                 unit_list = [lit]  # add lit to unit_list
                 self.decision_backtrack_l[decision_level].append(lit)  # add lit to decision_lit -> to bactrack
                 self.assignment_trail.append('d')  # for tree visualization
@@ -490,14 +886,12 @@ class DpllIteration:
                 f.close()
 
                 self.f_list.clear()
-                self.v_list.clear()
-                self.assignment_list.clear()
+                self.assignment_list = []
                 self.assignment_trail.clear()
                 self.decision_cnt = 0
                 self.split_cnt = 0
                 self.conflict_cnt = 0
-                self.formula_backtrack_l.clear()
-                self.assign_backtrack_l.clear()
+                self.level_start_l.clear()
                 self.decision_backtrack_l.clear()
                 i += 1
 
@@ -519,8 +913,11 @@ class DpllIteration:
             print('GLOBAL RUNTIME FOR FILES IN ' + cnf_folder + ': %.3f' % global_runtime + 's')
 
     def run(self):
-        self.open_cnf_file(self.cnf_file)
-        self.dpll()
+        if self.clause_store is not None:
+            self.load_clause_store(self.clause_store)
+        else:
+            self.open_cnf_file(self.cnf_file)
+        return self.dpll()
 
 
 if __name__ == '__main__':
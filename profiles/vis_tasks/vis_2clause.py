@@ -1,3 +1,7 @@
+import itertools
+
+import numpy as np
+
 options = {
     "nodes": {
         "color": {"border": 'rgb(0,0,0)', "background": 'rgb(169,169,169)'},
@@ -20,12 +24,6 @@ options = {
 }
 
 
-def inc_edge(e):
-    e['label'] = str(int(e['label']) + 1)
-    if e['width'] < 20:
-        e['width'] += 1
-
-
 def edge_2clause_json_2arrow(a, b, color, _type, roundness):
     return {"from": a, "to": b, "color": {"color": color, "opacity": 0.5}, "label": '1', "width": 1,
             "arrows": {"to": {"enabled": True, "scaleFactor": 1, "type": "arrow"},
@@ -57,3 +55,57 @@ def negative_positive(a, b):
 
 def negative_negative(a, b):
     return edge_2clause_json_2arrow(a, b, 'rgb(0,128,0)', 'curvedCCW', 0.2)
+
+
+def edge_counts(store, progress=None):
+    """
+        {key: [edge builder, a, b, count]} of the 2-clause visualization, every 2-clause is
+        an edge colored by the signs of its literals, every pair of variables of a longer
+        clause a black one, equal edges are counted
+    """
+    edges = {}
+    for index, numbers in enumerate(store.clauses()):
+        if progress is not None:
+            progress.update(index)
+
+        if len(numbers) == 2:
+            key = '2c' + str(sorted(numbers))
+            if numbers[0] > 0 and numbers[1] > 0:
+                builder, ids = positive_positive, sorted(map(abs, numbers))
+            elif numbers[0] < 0 and numbers[1] < 0:
+                builder, ids = negative_negative, sorted(map(abs, numbers))
+            else:
+                builder, ids = negative_positive, list(map(abs, sorted(numbers)))
+        else:
+            for p in itertools.combinations(numbers, 2):
+                p = tuple(sorted(map(abs, p)))
+                try:
+                    edges[p][3] += 1
+                except KeyError:
+                    edges[p] = [gt_2clause, p[0], p[1], 1]
+            continue
+        try:
+            edges[key][3] += 1
+        except KeyError:
+            edges[key] = [builder, ids[0], ids[1], 1]
+    return edges
+
+
+def edge_json(builder, a, b, count):
+    e = builder(a, b)
+    e['label'] = str(count)
+    e['width'] = min(count, 20)
+    return e
+
+
+def two_clause_graph(store, progress=None):
+    """
+        Generators of nodes (variables in order of their first occurrence) and edges of
+        the 2-clause visualization
+    """
+    edges = edge_counts(store, progress)
+    variables, first = np.unique(np.abs(store.literals), return_index=True)
+    return {
+        "nodes": ({"id": v, "label": str(v)} for v in variables[np.argsort(first)].tolist()),
+        "edges": (edge_json(*edge) for edge in edges.values())
+    }
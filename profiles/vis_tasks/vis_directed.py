@@ -34,3 +34,51 @@ def node_json(n):
     return {"id": n, "label": n,
             "color": {"border": 'rgb(0,0,0)', "background": 'rgb(50,205,50)'},
             "font": {"color": 'rgb(0,0,0)'}}
+
+
+def clause_json(c_id):
+    return {"id": c_id,
+            "color": {"border": 'rgb(0,0,0)', "background": 'rgb(169,169,169)'},
+            "shape": 'square', "size": 15}
+
+
+def directed_nodes(store, progress=None):
+    """
+        Yields the node of every clause followed by the nodes of both literals of its
+        variables which were not listed yet
+    """
+    listed = set()
+    for clause, numbers in enumerate(store.clauses(), 1):
+        if progress is not None:
+            progress.update(clause)
+        yield clause_json('c_' + str(clause))
+        for n in numbers:
+            l = abs(n)
+            if l not in listed:
+                listed.add(l)
+                yield node_json('P' + str(l))
+                yield node_json('N' + str(l))
+
+
+def directed_edges(store):
+    """
+        Yields the edges of every clause, from the clause to the literals in it and to the
+        clause from their negations, the last literal of a variable repeated in a clause wins
+    """
+    for clause, numbers in enumerate(store.clauses(), 1):
+        c_id = 'c_' + str(clause)
+        edges = {}
+        for n in numbers:
+            p_l = 'P' + str(abs(n))
+            n_l = 'N' + str(abs(n))
+            if n > 0:
+                edges[p_l] = {"from": c_id, "to": p_l}
+                edges[n_l] = {"from": n_l, "to": c_id}
+            else:
+                edges[p_l] = {"from": p_l, "to": c_id}
+                edges[n_l] = {"from": c_id, "to": n_l}
+        yield from edges.values()
+
+
+def directed_graph(store, progress=None):
+    return {"nodes": directed_nodes(store, progress), "edges": directed_edges(store)}
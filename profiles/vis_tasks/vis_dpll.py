@@ -1,3 +1,7 @@
+import os
+
+import numpy as np
+
 from profiles.vis_tasks.i_dpll import DpllIteration
 
 options = {
@@ -39,183 +43,279 @@ DECISION = 1
 CONFLICT = 2
 SAT = 3
 UNSAT = 4
+UNRESOLVED = 5
 NORMAL_COLOR = 'rgb(135,206,250)'
 DECISION_COLOR = 'rgb(147,112,219)'
 CONFLICT_COLOR = 'rgb(255,165,0)'
 SAT_COLOR = 'rgb(50,205,50)'
 UNSAT_COLOR = 'rgb(255,0,0)'
+UNRESOLVED_COLOR = 'rgb(255,255,0)'
 ZERO_EDGE_COLOR = 'rgb(255,0,0)'
 ONE_EDGE_COLOR = 'rgb(0,255,0)'
+COLLAPSED_COLOR = 'rgb(211,211,211)'
+# names of nodes which are not variables
+CONF_NAME = -1
+SAT_NAME = -2
+UNSAT_NAME = -3
+UNRESOLVED_NAME = -4
+NAMES = {CONF_NAME: 'CONF', SAT_NAME: 'SAT', UNSAT_NAME: 'UNSAT', UNRESOLVED_NAME: 'UNRESOLVED'}
+# leaf nodes ending a trail
+RESULTS = {'sat': (SAT_NAME, SAT), 'unsat': (UNSAT_NAME, UNSAT), 'unresolved': (UNRESOLVED_NAME, UNRESOLVED)}
+TREE_ARRAYS = ('name', 'number', 'parent', 'level', 'ntype', 'one', 'zero', 'end', 'decisions', 'conflicts', 'depth')
 
 
-class DpllTreeAttr:
-    def __init__(self):
-        self.prev = None
-        self.dec_node = False
-        self.conf_node = False
-        self.prev_val = False
-        self.back_to = False
-        self.ntype = NORMAL
-
-
-class DpllNode:
-    def __init__(self, nid, parent, level, ntype, tree_nodes: list):
-        self.nid = nid
-        self.parent = parent
-        self.level = level
-        self.zero = None
-        self.one = None
-        self.ntype = ntype
-        tree_nodes.append(self)
-
-
-def get_var(nid: str):
-    return nid.split('.')[0]
-
-
-def create_v_node(n: DpllNode):
-    if n.ntype == DECISION:
+def create_v_node(nid, label, level, ntype):
+    if ntype == DECISION:
         ncolor = DECISION_COLOR
-    elif n.ntype == CONFLICT:
+    elif ntype == CONFLICT:
         ncolor = CONFLICT_COLOR
-    elif n.ntype == SAT:
+    elif ntype == SAT:
         ncolor = SAT_COLOR
-    elif n.ntype == UNSAT:
+    elif ntype == UNSAT:
         ncolor = UNSAT_COLOR
+    elif ntype == UNRESOLVED:
+        ncolor = UNRESOLVED_COLOR
     else:
         ncolor = NORMAL_COLOR
-    return {"id": n.nid, "label": get_var(n.nid), "level": n.level, "color": {"background": ncolor}}
+    return {"id": nid, "label": label, "level": level, "color": {"background": ncolor}}
 
 
 class DpllTree:
+    """
+        Tree of a DPLL run built from its assignment trail in one pass. Nodes are numbered
+        in order of creation and kept in lists, vis.js ids ('<var>.<repeat>', 'CONF.<repeat>',
+        'SAT', 'UNSAT', 'UNRESOLVED') are formatted only by visualize_tree.
+            name    - variable of every node, CONF_NAME or a name of RESULTS
+            number  - repeat counter of the name when the node was created, 0 for results
+            parent  - parent of every node, -1 for the root
+            one, zero - child on the true and false branch, -1 if there is none
+            branch  - nodes from the root to the last node, on_branch - {var: positions of
+                      its nodes on branch} to find the node of a backtracked decision
+        Descendants of a node are created right after it, so its subtree is the range of
+        nodes up to end. Subtree counts (decisions, conflicts, deepest level) describe
+        subtrees left out by a bounded visualize_tree.
+    """
+
     def __init__(self, assignment_trail):
         self.root = None
         self.trail = assignment_trail
+        self.position = 0
         self.repeat_counter = {}
         self.v_nodes = {}
         self.v_edges = {}
-        self.attr = DpllTreeAttr()
-        self.tree_nodes = []
+        self.name, self.number, self.parent, self.level, self.ntype = [], [], [], [], []
+        self.one, self.zero = [], []
+        self.end, self.decisions, self.conflicts, self.depth = [], [], [], []
+        self.branch, self.on_branch = [], {}
+        self.prev_val = False
+        self.collapsed = 0
 
-    def put_repeat_counter(self, v):
-        if v in self.repeat_counter:
-            self.repeat_counter[v] += 1
+    def __len__(self):
+        return len(self.name)
+
+    def add_node(self, name, parent, ntype):
+        if name in (SAT_NAME, UNSAT_NAME, UNRESOLVED_NAME):
+            number = 0
         else:
-            self.repeat_counter[v] = 1
+            number = self.repeat_counter[name] = self.repeat_counter.get(name, 0) + 1
+        node = len(self.name)
+        self.name.append(name)
+        self.number.append(number)
+        self.parent.append(parent)
+        self.level.append(0 if parent < 0 else self.level[parent] + 1)
+        self.ntype.append(ntype)
+        self.one.append(-1)
+        self.zero.append(-1)
+        if parent >= 0:
+            if self.prev_val:
+                self.one[parent] = node
+            else:
+                self.zero[parent] = node
+        return node
+
+    def label(self, node):
+        name = int(self.name[node])
+        return NAMES.get(name, str(name))
+
+    def node_id(self, node):
+        if self.number[node]:
+            return self.label(node) + '.' + str(self.number[node])
+        return self.label(node)
+
+    def push(self, node, lit):
+        self.on_branch.setdefault(self.name[node], []).append(len(self.branch))
+        self.branch.append(node)
+        self.prev_val = lit > 0
 
-    def build_id(self, n):
-        return str(n) + '.' + str(self.repeat_counter[n])
+    def back_to(self, var):
+        """
+            Cuts the branch back to the last node of var
+        """
+        depth = self.on_branch[var][-1]
+        for node in self.branch[depth + 1:]:
+            self.on_branch[self.name[node]].pop()
+        del self.branch[depth + 1:]
+
+    def next_token(self):
+        token = self.trail[self.position]
+        self.position += 1
+        return token
 
     def set_root(self):
-        while self.trail:
-            lit = self.trail.pop(0)
+        ntype = NORMAL
+        while self.position < len(self.trail):
+            lit = self.next_token()
             if lit == 'd':
-                self.attr.ntype = DECISION
+                ntype = DECISION
                 continue
             elif lit == 'sat':
-                self.root = DpllNode("SAT", None, 0, SAT, self.tree_nodes)
-                break
+                self.root = self.add_node(SAT_NAME, -1, SAT)
             elif lit == 'unsat':
-                self.root = DpllNode("SAT", None, 0, UNSAT, self.tree_nodes)
-                break
+                # a trail ending right away has a root named SAT in both cases
+                self.root = self.add_node(SAT_NAME, -1, UNSAT)
+            elif lit == 'unresolved':
+                self.root = self.add_node(UNRESOLVED_NAME, -1, UNRESOLVED)
             else:
                 lit = int(lit)
-                v = abs(lit)
-                self.put_repeat_counter(v)
-                self.root = DpllNode(self.build_id(v), None, 0, self.attr.ntype, self.tree_nodes)
-                self.attr.prev = self.root
-                self.attr.prev_val = lit > 0
-                break
-
-    def sat(self):
-        n = DpllNode('SAT', self.attr.prev, self.attr.prev.level + 1, SAT, self.tree_nodes)
-        if self.attr.prev_val:
-            self.attr.prev.one = n
-        else:
-            self.attr.prev.zero = n
-
-    def unsat(self):
-        n = DpllNode('UNSAT', self.attr.prev, self.attr.prev.level + 1, UNSAT, self.tree_nodes)
-        if self.attr.prev_val:
-            self.attr.prev.one = n
-        else:
-            self.attr.prev.zero = n
-
-    def back_to(self):
-        if self.attr.conf_node:
-            self.put_repeat_counter('CONF')
-            n = DpllNode(self.build_id('CONF'), self.attr.prev, self.attr.prev.level + 1, CONFLICT, self.tree_nodes)
-            if self.attr.prev_val:
-                self.attr.prev.one = n
-            else:
-                self.attr.prev.zero = n
-        self.attr.conf_node = False
-        self.attr.back_to = True
+                self.root = self.add_node(abs(lit), -1, ntype)
+                self.push(self.root, lit)
+            break
 
     def build_tree(self):
-        self.set_root()  # ustawianie roota
+        self.set_root()
+        dec_node, conf_node, back_to = False, False, False
 
-        while self.trail:
-            lit = self.trail.pop(0)
+        while self.position < len(self.trail):
+            lit = self.next_token()
             if lit == 'd':
-                self.attr.dec_node = True
+                dec_node = True
             elif lit == 'c':
-                self.attr.conf_node = True
+                conf_node = True
             elif lit == 'b':
-                self.back_to()
-            elif lit == 'sat':
-                self.sat()
-                break
-            elif lit == 'unsat':
-                self.unsat()
+                if conf_node:
+                    self.add_node(CONF_NAME, self.branch[-1], CONFLICT)
+                conf_node, back_to = False, True
+            elif lit in RESULTS:
+                name, ntype = RESULTS[lit]
+                self.add_node(name, self.branch[-1], ntype)
                 break
             else:
                 lit = int(lit)
                 v = abs(lit)
-                if self.attr.back_to:
-                    while get_var(self.attr.prev.nid) != str(v):
-                        self.attr.prev = self.attr.prev.parent
-                    self.attr.prev_val = not lit > 0
-                    self.attr.back_to = False
+                if back_to:
+                    self.back_to(v)
+                    self.prev_val = not lit > 0
+                    back_to = False
                     continue
-                self.attr.ntype = NORMAL
-                if self.attr.dec_node:
-                    self.attr.ntype = DECISION
-                    self.attr.dec_node = False
-                if str(v) == get_var(self.attr.prev.nid):
+                ntype = DECISION if dec_node else NORMAL
+                dec_node = False
+                if v == self.name[self.branch[-1]]:
                     continue
-                self.put_repeat_counter(v)
-                n = DpllNode(self.build_id(v), self.attr.prev, self.attr.prev.level + 1, self.attr.ntype,
-                             self.tree_nodes)
-                if self.attr.prev_val:
-                    self.attr.prev.one = n
-                else:
-                    self.attr.prev.zero = n
-                self.attr.prev = n
-                self.attr.prev_val = lit > 0
-
-    def fill_vis_struct(self, p: DpllNode, n: DpllNode, value):
-        self.v_nodes[n.nid] = create_v_node(n)
-        if value == 1:
-            ecolor = ONE_EDGE_COLOR
+                self.push(self.add_node(v, self.branch[-1], ntype), lit)
+        self.count_subtrees()
+
+    def count_subtrees(self):
+        size = [1] * len(self)
+        self.decisions = [int(ntype == DECISION) for ntype in self.ntype]
+        self.conflicts = [int(ntype == CONFLICT) for ntype in self.ntype]
+        self.depth = list(self.level)
+        for node in range(len(self) - 1, 0, -1):
+            parent = self.parent[node]
+            size[parent] += size[node]
+            self.decisions[parent] += self.decisions[node]
+            self.conflicts[parent] += self.conflicts[node]
+            self.depth[parent] = max(self.depth[parent], self.depth[node])
+        self.end = [node + size[node] for node in range(len(self))]
+
+    def bounded_nodes(self, top, max_nodes, max_depth):
+        """
+            Nodes of the subtree of top taken level by level while there are at most
+            max_nodes of them and at most max_depth levels below top
+        """
+        selected, level = [top], [top]
+        while level and (max_depth is None or self.level[level[0]] - self.level[top] < max_depth):
+            children = [child for node in level for child in (self.one[node], self.zero[node]) if child >= 0]
+            if max_nodes is not None and len(selected) + len(children) > max_nodes:
+                children = children[:max(max_nodes - len(selected), 0)]
+            selected.extend(children)
+            level = children
+        return sorted(selected)
+
+    def visualize_tree(self, top=None, max_nodes=None, max_depth=None):
+        """
+            Nodes and edges of the subtree of top (the root by default). A bounded tree shows
+            every left out subtree as one collapsed node with its counts.
+        """
+        top = self.root if top is None else top
+        if top is None:
+            return
+        if max_nodes is None and max_depth is None:
+            nodes = range(top, self.end[top])
         else:
-            ecolor = ZERO_EDGE_COLOR
-        self.v_edges[str(p.nid) + '-' + str(n.nid) + ':' + str(value)] = {"from": p.nid, "to": n.nid,
-                                                                          "color": {"color": ecolor}}
-
-    def visualize_tree(self):
-        self.v_nodes[self.root.nid] = create_v_node(self.root)
-        # self.visualize_tree_body(self.root)
-        for n in self.tree_nodes[1:]:
-            if n == n.parent.one:
-                self.fill_vis_struct(n.parent, n, 1)
-            else:
-                self.fill_vis_struct(n.parent, n, 0)
-
-    def visualize_tree_body(self, n: DpllNode):
-        if n.one:
-            self.fill_vis_struct(n, n.one, 1)
-            self.visualize_tree_body(n.one)
-        if n.zero:
-            self.fill_vis_struct(n, n.zero, 0)
-            self.visualize_tree_body(n.zero)
+            nodes = self.bounded_nodes(top, max_nodes, max_depth)
+        nids = {node: self.node_id(node) for node in nodes}
+        for node, nid in nids.items():
+            self.v_nodes[nid] = create_v_node(nid, self.label(node), int(self.level[node]), self.ntype[node])
+            parent = int(self.parent[node])
+            if node != top:
+                self.add_v_edge(nids[parent], nid, parent, node)
+            for child in (self.one[node], self.zero[node]):
+                if child >= 0 and child not in nids:
+                    self.collapse(nid, node, int(child))
+
+    def add_v_edge(self, parent_nid, nid, parent, node):
+        value = 1 if self.one[parent] == node else 0
+        ecolor = ONE_EDGE_COLOR if value == 1 else ZERO_EDGE_COLOR
+        self.v_edges[parent_nid + '-' + nid + ':' + str(value)] = {"from": parent_nid, "to": nid,
+                                                                   "color": {"color": ecolor}}
+
+    def collapse(self, parent_nid, parent, node):
+        """
+            Collapsed node standing for the subtree of node, expanded with its number
+        """
+        self.collapsed += 1
+        nid = 'sub.' + str(node)
+        self.v_nodes[nid] = {
+            "id": nid, "label": '+' + str(self.end[node] - node), "level": int(self.level[node]),
+            "color": {"background": COLLAPSED_COLOR},
+            "collapsed": {"node": node, "nodes": int(self.end[node] - node), "decisions": int(self.decisions[node]),
+                          "conflicts": int(self.conflicts[node]), "depth": int(self.depth[node])}
+        }
+        self.add_v_edge(parent_nid, nid, parent, node)
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        for name in TREE_ARRAYS:
+            np.save(os.path.join(directory, name + '.npy'), np.asarray(getattr(self, name), dtype=np.int64))
+
+    @classmethod
+    def load(cls, directory):
+        """
+            Memory-mapped tree saved by save, None if there is no saved tree
+        """
+        tree = cls([])
+        try:
+            for name in TREE_ARRAYS:
+                setattr(tree, name, np.load(os.path.join(directory, name + '.npy'), mmap_mode='r'))
+        except (OSError, ValueError):
+            return None
+        tree.root = 0 if len(tree.name) else None
+        return tree
+
+
+def expand_subtree(directory, node, max_nodes=None, max_depth=None):
+    """
+        Nodes and edges of a collapsed subtree, with the edge from the parent of its top
+        node, None if there is no such subtree
+    """
+    tree = DpllTree.load(directory)
+    if tree is None or not 0 < node < len(tree):
+        return None
+    tree.visualize_tree(node, max_nodes, max_depth)
+    parent = int(tree.parent[node])
+    tree.add_v_edge(tree.node_id(parent), tree.node_id(node), parent, node)
+    return {
+        "parent": 'sub.' + str(node),
+        "nodes": list(tree.v_nodes.values()),
+        "edges": list(tree.v_edges.values())
+    }
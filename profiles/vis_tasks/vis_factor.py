@@ -0,0 +1,53 @@
+import numpy as np
+
+from profiles.vis_tasks.edge_budget import collect_edges, unique_last
+
+# Number of literals turned into edges at once
+EDGE_BLOCK = 1 << 22
+
+
+def factor_blocks(store, progress=None, block=EDGE_BLOCK):
+    """
+        Yields (keys, weights, positive) of variable - clause edges in blocks of whole
+        clauses, key is (variable - 1) * clauses + clause index. A variable occurring in
+        a clause more than once gets one edge with the sign of its last literal. Weight
+        is the weight of the clause (1 for SAT formulas).
+    """
+    clauses = len(store)
+    offsets = np.asarray(store.offsets)
+    start = 0
+    while start < clauses:
+        end = max(int(np.searchsorted(offsets, offsets[start] + block, side='right')) - 1, start + 1)
+        end = min(end, clauses)
+        literals = np.asarray(store.literals[offsets[start]:offsets[end]], dtype=np.int64)
+        clause_index = np.repeat(np.arange(start, end, dtype=np.int64), np.diff(offsets[start:end + 1]))
+        keys = (np.abs(literals) - 1) * clauses + clause_index
+        last = unique_last(keys)
+        if store.weights is not None:
+            weights = np.asarray(store.weights[start:end], dtype=np.int64)[clause_index[last] - start]
+        else:
+            weights = np.ones(len(last), dtype=np.int64)
+        if progress is not None:
+            progress.update(end)
+        yield keys[last], weights, (literals[last] > 0)
+        start = end
+
+
+def factor_edges(store, progress=None, reducer=None):
+    """
+        (variables, clauses, positive) arrays of factor graph edges, clauses are 1-based,
+        optionally reduced to an edge budget
+    """
+    keys, _, positive = collect_edges(factor_blocks(store, progress), reducer)
+    if positive is None:
+        positive = np.zeros(0, dtype=bool)
+    variables, clauses = np.divmod(keys, max(len(store), 1))
+    return variables + 1, clauses + 1, positive
+
+
+def factor_edge_json(variables, clauses, positive):
+    """
+        Generator of the edges of the factor visualization
+    """
+    for v, c, p in zip(variables.tolist(), clauses.tolist(), positive.tolist()):
+        yield {"from": v, "to": -c, "color": {"color": 'green' if p else 'red', "opacity": 1}}
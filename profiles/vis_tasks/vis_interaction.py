@@ -0,0 +1,89 @@
+import numpy as np
+
+from profiles.vis_tasks.edge_budget import collect_edges
+from profiles.vis_tasks.vis_matrix import count_keys, merge_counts
+
+OPACITY_STEP = 0.1
+# Upper bound of literal pairs aggregated in memory at once, larger graphs are built in
+# several passes over the formula, each for a range of the smaller variables of edges
+EDGE_BLOCK = 1 << 23
+
+
+def pair_keys(store, first, second, size):
+    """
+        int64 keys (v1 - 1) * size + v2 - 1 with v1 <= v2 of variable pairs for
+        literal positions first < second
+    """
+    literals = store.literals
+    before = first < second
+    v1 = np.abs(literals[first[before]]).astype(np.int64)
+    v2 = np.abs(literals[second[before]]).astype(np.int64)
+    return (np.minimum(v1, v2) - 1) * size + np.maximum(v1, v2) - 1
+
+
+def variable_ranges(store, size, block=EDGE_BLOCK):
+    """
+        Splits variables into ranges [lo, hi) (0-based) such that every range is the
+        smaller variable of at most about 'block' literal pairs
+    """
+    lengths = store.clause_lengths()
+    variables = np.abs(np.asarray(store.literals)).astype(np.int64) - 1
+    bound = np.bincount(variables, weights=np.repeat(lengths - 1, lengths), minlength=size)
+    ends = np.searchsorted(np.cumsum(bound), np.arange(block, bound.sum(), block), side='right')
+    ends = np.unique(np.concatenate((ends[ends < size], [size])))
+    ends = ends[ends > 0]
+    return list(zip(np.concatenate(([0], ends[:-1])).tolist(), ends.tolist()))
+
+
+def interaction_blocks(store, size, progress=None, block=EDGE_BLOCK):
+    """
+        Yields (keys, weights, None) of interaction edges, every block aggregated over all
+        clauses for one range of variables, weight is the number of literal pairs of the
+        two variables in all clauses
+    """
+    offsets = np.asarray(store.offsets)
+    ranges = variable_ranges(store, size, block)
+    if progress is not None:
+        progress.total = len(store) * len(ranges)
+    for index, (lo, hi) in enumerate(ranges):
+        chunks = []
+        for first, second in store.literal_pairs():
+            keys = pair_keys(store, first, second, size)
+            if len(ranges) > 1:
+                keys = keys[(keys >= lo * size) & (keys < hi * size)]
+            chunks.append(count_keys(keys))
+            if progress is not None and len(first):
+                progress.update(index * len(store) + int(np.searchsorted(offsets, first[-1], side='right')))
+        keys, weights = merge_counts(chunks)
+        yield keys, weights, None
+
+
+def interaction_edges(store, size, progress=None, reducer=None):
+    """
+        Variable interaction graph: (sources, targets, weights) arrays, one edge per
+        pair of variables sharing a clause, optionally reduced to an edge budget
+    """
+    keys, weights, _ = collect_edges(interaction_blocks(store, size, progress), reducer)
+    sources, targets = np.divmod(keys, size)
+    return sources + 1, targets + 1, weights
+
+
+def edge_opacity(weights):
+    return np.round(np.minimum(weights * OPACITY_STEP, 1.0), 2)
+
+
+def interaction_graph(store, sources, targets, weights, reduced=False):
+    """
+        Generators of nodes and edges of the interaction visualization, a reduced graph
+        has only the nodes of kept edges
+    """
+    if reduced:
+        nodes = np.union1d(sources, targets).tolist()
+    else:
+        nodes = store.variables().tolist()
+    opacity = edge_opacity(weights).tolist()
+    return {
+        "nodes": ({"id": v, "label": str(v)} for v in nodes),
+        "edges": ({"from": s, "to": t, "weight": w, "color": {"color": '#000000', "opacity": o}}
+                  for s, t, w, o in zip(sources.tolist(), targets.tolist(), weights.tolist(), opacity))
+    }
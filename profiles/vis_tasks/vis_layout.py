@@ -0,0 +1,163 @@
+import os
+import tempfile
+
+import numpy as np
+
+LAYOUTS = ('drl', 'fr')
+# Node-link graphs of a visualization as (nodes key, edges key) of its content
+GRAPH_KEYS = [('nodes', 'edges')]
+DPLL_GRAPH_KEYS = [('dlis_nodes', 'dlis_edges'), ('jw_nodes', 'jw_edges'), ('moms_nodes', 'moms_edges')]
+LAYOUT_FORMATS = (
+    'sat_vis_factor', 'sat_vis_interaction', 'sat_vis_directed', 'sat_vis_2clause', 'sat_vis_resolution',
+    'sat_vis_tree', 'sat_vis_dpll', 'maxsat_vis_factor', 'maxsat_vis_interaction', 'maxsat_vis_resolution',
+    'maxsat_vis_tree',
+)
+# DrL lays out graphs with more vertices coarse to fine, Fruchterman-Reingold uses its grid
+# approximation on the whole graph
+COARSE_SIZE = 1000
+# Layout coordinates are scaled to about this size (vis.js canvas units)
+LAYOUT_SCALE = 1000.0
+# Cached positions are used as the starting layout when they cover this part of the nodes
+SEED_COVERAGE = 0.5
+
+
+def graph_keys(json_format):
+    return DPLL_GRAPH_KEYS if json_format == 'sat_vis_dpll' else GRAPH_KEYS
+
+
+def graph_arrays(nodes, edges):
+    """
+        Node ids and (sources, targets) arrays of node indices, edges to unknown nodes are skipped
+    """
+    ids = [node['id'] for node in nodes]
+    index = {node_id: i for i, node_id in enumerate(ids)}
+    sources = np.fromiter((index.get(edge['from'], -1) for edge in edges), dtype=np.int64, count=len(edges))
+    targets = np.fromiter((index.get(edge['to'], -1) for edge in edges), dtype=np.int64, count=len(edges))
+    known = (sources >= 0) & (targets >= 0)
+    return ids, sources[known], targets[known]
+
+
+def _layout(g, algorithm, seed=None):
+    if algorithm == 'drl':
+        if seed is None:
+            return g.layout_drl()
+        return g.layout_drl(seed=seed.tolist(), options='refine')
+    if seed is None:
+        return g.layout_fruchterman_reingold(grid='auto')
+    return g.layout_fruchterman_reingold(seed=seed.tolist(), niter=50, grid='auto')
+
+
+def _jitter(positions, rng):
+    spread = max(float(np.ptp(positions)) if len(positions) else 1.0, 1.0) * 0.01
+    return positions + rng.uniform(-spread, spread, positions.shape)
+
+
+def multilevel_layout(g, algorithm, seed=None, random_seed=0):
+    """
+        (n, 2) coordinates of igraph Graph g. For DrL large graphs are coarsened by the
+        levels of igraph multilevel clustering, the coarsest graph is laid out first and
+        positions of every level start the refinement of the next finer one. With seed
+        (positions of nodes) the layout is only refined.
+    """
+    rng = np.random.RandomState(random_seed)
+    if g.vcount() == 0:
+        return np.zeros((0, 2))
+    if seed is not None:
+        return np.asarray(_layout(g, algorithm, _jitter(seed, rng)).coords)
+    if algorithm != 'drl' or g.vcount() <= COARSE_SIZE or g.ecount() == 0:
+        return np.asarray(_layout(g, algorithm).coords)
+
+    levels = [np.asarray(level.membership) for level in g.community_multilevel(return_levels=True)]
+    positions = None
+    parent = None
+    for membership in reversed([np.arange(g.vcount())] + levels):
+        size = int(membership.max()) + 1
+        coarse = g.copy()
+        coarse.contract_vertices(membership.tolist())
+        coarse.simplify()
+        if positions is None:
+            positions = np.asarray(_layout(coarse, algorithm).coords)
+        else:
+            # vertices start at the position of the community containing them on the coarser level
+            start = np.zeros(size, dtype=np.int64)
+            start[membership] = parent
+            positions = np.asarray(_layout(coarse, algorithm, _jitter(positions[start], rng)).coords)
+        parent = membership
+    return positions
+
+
+def cache_key(nodes_key, node_id):
+    return nodes_key + ':' + str(node_id)
+
+
+def seed_positions(keys, cached):
+    """
+        Starting positions of nodes with cache keys from cached {key: (x, y)}, nodes without
+        cached position start at a random cached position, None when the cache covers too
+        few nodes
+    """
+    if not cached:
+        return None
+    known = [key in cached for key in keys]
+    if sum(known) < SEED_COVERAGE * len(keys):
+        return None
+    values = np.array(list(cached.values()), dtype=float)
+    rng = np.random.RandomState(len(keys))
+    positions = values[rng.randint(len(values), size=len(keys))]
+    for i, key in enumerate(keys):
+        if known[i]:
+            positions[i] = cached[key]
+    return positions
+
+
+def scale(positions):
+    """
+        Coordinates centered at 0 with the larger side LAYOUT_SCALE
+    """
+    if not len(positions):
+        return positions
+    positions = positions - positions.mean(axis=0)
+    size = float(np.ptp(positions, axis=0).max())
+    return positions * (LAYOUT_SCALE / size) if size > 0 else positions
+
+
+def layout_content(content, json_format, algorithm, cached=None):
+    """
+        Sets 'x' and 'y' of every node of the node-link graphs of content, returns
+        {cache key: (x, y)} of all nodes for the layout cache
+    """
+    from igraph import Graph
+
+    positions_by_key = {}
+    for nodes_key, edges_key in graph_keys(json_format):
+        nodes = content.get(nodes_key) or []
+        edges = content.get(edges_key) or []
+        ids, sources, targets = graph_arrays(nodes, edges)
+        g = Graph(n=len(ids), edges=list(zip(sources.tolist(), targets.tolist())))
+        g.simplify()
+        keys = [cache_key(nodes_key, node_id) for node_id in ids]
+        positions = scale(multilevel_layout(g, algorithm, seed_positions(keys, cached)))
+        xs, ys = np.round(positions[:, 0], 2).tolist(), np.round(positions[:, 1], 2).tolist()
+        for node, key, x, y in zip(nodes, keys, xs, ys):
+            node['x'] = x
+            node['y'] = y
+            positions_by_key[key] = (x, y)
+    return positions_by_key
+
+
+def save_layout(path, positions_by_key):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    ids = np.array(list(positions_by_key.keys()), dtype=str)
+    coords = np.array(list(positions_by_key.values()), dtype=float).reshape(-1, 2)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.npz')
+    with os.fdopen(fd, 'wb') as f:
+        np.savez(f, ids=ids, x=coords[:, 0], y=coords[:, 1])
+    os.replace(tmp_path, path)
+
+
+def load_layout(path):
+    if not os.path.isfile(path):
+        return None
+    with np.load(path) as data:
+        return {key: (x, y) for key, x, y in
+                zip(data['ids'].tolist(), data['x'].tolist(), data['y'].tolist())}
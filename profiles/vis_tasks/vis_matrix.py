@@ -0,0 +1,84 @@
+import numpy as np
+
+ORDERS = ('degree', 'community')
+
+
+def count_keys(keys):
+    return np.unique(keys, return_counts=True)
+
+
+def merge_counts(chunks):
+    if not chunks:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    keys = np.concatenate([k for k, _ in chunks])
+    counts = np.concatenate([c for _, c in chunks])
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    return unique_keys, np.bincount(inverse, weights=counts).astype(np.int64)
+
+
+def dependency_matrix(store, size):
+    """
+        Sparse variable dependency matrix in CSR format (indptr, indices, positive, negative).
+        Cell (v1, v2) counts pairs of different literals n1, n2 from one clause with
+        |n1| = v1 + 1 and |n2| = v2 + 1, in 'positive' when n1 > 0, otherwise in 'negative'.
+    """
+    literals = np.asarray(store.literals, dtype=np.int64)
+    positive_chunks, negative_chunks = [], []
+    for first, second in store.literal_pairs():
+        n1 = literals[first]
+        n2 = literals[second]
+        different = n1 != n2
+        n1, n2 = n1[different], n2[different]
+        keys = (np.abs(n1) - 1) * size + np.abs(n2) - 1
+        positive_chunks.append(count_keys(keys[n1 > 0]))
+        negative_chunks.append(count_keys(keys[n1 < 0]))
+
+    positive_keys, positive_counts = merge_counts(positive_chunks)
+    negative_keys, negative_counts = merge_counts(negative_chunks)
+    keys = np.union1d(positive_keys, negative_keys)
+    positive = np.zeros(len(keys), dtype=np.int64)
+    negative = np.zeros(len(keys), dtype=np.int64)
+    positive[np.searchsorted(keys, positive_keys)] = positive_counts
+    negative[np.searchsorted(keys, negative_keys)] = negative_counts
+
+    rows, indices = np.divmod(keys, size)
+    indptr = np.searchsorted(rows, np.arange(size + 1))
+    return indptr, indices, positive, negative
+
+
+def variable_order(indptr, indices, weights, size, method):
+    """
+        Permutation of variables: 'degree' puts the most connected variables first,
+        'community' groups variables of one community (igraph multilevel) together
+    """
+    rows = np.repeat(np.arange(size), np.diff(indptr))
+    degree = np.bincount(rows, weights=weights, minlength=size)
+    if method == 'degree':
+        return np.argsort(-degree, kind='stable')
+    if method == 'community':
+        from igraph import Graph
+        upper = rows < indices
+        graph = Graph(n=size, edges=list(zip(rows[upper].tolist(), indices[upper].tolist())))
+        membership = graph.community_multilevel(weights=weights[upper].tolist()).membership
+        return np.lexsort((-degree, np.asarray(membership)))
+    return np.arange(size)
+
+
+def compact_matrix(indptr, indices, positive, negative, size, order=None):
+    """
+        Response with coordinates of non-zero cells, rows and cols are positions of variables
+        in the displayed order
+    """
+    if order is None:
+        order = np.arange(size)
+    position = np.empty(size, dtype=np.int64)
+    position[order] = np.arange(size)
+    rows = np.repeat(np.arange(size), np.diff(indptr))
+    return {
+        "labels": [str(v) for v in order.tolist()],
+        "size": size,
+        "rows": position[rows].tolist(),
+        "cols": position[indices].tolist(),
+        "positive": positive.tolist(),
+        "negative": negative.tolist()
+    }
@@ -0,0 +1,199 @@
+import itertools
+from collections import namedtuple
+
+import numpy as np
+
+from profiles.vis_tasks.edge_budget import collect_edges
+
+MODES = ('full', 'hub', 'fanout')
+# Number of clause pairs generated at once
+EDGE_BLOCK = 1 << 22
+
+Occurrences = namedtuple('Occurrences', [
+    'pos_clauses', 'neg_clauses',  # 1-based clauses of positive / negative literals, sorted by variable
+    'pos_count', 'neg_count',  # number of positive / negative occurrences of every variable
+    'pos_start', 'neg_start',  # start of the occurrences of every variable in pos_clauses / neg_clauses
+])
+
+
+def literal_occurrences(store):
+    """
+        Positive and negative occurrences of variables (0-based indices) in clauses
+    """
+    literals = np.asarray(store.literals, dtype=np.int64)
+    clause_ids = store.clause_index() + 1
+    size = int(np.abs(literals).max(initial=0))
+    result = []
+    for sign in (literals > 0, literals < 0):
+        variables = np.abs(literals[sign]) - 1
+        order = np.argsort(variables, kind='stable')
+        count = np.bincount(variables, minlength=size)
+        result.append((clause_ids[sign][order], count, np.cumsum(count) - count))
+    (pos_clauses, pos_count, pos_start), (neg_clauses, neg_count, neg_start) = result
+    return Occurrences(pos_clauses, neg_clauses, pos_count, neg_count, pos_start, neg_start)
+
+
+def pair_counts(occurrences, fanout=None):
+    """
+        Number of resolution edges of every variable, computed before any edge is built
+    """
+    neg_count = occurrences.neg_count
+    if fanout is not None:
+        neg_count = np.minimum(neg_count, fanout)
+    return occurrences.pos_count * neg_count
+
+
+def hub_variables(occurrences, mode, hub_pairs, fanout=None):
+    """
+        Variables shown as a hub node connected to their clauses instead of all pairs of
+        clauses: all clashing variables in 'hub' mode, variables with more than hub_pairs
+        pairs (limited by fanout) in other modes
+    """
+    pairs = pair_counts(occurrences, fanout)
+    if mode == 'hub':
+        return pairs > 0
+    return pairs > hub_pairs
+
+
+def node_count(store):
+    """
+        Nodes of the resolution graph of a formula: its clauses followed by hubs of its variables,
+        the number of nodes is the size of edge keys
+    """
+    return len(store) + store.num_variables
+
+
+def resolution_blocks(occurrences, key_size, hubs, fanout=None, progress=None, block=EDGE_BLOCK):
+    """
+        Yields (keys, weights, None) of resolution edges c1 -> c2 between clauses with
+        opposite literals of a variable in blocks of variables, key is
+        (c1 - 1) * key_size + c2 - 1, every block without duplicates. With fanout every
+        positive occurrence is paired with at most fanout negative occurrences.
+    """
+    pos_count, neg_count = occurrences.pos_count, occurrences.neg_count
+    pairs = np.where(hubs, 0, pair_counts(occurrences, fanout))
+    size = len(pairs)
+    ends = np.searchsorted(np.cumsum(pairs), np.arange(block, pairs.sum(), block), side='right')
+    ends = np.unique(np.concatenate((ends[ends < size], [size])))
+    ends = ends[ends > 0]
+    ranges = list(zip(np.concatenate(([0], ends[:-1])).tolist(), ends.tolist()))
+    if progress is not None:
+        progress.total = len(ranges)
+
+    for index, (lo, hi) in enumerate(ranges):
+        start = occurrences.pos_start[lo]
+        variables = np.repeat(np.arange(lo, hi), pos_count[lo:hi])
+        positions = np.arange(start, start + len(variables))
+        keep = ~hubs[variables]
+        variables, positions = variables[keep], positions[keep]
+
+        counts = neg_count[variables]
+        if fanout is not None:
+            counts = np.minimum(counts, fanout)
+        c1 = np.repeat(occurrences.pos_clauses[positions], counts)
+        shift = np.arange(counts.sum(), dtype=np.int64) - np.repeat(np.cumsum(counts) - counts, counts)
+        if fanout is not None:
+            # consecutive positive occurrences start at consecutive negative ones to cover all of them
+            rank = np.repeat(positions - occurrences.pos_start[variables], counts)
+            shift = (rank + shift) % np.repeat(neg_count[variables], counts)
+        c2 = occurrences.neg_clauses[np.repeat(occurrences.neg_start[variables], counts) + shift]
+        keys = np.unique((c1 - 1) * key_size + c2 - 1)
+        if progress is not None:
+            progress.update(index + 1)
+        yield keys, np.ones(len(keys), dtype=np.int64), None
+
+
+def hub_edges(occurrences, hubs):
+    """
+        (variables, clauses, positive) of edges between hub variables (1-based) and
+        clauses containing them
+    """
+    variables, clauses, positive = [], [], []
+    for clause_list, count, sign in ((occurrences.pos_clauses, occurrences.pos_count, True),
+                                     (occurrences.neg_clauses, occurrences.neg_count, False)):
+        owner = np.repeat(np.arange(len(count)), count)
+        selected = hubs[owner]
+        variables.append(owner[selected] + 1)
+        clauses.append(clause_list[selected])
+        positive.append(np.full(int(selected.sum()), sign))
+    return np.concatenate(variables), np.concatenate(clauses), np.concatenate(positive)
+
+
+def hub_blocks(occurrences, hubs, clauses, size):
+    """
+        Yields (keys, weights, None) of hub edges: clause -> hub of a positive literal and
+        hub -> clause of a negative one, the hub of variable v is node clauses + v
+    """
+    variables, hub_clauses, positive = hub_edges(occurrences, hubs)
+    hub_nodes, clause_nodes = clauses + variables - 1, hub_clauses - 1
+    keys = np.where(positive, clause_nodes * size + hub_nodes, hub_nodes * size + clause_nodes)
+    yield keys, np.ones(len(keys), dtype=np.int64), None
+
+
+def resolution_edges(store, mode='full', fanout=None, hub_pairs=None, progress=None, reducer=None):
+    """
+        Resolution graph: (sources, targets) of clause edges, (variables, clauses, positive)
+        of hub edges and counts of edges. Variables with more than hub_pairs pairs become
+        hubs in any mode. With a reducer (of node_count(store) nodes) clause and hub edges
+        together are reduced to its edge budget.
+    """
+    if mode not in MODES:
+        raise ValueError('Unknown resolution mode: {!r}'.format(mode))
+    occurrences = literal_occurrences(store)
+    if mode != 'fanout':
+        fanout = None
+    hubs = hub_variables(occurrences, mode, hub_pairs if hub_pairs is not None else np.inf, fanout)
+    clauses = len(store)
+    size = reducer.size if reducer is not None else clauses + len(hubs)
+    blocks = itertools.chain(resolution_blocks(occurrences, size, hubs, fanout, progress),
+                             hub_blocks(occurrences, hubs, clauses, size))
+    keys, _, _ = collect_edges(blocks, reducer)
+    if reducer is None:
+        # blocks of different variables can share a pair of clauses
+        keys = np.unique(keys)
+    rows, cols = np.divmod(keys, max(size, 1))
+    to_hub, from_hub = cols >= clauses, rows >= clauses
+    clause_edges = ~(to_hub | from_hub)
+    sources, targets = rows[clause_edges], cols[clause_edges]
+    positive = to_hub[~clause_edges]
+    variables = np.where(positive, cols[~clause_edges], rows[~clause_edges]) - clauses + 1
+    hub_clauses = np.where(positive, rows[~clause_edges], cols[~clause_edges]) + 1
+    counts = {
+        "pairs": int(pair_counts(occurrences).sum()),
+        "hubs": int(hubs.sum()),
+    }
+    return (sources + 1, targets + 1), (variables, hub_clauses, positive), counts
+
+
+def hub_id(variable):
+    return 'v' + str(variable)
+
+
+def resolution_graph(clause_node, sources, targets, hubs, clauses=None):
+    """
+        Generators of nodes and edges of the resolution visualization, clause_node builds
+        the node of a clause, by default nodes of all clauses with edges are listed
+    """
+    variables, hub_clauses, positive = hubs
+    if clauses is None:
+        clauses = np.union1d(np.union1d(sources, targets), hub_clauses).tolist()
+    return {"nodes": _resolution_nodes(clause_node, clauses, variables),
+            "edges": _resolution_edges(sources, targets, hubs)}
+
+
+def _resolution_nodes(clause_node, clauses, variables):
+    for c in clauses:
+        yield clause_node(c)
+    for v in np.unique(variables).tolist():
+        yield {"id": hub_id(v), "label": str(v), "shape": 'diamond'}
+
+
+def _resolution_edges(sources, targets, hubs):
+    for c1, c2 in zip(sources.tolist(), targets.tolist()):
+        yield {"from": c1, "to": c2}
+    variables, hub_clauses, positive = hubs
+    for v, c, p in zip(variables.tolist(), hub_clauses.tolist(), positive.tolist()):
+        if p:
+            yield {"from": c, "to": hub_id(v), "color": {"color": 'green'}}
+        else:
+            yield {"from": hub_id(v), "to": c, "color": {"color": 'red'}}
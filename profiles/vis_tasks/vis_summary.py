@@ -0,0 +1,309 @@
+import json
+import os
+import re
+import shutil
+
+import numpy as np
+
+from profiles.vis_tasks.vis_interaction import edge_opacity
+
+SUMMARIES = ('community', 'index')
+# Kinds of leaf nodes, same as groups of nodes of the factor visualization
+CLAUSE, VARIABLE = 0, 1
+SUPERNODE_ID = re.compile(r'^s(\d+)_(\d+)$')
+
+
+def supernode_id(level, unit):
+    return f's{level}_{unit}'
+
+
+def community_parents(ids, sources, targets, weights):
+    """
+        Parent arrays (units of a level -> units of the next coarser level) of the levels
+        of igraph multilevel clustering, level 0 units are the nodes
+    """
+    from igraph import Graph
+
+    g = Graph(n=len(ids), edges=list(zip(sources.tolist(), targets.tolist())))
+    g.es['weight'] = weights.tolist()
+    memberships = [np.asarray(level.membership, dtype=np.int64)
+                   for level in g.community_multilevel(weights='weight', return_levels=True)]
+    parents = memberships[:1]
+    for finer, coarser in zip(memberships, memberships[1:]):
+        parent = np.zeros(int(finer.max()) + 1, dtype=np.int64)
+        parent[finer] = coarser
+        parents.append(parent)
+    return parents
+
+
+def _split(parent, group):
+    """
+        Groups children of every parent into chunks of at most group consecutive units:
+        (unit -> chunk, chunk -> parent)
+    """
+    order = np.argsort(parent, kind='stable')
+    sorted_parent = parent[order]
+    starts = np.searchsorted(sorted_parent, sorted_parent)
+    chunk_keys = np.empty(len(parent), dtype=np.int64)
+    chunk_keys[order] = sorted_parent * len(parent) + (np.arange(len(parent)) - starts) // group
+    keys, chunk = np.unique(chunk_keys, return_inverse=True)
+    return chunk.reshape(-1), keys // len(parent)
+
+
+def bounded_levels(parents, size, group):
+    """
+        Levels of parents with intermediate levels added such that every unit has at most
+        group children and the top level has at most group units. Top levels are dropped
+        while the level below them still fits into group units.
+    """
+    levels = []
+    count = size
+    for parent in parents + [None]:
+        if parent is None:
+            # common root of the top level, dropped at the end
+            parent = np.zeros(count, dtype=np.int64)
+        while count and np.bincount(parent).max() > group:
+            chunk, parent = _split(parent, group)
+            levels.append(chunk)
+            count = len(parent)
+        levels.append(parent)
+        count = int(parent.max()) + 1 if len(parent) else 0
+    levels.pop()
+    while levels and len(levels[-1]) <= group:
+        levels.pop()
+    return levels
+
+
+def _renumber(levels, size):
+    """
+        Renumbers units so that children of every unit are consecutive: ancestors of nodes
+        on every level and pointers to the first child of every unit
+    """
+    order = np.arange(size)
+    new_index = []
+    child_ptr = []
+    mapping = None
+    for parent in reversed(levels):
+        if mapping is not None:
+            parent = mapping[parent]
+        order = np.argsort(parent, kind='stable')
+        mapping = np.empty(len(parent), dtype=np.int64)
+        mapping[order] = np.arange(len(parent))
+        new_index.append(mapping)
+        child_ptr.append(np.searchsorted(parent[order], np.arange(int(parent.max()) + 2 if len(parent) else 1)))
+    new_index.reverse()
+    child_ptr.reverse()
+    if not levels:
+        return order, [np.arange(size)], []
+    ancestors = [new_index[0]]
+    for ptr in child_ptr:
+        ancestors.append(np.searchsorted(ptr, ancestors[-1], side='right') - 1)
+    return order, ancestors, child_ptr
+
+
+def _level_edges(ancestor, sources, targets, weights, positive):
+    """
+        Edges between units of a level in both directions, aggregated and sorted by source:
+        (sources, targets, weights, positive counts)
+    """
+    s, t = ancestor[sources], ancestor[targets]
+    between = s != t
+    s, t = s[between], t[between]
+    count = int(ancestor.max()) + 1 if len(ancestor) else 0
+    keys = np.concatenate((s * count + t, t * count + s))
+    keys, inverse = np.unique(keys, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    edge_weights = np.bincount(inverse, np.tile(weights[between], 2), minlength=len(keys)).astype(np.int64)
+    edge_positive = np.bincount(inverse, np.tile(positive[between], 2), minlength=len(keys)).astype(np.int64)
+    return keys // max(count, 1), keys % max(count, 1), edge_weights, edge_positive
+
+
+def _unit_counts(ancestor, kinds):
+    count = int(ancestor.max()) + 1 if len(ancestor) else 0
+    variables = np.bincount(ancestor, kinds == VARIABLE, minlength=count).astype(np.int64)
+    clauses = np.bincount(ancestor, kinds == CLAUSE, minlength=count).astype(np.int64)
+    return variables, clauses
+
+
+def _supernodes(level, units, variables, clauses, child_ptr):
+    nodes = []
+    for unit in units:
+        size = int(variables[unit] + clauses[unit])
+        nodes.append({
+            "id": supernode_id(level, unit),
+            "label": str(size),
+            "title": f'Variables: {variables[unit]}, clauses: {clauses[unit]}',
+            "value": size,
+            "children": int(child_ptr[unit + 1] - child_ptr[unit]),
+        })
+    return nodes
+
+
+def _leaf_nodes(ids, kinds, factor):
+    if not factor:
+        return [{"id": i, "label": str(i)} for i in ids]
+    return [{"id": i, "label": str(i), "group": VARIABLE} if k == VARIABLE
+            else {"id": i, "label": 'C_' + str(-i), "group": CLAUSE} for i, k in zip(ids, kinds)]
+
+
+def _edges(sources, targets, weights, positive, leaf, factor):
+    opacity = edge_opacity(weights).tolist()
+    edges = []
+    for s, t, w, p, o in zip(sources, targets, weights.tolist(), positive.tolist(), opacity):
+        if leaf and factor:
+            edges.append({"from": s, "to": t, "color": {"color": 'green' if p else 'red', "opacity": 1}})
+        else:
+            edges.append({"from": s, "to": t, "weight": w, "color": {"color": '#000000', "opacity": o}})
+    return edges
+
+
+def _node_ids(level, units, leaf_ids):
+    if level == 0:
+        return [leaf_ids[u] for u in units]
+    return [supernode_id(level, u) for u in units]
+
+
+def graph_summary(directory, ids, kinds, sources, targets, weights, positive, mode='index', group=50,
+                  factor=False):
+    """
+        Multilevel summary of a graph with nodes ids (kinds VARIABLE or CLAUSE) and edges
+        between node indices. Nodes are grouped into supernodes by communities or by node
+        order (variables and clauses separately), every supernode has at most group
+        children. Levels needed to expand supernodes are saved to directory, returns nodes
+        and edges of the top level with aggregated edge weights.
+    """
+    group = max(group, 2)
+    ids = np.asarray(ids, dtype=np.int64)
+    kinds = np.asarray(kinds, dtype=np.int64)
+    weights = np.asarray(weights, dtype=np.int64)
+    positive = np.asarray(positive, dtype=np.int64)
+    if mode == 'community' and len(sources):
+        parents = community_parents(ids, sources, targets, weights)
+    else:
+        _, kind_units = np.unique(kinds, return_inverse=True)
+        parents = [kind_units.reshape(-1)]
+    levels = bounded_levels(parents, len(ids), group)
+    order, ancestors, child_ptr = _renumber(levels, len(ids))
+
+    top = len(levels)
+    leaf_ids = ids[order].tolist()
+
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory)
+    np.save(os.path.join(directory, 'ids.npy'), ids[order])
+    np.save(os.path.join(directory, 'kinds.npy'), kinds[order])
+    for level, ancestor in enumerate(ancestors[:top]):
+        level_sources, level_targets, level_weights, level_positive = \
+            _level_edges(ancestor, sources, targets, weights, positive)
+        variables, clauses = _unit_counts(ancestor, kinds)
+        np.save(os.path.join(directory, f'edge_ptr_{level}.npy'),
+                np.searchsorted(level_sources, np.arange(len(variables) + 1)))
+        np.save(os.path.join(directory, f'edge_target_{level}.npy'), level_targets)
+        np.save(os.path.join(directory, f'edge_weight_{level}.npy'), level_weights)
+        np.save(os.path.join(directory, f'edge_positive_{level}.npy'), level_positive)
+        np.save(os.path.join(directory, f'variables_{level}.npy'), variables)
+        np.save(os.path.join(directory, f'clauses_{level}.npy'), clauses)
+        np.save(os.path.join(directory, f'child_ptr_{level + 1}.npy'), child_ptr[level])
+    with open(os.path.join(directory, 'summary.json'), 'w') as f:
+        json.dump({"levels": top, "factor": factor}, f)
+
+    level_sources, level_targets, level_weights, level_positive = \
+        _level_edges(ancestors[top], sources, targets, weights, positive)
+    if top == 0:
+        nodes = _leaf_nodes(leaf_ids, kinds[order].tolist(), factor)
+    else:
+        variables, clauses = _unit_counts(ancestors[top], kinds)
+        nodes = _supernodes(top, range(len(variables)), variables, clauses, child_ptr[top - 1])
+    once = level_sources < level_targets
+    edges = _edges(_node_ids(top, level_sources[once].tolist(), leaf_ids),
+                   _node_ids(top, level_targets[once].tolist(), leaf_ids),
+                   level_weights[once], level_positive[once], top == 0, factor)
+    return {
+        "nodes": nodes,
+        "edges": edges,
+        "summary": {"mode": mode, "levels": top, "group": group, "nodes": len(ids), "edges": len(sources)},
+    }
+
+
+def _load(directory, name):
+    return np.load(os.path.join(directory, name + '.npy'), mmap_mode='r')
+
+
+def expand_supernode(directory, node_id):
+    """
+        Children of a supernode with edges between them and edges from them to other
+        supernodes of the level of the expanded one, None if there is no such supernode
+    """
+    match = SUPERNODE_ID.match(str(node_id))
+    summary_path = os.path.join(directory, 'summary.json')
+    if match is None or not os.path.isfile(summary_path):
+        return None
+    with open(summary_path) as f:
+        summary = json.load(f)
+    level, unit = int(match.group(1)), int(match.group(2))
+    if not 1 <= level <= summary['levels']:
+        return None
+    child_ptr = _load(directory, f'child_ptr_{level}')
+    if unit + 1 >= len(child_ptr):
+        return None
+    first, last = int(child_ptr[unit]), int(child_ptr[unit + 1])
+    children = np.arange(first, last)
+
+    leaf_ids = None
+    if level == 1:
+        ids = _load(directory, 'ids')
+        leaf_ids = {u: int(ids[u]) for u in children.tolist()}
+        nodes = _leaf_nodes([leaf_ids[u] for u in children.tolist()],
+                            np.array(_load(directory, 'kinds')[first:last]).tolist(), summary['factor'])
+    else:
+        nodes = _supernodes(level - 1, children.tolist(), _load(directory, f'variables_{level - 1}'),
+                            _load(directory, f'clauses_{level - 1}'), _load(directory, f'child_ptr_{level - 1}'))
+
+    edge_ptr = _load(directory, f'edge_ptr_{level - 1}')
+    start, end = int(edge_ptr[first]), int(edge_ptr[last])
+    sources = np.repeat(children, np.diff(np.asarray(edge_ptr[first:last + 1])))
+    targets = np.array(_load(directory, f'edge_target_{level - 1}')[start:end])
+    weights = np.array(_load(directory, f'edge_weight_{level - 1}')[start:end])
+    positive = np.array(_load(directory, f'edge_positive_{level - 1}')[start:end])
+
+    inner = (targets >= first) & (targets < last)
+    once = inner & (sources < targets)
+    child_id = (lambda u: leaf_ids[u]) if level == 1 else (lambda u: supernode_id(level - 1, u))
+    edges = _edges([child_id(u) for u in sources[once].tolist()], [child_id(u) for u in targets[once].tolist()],
+                   weights[once], positive[once], level == 1, summary['factor'])
+
+    # edges to other units are aggregated to their ancestors on the level of the expanded supernode
+    outer = ~inner
+    parents = np.searchsorted(child_ptr, targets[outer], side='right') - 1
+    keys, inverse = np.unique(sources[outer] * len(child_ptr) + parents, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    outer_weights = np.bincount(inverse, weights[outer], minlength=len(keys)).astype(np.int64)
+    outer_positive = np.bincount(inverse, positive[outer], minlength=len(keys)).astype(np.int64)
+    edges.extend(_edges([child_id(u) for u in (keys // len(child_ptr)).tolist()],
+                        [supernode_id(level, u) for u in (keys % len(child_ptr)).tolist()],
+                        outer_weights, outer_positive, False, summary['factor']))
+    return {"parent": supernode_id(level, unit), "nodes": nodes, "edges": edges}
+
+
+def factor_summary(directory, variables_list, clauses_list, variables, clauses, positive, mode='index', group=50):
+    """
+        Summary of a factor graph with nodes of variables_list and clauses_list (1-based)
+        and edges from factor_edges
+    """
+    variables_list, clauses_list = np.asarray(variables_list, dtype=np.int64), np.asarray(clauses_list, dtype=np.int64)
+    ids = np.concatenate((variables_list, -clauses_list))
+    kinds = np.repeat([VARIABLE, CLAUSE], [len(variables_list), len(clauses_list)])
+    sources = np.searchsorted(variables_list, variables)
+    targets = len(variables_list) + np.searchsorted(clauses_list, clauses)
+    return graph_summary(directory, ids, kinds, sources, targets, np.ones(len(sources)), positive, mode, group, True)
+
+
+def interaction_summary(directory, variables_list, sources, targets, weights, mode='index', group=50):
+    """
+        Summary of an interaction graph with nodes of variables_list and edges from
+        interaction_edges
+    """
+    variables_list = np.asarray(variables_list, dtype=np.int64)
+    return graph_summary(directory, variables_list, np.full(len(variables_list), VARIABLE),
+                         np.searchsorted(variables_list, sources), np.searchsorted(variables_list, targets),
+                         weights, np.zeros(len(sources)), mode, group)
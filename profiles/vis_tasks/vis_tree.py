@@ -0,0 +1,118 @@
+import heapq
+
+EDGE_COLOR = '#ff383f'
+
+
+class FormulaTree:
+    """
+        Tree of a formula grouped by literals. Clauses are grouped by the most common literal
+        (the first occurring one among equally common), the rest of the clauses is grouped
+        again the same way. Every group is a node of its literal, its children group the
+        clauses of the group without that literal.
+        The tree is built without recursion over groups of clause numbers, literals are
+        taken from the flat literals of a ClauseStore and a taken literal is only marked in
+        removed. Nodes are numbered in order of creation:
+            data     - literal of every node
+            level    - level of every node
+            children - children of every node in order, roots are the top level nodes
+        Nodes and edges are generated in breadth-first order by iter_nodes and iter_edges.
+    """
+
+    def __init__(self, store):
+        self.literals = store.literals.tolist()
+        self.offsets = store.offsets.tolist()
+        self.removed = bytearray(len(self.literals))
+        self.data, self.level, self.children, self.roots = [], [], [], []
+        self.nodes = []
+        self.edges = []
+
+        groups = [(list(range(len(store))), None)]
+        while groups:
+            clauses, parent = groups.pop()
+            groups.extend(self.group_formulas(clauses, parent))
+
+    def add_node(self, lit, parent):
+        node = len(self.data)
+        self.data.append(lit)
+        self.level.append(0 if parent is None else self.level[parent] + 1)
+        self.children.append([])
+        (self.roots if parent is None else self.children[parent]).append(node)
+        return node
+
+    def group_formulas(self, clauses, parent):
+        """
+            Adds nodes of groups of clauses (numbers in increasing order) as children of parent
+            and returns groups of their children to build. Literal counts are kept in a heap
+            keyed by (-count, position of the first occurrence), clauses leaving for a group
+            decrease counts of their literals.
+        """
+        literals, offsets, removed = self.literals, self.offsets, self.removed
+        # occurrences {lit: [(index in clauses, first position of lit in the clause)]}
+        counts, occurrences = {}, {}
+        for index, clause in enumerate(clauses):
+            for position in range(offsets[clause], offsets[clause + 1]):
+                if removed[position]:
+                    continue
+                lit = literals[position]
+                counts[lit] = counts.get(lit, 0) + 1
+                lit_occurrences = occurrences.setdefault(lit, [])
+                if not lit_occurrences or lit_occurrences[-1][0] != index:
+                    lit_occurrences.append((index, position))
+        heap = [(-count, occurrences[lit][0][1], lit) for lit, count in counts.items()]
+        heapq.heapify(heap)
+        first = dict.fromkeys(counts, 0)
+
+        alive = [True] * len(clauses)
+        children = []
+        while heap:
+            count, position, lit = heapq.heappop(heap)
+            if -count != counts[lit] or position != occurrences[lit][first[lit]][1]:
+                continue
+            group = [index for index, _ in occurrences[lit] if alive[index]]
+            changed = set()
+            for index in group:
+                alive[index] = False
+                clause = clauses[index]
+                for position in range(offsets[clause], offsets[clause + 1]):
+                    if not removed[position]:
+                        counts[literals[position]] -= 1
+                        changed.add(literals[position])
+            for changed_lit in changed:
+                lit_occurrences = occurrences[changed_lit]
+                while first[changed_lit] < len(lit_occurrences) and not alive[lit_occurrences[first[changed_lit]][0]]:
+                    first[changed_lit] += 1
+                if counts[changed_lit]:
+                    heapq.heappush(heap, (-counts[changed_lit], lit_occurrences[first[changed_lit]][1], changed_lit))
+
+            node = self.add_node(lit, parent)
+            group_clauses = []
+            for index in group:
+                clause = clauses[index]
+                for position in range(offsets[clause], offsets[clause + 1]):
+                    if not removed[position] and literals[position] == lit:
+                        removed[position] = 1
+                        break
+                group_clauses.append(clause)
+            children.append((group_clauses, node))
+        return children
+
+    def breadth_first(self):
+        head, queue = 0, list(self.roots)
+        while head < len(queue):
+            node = queue[head]
+            head += 1
+            queue.extend(self.children[node])
+            yield node
+
+    def iter_nodes(self):
+        for node in self.breadth_first():
+            yield {"id": node, "label": str(self.data[node]), "level": self.level[node]}
+
+    def iter_edges(self):
+        for node in self.breadth_first():
+            for child in self.children[node]:
+                yield {"from": node, "to": child, "color": {"color": EDGE_COLOR}}
+
+    def serialize(self):
+        self.nodes.extend(self.iter_nodes())
+        self.edges.extend(self.iter_edges())